@@ -9,7 +9,9 @@ from app.models.connection import Connection, ConnectionStatus
 from app.models.user import User
 from app.schemas.connection import ConnectionCreate, ConnectionResponse, ConnectionUpdate
 from app.api.routes.auth import get_current_user
+from app.services.data_versions import get_taste_version
 from app.services.similarity import calculate_similarity_score
+from app.services.taste_events import connection_changed
 
 router = APIRouter()
 
@@ -49,6 +51,8 @@ async def create_connection(
         user_id=current_user.id,
         connected_user_id=connection_data.connected_user_id,
         similarity_score=similarity_score,
+        score_user_version=get_taste_version(current_user.id, db),
+        score_connected_version=get_taste_version(connection_data.connected_user_id, db),
         recommended_song_id=connection_data.recommended_song_id,
         recommendation_message=connection_data.recommendation_message,
         status=ConnectionStatus.PENDING
@@ -56,6 +60,7 @@ async def create_connection(
     
     db.add(db_connection)
     db.commit()
+    connection_changed(current_user.id, connection_data.connected_user_id, db)
     db.refresh(db_connection)
     
     return db_connection
@@ -132,6 +137,7 @@ async def update_connection(
         current_user.likes_received += 1
     
     db.commit()
+    connection_changed(connection.user_id, connection.connected_user_id, db)
     db.refresh(connection)
     return connection
 
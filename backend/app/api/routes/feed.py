@@ -3,13 +3,16 @@ Feed routes (activity feed, recommendations, etc.)
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from app.core.database import get_db
 from app.models.connection import Connection, ConnectionStatus
 from app.models.user import User
 from app.models.song import Song
 from app.api.routes.auth import get_current_user
-from app.services.recommendation import get_user_recommendations, get_song_recommendations
+from app.services.recommendation import get_song_recommendations, get_user_recommendations
+from app.services.recommendation_cache import get_cached_user_recommendations, recommendation_cache
+from app.services.recommendation_snapshot import get_recommendation_page
+from app.services.tracing import start_trace
 
 router = APIRouter()
 
@@ -54,12 +57,14 @@ async def get_feed(
     }
 
 
-@router.get("/recommendations", response_model=List[dict])
+@router.get("/recommendations", response_model=Union[List[dict], dict])
 async def get_recommendations(
     limit: int = Query(10, ge=1, le=10),  # Max limit is 10
     min_similarity: float = Query(0.0, ge=0.0, le=1.0),  # Default to 0.0 to include all
     exclude_connected: bool = Query(True),
     diversity_factor: float = Query(0.2, ge=0.0, le=1.0),
+    source: Literal["live", "precomputed", "embedding"] = Query("live"),
+    explain: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -69,30 +74,111 @@ async def get_recommendations(
     Always returns up to 'limit' recommendations (max 10), even if similarity scores are low.
     This ensures users always have someone to connect with.
     
+    Results are cached per user and parameters, and refreshed when songs or
+    connections change (see /recommendations/cache-stats).
+    
     Parameters:
     - limit: Maximum number of recommendations (1-10, default: 10)
     - min_similarity: Minimum similarity score threshold (0.0-1.0, default: 0.0 to include all)
     - exclude_connected: Whether to exclude users with existing connections
-    - diversity_factor: How much to prioritize diversity vs similarity (0.0-1.0)
+    - diversity_factor: How much to prioritize diversity vs similarity (0.0-1.0); the
+      top candidates are re-ranked with Maximal Marginal Relevance so similar
+      users don't crowd the list
+    - source: "live" scores candidates now; "precomputed" reads the user_similarity
+      table written by compute_similarities.py; "embedding" finds the nearest
+      users by dense taste vector (brute-force k-NN)
+    - explain: bypass the cache and return {"recommendations": [...], "explain": {...}}
+      with per-stage timings and query counts, candidate counts and each
+      returned user's score breakdown
     """
     # Ensure limit doesn't exceed 10
     limit = min(limit, 10)
-    recommendations = get_user_recommendations(
+    if explain:
+        with start_trace(db) as trace:
+            recommendations = get_user_recommendations(
+                current_user, db, limit, min_similarity, exclude_connected, diversity_factor, source
+            )
+        report = trace.report()
+        report["scores"] = [
+            {"user_id": rec["user_id"], "final_score": rec["final_score"], **trace.scores.get(rec["user_id"], {})}
+            for rec in recommendations
+        ]
+        return {"recommendations": recommendations, "explain": report}
+    
+    recommendations = get_cached_user_recommendations(
         current_user=current_user,
         db=db,
         limit=limit,
         min_similarity=min_similarity,
         exclude_connected=exclude_connected,
-        diversity_factor=diversity_factor
+        diversity_factor=diversity_factor,
+        source=source
     )
     
     return recommendations
 
 
-@router.get("/song-recommendations", response_model=List[dict])
+@router.get("/recommendations/page", response_model=dict)
+async def get_recommendations_page(
+    limit: int = Query(15, ge=1, le=50),
+    cursor: Optional[str] = Query(None),
+    min_similarity: float = Query(0.0, ge=0.0, le=1.0),
+    exclude_connected: bool = Query(True),
+    diversity_factor: float = Query(0.2, ge=0.0, le=1.0),
+    source: Literal["live", "precomputed", "embedding"] = Query("live"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Page through user recommendations beyond the first 10
+    
+    The first request (without cursor) ranks the candidates once and stores
+    the ranking, or reuses the stored one for the same parameters while it
+    is current; pass the returned next_cursor to get the following page.
+    Later pages are read from the stored ranking without rescoring, and
+    ignore the ranking parameters. A cursor stops working (410) when the
+    snapshot expires, your songs or connections change, or a listed user's
+    songs, genres or artists change; start over without a cursor.
+    
+    Returns:
+    - items: recommendations, same shape as /recommendations
+    - next_cursor: cursor for the next page, or null on the last page
+    - total: number of ranked candidates in the snapshot
+    """
+    page = get_recommendation_page(
+        current_user=current_user,
+        db=db,
+        limit=limit,
+        cursor=cursor,
+        params={
+            "min_similarity": min_similarity,
+            "exclude_connected": exclude_connected,
+            "diversity_factor": diversity_factor,
+            "source": source,
+        }
+    )
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Recommendation cursor expired; request the first page again"
+        )
+    
+    return page
+
+
+@router.get("/recommendations/cache-stats", response_model=dict)
+async def get_recommendation_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """Hit/miss/refresh counters of this worker's recommendation cache"""
+    return recommendation_cache.snapshot_stats()
+
+
+@router.get("/song-recommendations", response_model=Union[List[dict], dict])
 async def get_song_recommendations_endpoint(
     limit: int = Query(10, ge=1, le=20),
     from_connections: bool = Query(True),
+    explain: bool = Query(False),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -101,7 +187,16 @@ async def get_song_recommendations_endpoint(
     - Songs liked by connected users
     - Songs from users with similar taste
     - Popular songs in user's favorite genres
+    
+    With explain=true returns {"recommendations": [...], "explain": {...}}
+    with per-stage timings and query counts and the number of songs each
+    source contributed.
     """
+    if explain:
+        with start_trace(db) as trace:
+            recommendations = get_song_recommendations(current_user, db, limit, from_connections)
+        return {"recommendations": recommendations, "explain": trace.report()}
+    
     recommendations = get_song_recommendations(
         current_user=current_user,
         db=db,
@@ -1,5 +1,9 @@
 """
 MusicBrainz API routes for song/artist lookup
+
+The lookups are awaited on the shared async client, so a request waiting
+for the MusicBrainz rate limit doesn't hold up other requests. They use the
+interactive lane, which goes ahead of background enrichment.
 """
 from fastapi import APIRouter, Query, HTTPException, status
 from typing import Optional, List
@@ -7,7 +11,8 @@ from app.services.musicbrainz import (
     search_artist,
     search_recording,
     get_recording_details,
-    lookup_song_info
+    lookup_song_info,
+    get_musicbrainz_client
 )
 
 router = APIRouter()
@@ -19,7 +24,7 @@ async def search_artist_endpoint(
     limit: int = Query(5, ge=1, le=25, description="Maximum number of results")
 ):
     """Search for artists by name"""
-    results = search_artist(name, limit)
+    results = await search_artist(name, limit)
     return {"artists": results}
 
 
@@ -30,14 +35,14 @@ async def search_song_endpoint(
     limit: int = Query(5, ge=1, le=25, description="Maximum number of results")
 ):
     """Search for songs by title and optionally artist"""
-    results = search_recording(title, artist, limit)
+    results = await search_recording(title, artist, limit)
     return {"songs": results}
 
 
 @router.get("/song/{mbid}")
 async def get_song_details(mbid: str):
     """Get detailed information about a song by MusicBrainz ID"""
-    details = get_recording_details(mbid)
+    details = await get_recording_details(mbid)
     if not details:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -52,10 +57,25 @@ async def lookup_song(
     artist: Optional[str] = Query(None, description="Optional artist name")
 ):
     """Quick lookup for a song - returns best match"""
-    result = lookup_song_info(title, artist)
+    result = await lookup_song_info(title, artist)
     if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Song not found"
         )
     return result
+
+
+@router.get("/cache-stats", response_model=dict)
+async def get_cache_stats():
+    """Hit/miss/eviction counters of the MusicBrainz response cache"""
+    cache = get_musicbrainz_client().cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.snapshot_stats()}
+
+
+@router.get("/stats", response_model=dict)
+async def get_client_stats():
+    """Upstream calls made and identical concurrent calls coalesced by this worker"""
+    return get_musicbrainz_client().snapshot_stats()
@@ -3,13 +3,24 @@ Song routes (add songs, get top songs, etc.)
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Literal, Optional
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.song import Song
 from app.models.user import User
-from app.schemas.song import SongCreate, SongResponse, SongUpdate
+from app.schemas.song import SongCreate, SongResponse, SongUpdate, AutocompleteSuggestion
 from app.api.routes.auth import get_current_user
 from app.services.user_preferences import add_genre_to_user, add_artist_to_user
+from app.services.taste_profile import (
+    snapshot_song,
+    record_song_added,
+    record_song_updated,
+    record_song_removed
+)
+from app.services.genre_popularity import record_song_popularity
+from app.services.catalog import assign_catalog_song
+from app.services.taste_events import taste_changed
+from app.services.autocomplete import autocomplete_index, remote_suggestions
 
 router = APIRouter()
 
@@ -25,7 +36,14 @@ async def add_song(
         user_id=current_user.id,
         **song_data.model_dump()
     )
+    assign_catalog_song(db_song, db)
     db.add(db_song)
+    db.flush()
+    
+    # Keep the precomputed taste profile in sync
+    record_song_added(db_song, db)
+    record_song_popularity(None, snapshot_song(db_song), db)
+    
     db.commit()
     db.refresh(db_song)
     
@@ -34,10 +52,28 @@ async def add_song(
         add_genre_to_user(current_user, song_data.genre, db)
     if song_data.artist:
         add_artist_to_user(current_user, song_data.artist, db)
+    taste_changed(current_user, db)
     
     return db_song
 
 
+@router.get("/autocomplete", response_model=List[AutocompleteSuggestion])
+async def autocomplete(
+    q: str = Query(..., min_length=1, description="Partial song title or artist name"),
+    kind: Literal["all", "song", "artist"] = Query("all", alias="type"),
+    limit: int = Query(8, ge=1, le=25),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Suggestions while typing, from songs already in the app and cached
+    MusicBrainz results; MusicBrainz is only asked when nothing matches
+    """
+    suggestions = await autocomplete_index.suggest(q, limit, kind)
+    if suggestions or len(q.strip()) < settings.AUTOCOMPLETE_MIN_REMOTE_LENGTH:
+        return suggestions
+    return await remote_suggestions(q, limit, kind)
+
+
 @router.get("/me", response_model=List[SongResponse])
 async def get_my_songs(
     limit: int = Query(50, ge=1, le=100),
@@ -122,8 +158,16 @@ async def update_song(
     genre_changed = "genre" in update_data
     artist_changed = "artist" in update_data
     
+    before = snapshot_song(song)
     for field, value in update_data.items():
         setattr(song, field, value)
+    if "title" in update_data or "artist" in update_data:
+        assign_catalog_song(song, db)
+    db.flush()
+    
+    # Keep the precomputed taste profile in sync
+    record_song_updated(before, song, db)
+    record_song_popularity(before, snapshot_song(song), db)
     
     db.commit()
     db.refresh(song)
@@ -133,6 +177,7 @@ async def update_song(
         add_genre_to_user(current_user, song.genre, db)
     if artist_changed and song.artist:
         add_artist_to_user(current_user, song.artist, db)
+    taste_changed(current_user, db)
     
     return song
 
@@ -155,6 +200,14 @@ async def delete_song(
             detail="Song not found"
         )
     
+    before = snapshot_song(song)
     db.delete(song)
+    db.flush()
+    
+    # Keep the precomputed taste profile in sync
+    record_song_removed(before, current_user.id, db)
+    record_song_popularity(before, None, db)
+    
     db.commit()
+    taste_changed(current_user, db)
     return None
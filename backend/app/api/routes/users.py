@@ -8,6 +8,7 @@ from app.core.database import get_db
 from app.models.user import User
 from app.schemas.user import UserResponse, UserProfile, UserUpdate
 from app.api.routes.auth import get_current_user
+from app.services.taste_events import taste_changed
 
 router = APIRouter()
 
@@ -47,6 +48,8 @@ async def update_my_profile(
         setattr(current_user, field, value)
     
     db.commit()
+    if "top_genres" in update_data or "favorite_artists" in update_data:
+        taste_changed(current_user, db)
     db.refresh(current_user)
     return current_user
 
@@ -19,6 +19,86 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
         return self.CORS_ORIGINS if isinstance(self.CORS_ORIGINS, list) else []
 
+    # Recommendation candidate generation (MinHash + LSH)
+    # Below LSH_MIN_USERS every user is scored; above it only LSH candidates are
+    LSH_NUM_PERM: int = 64
+    LSH_BANDS: int = 32
+    LSH_MIN_USERS: int = 2000
+    LSH_MAX_CANDIDATES: int = 500
+
+    # Neighbours kept per user by the offline similarity job (compute_similarities.py)
+    SIMILARITY_TOP_N: int = 50
+
+    # Connection similarity scores: background refresh interval in seconds
+    # (0 disables it; refresh_connection_scores.py does the same on demand)
+    # and connections rescored per batch
+    CONNECTION_SCORE_REFRESH_SECONDS: int = 600
+    CONNECTION_SCORE_BATCH_SIZE: int = 500
+
+    # Dense taste embeddings (source=embedding): vector width (changing it
+    # needs build_embeddings.py), neighbours fetched per request, and how
+    # often each worker reloads the in-memory matrix to see other workers' updates
+    EMBEDDING_DIM: int = 256
+    EMBEDDING_TOP_K: int = 100
+    EMBEDDING_RELOAD_SECONDS: int = 300
+
+    # Recommendation cache (per worker): entries are fresh for TTL seconds,
+    # then served stale while refreshing until MAX_STALE seconds old
+    RECOMMENDATION_CACHE_SIZE: int = 1024
+    RECOMMENDATION_CACHE_TTL: int = 300
+    RECOMMENDATION_CACHE_MAX_STALE: int = 3600
+
+    # Paged recommendations: ranking depth stored per snapshot, and how long
+    # a snapshot can be paged through (it also ends when the user's data changes)
+    RECOMMENDATION_SNAPSHOT_DEPTH: int = 100
+    RECOMMENDATION_SNAPSHOT_TTL: int = 900
+
+    # Diversity re-ranking (MMR): how many times 'limit' top candidates the
+    # re-ranker picks from
+    MMR_POOL_FACTOR: int = 4
+
+    # MusicBrainz API: base URL (point it at a mirror or a local stub),
+    # minimum seconds between requests, request timeout, and the size of
+    # the shared keep-alive connection pool
+    MUSICBRAINZ_API_URL: str = "https://musicbrainz.org/ws/2"
+    MUSICBRAINZ_USER_AGENT: str = "InTune/1.0.0 (https://github.com/yifanliu0108/WIC-Project-team)"
+    MUSICBRAINZ_MIN_INTERVAL: float = 1.0
+    MUSICBRAINZ_TIMEOUT: float = 10.0
+    MUSICBRAINZ_MAX_CONNECTIONS: int = 10
+
+    # Where MusicBrainz lookups are answered: "remote" (the API), "local"
+    # (the mirror loaded by load_musicbrainz_mirror.py) or "local_first"
+    # (the mirror, falling back to the API when it has no match)
+    MUSICBRAINZ_MODE: str = "remote"
+
+    # Token bucket shared by every worker on the machine (SQLite file;
+    # empty path falls back to a per-worker limiter) and how many requests
+    # may go out back to back after an idle period
+    MUSICBRAINZ_RATE_LIMIT_PATH: str = "musicbrainz_ratelimit.db"
+    MUSICBRAINZ_RATE_LIMIT_BURST: int = 1
+
+    # MusicBrainz response cache (SQLite file, empty path disables it):
+    # size cap and TTLs in seconds for searches, recording details and
+    # empty results
+    MUSICBRAINZ_CACHE_PATH: str = "musicbrainz_cache.db"
+    MUSICBRAINZ_CACHE_MAX_ENTRIES: int = 50000
+    MUSICBRAINZ_CACHE_SEARCH_TTL: int = 7 * 24 * 3600
+    MUSICBRAINZ_CACHE_RECORDING_TTL: int = 30 * 24 * 3600
+    MUSICBRAINZ_CACHE_NEGATIVE_TTL: int = 24 * 3600
+
+    # Background MusicBrainz enrichment of the song catalog: seconds between
+    # passes (0 disables the in-process job; run enrich_songs.py instead),
+    # catalog songs per checkpointed chunk, and lookups in flight at once
+    MUSICBRAINZ_ENRICHMENT_INTERVAL: int = 0
+    MUSICBRAINZ_ENRICHMENT_CHUNK_SIZE: int = 50
+    MUSICBRAINZ_ENRICHMENT_CONCURRENCY: int = 4
+
+    # Song/artist autocomplete: seconds before the in-memory prefix index is
+    # rebuilt, and the shortest query sent to MusicBrainz when nothing
+    # local matches
+    AUTOCOMPLETE_RELOAD_SECONDS: int = 300
+    AUTOCOMPLETE_MIN_REMOTE_LENGTH: int = 3
+
     # Spotify API (for future integration)
     SPOTIFY_CLIENT_ID: str = ""
     SPOTIFY_CLIENT_SECRET: str = ""
@@ -1,12 +1,22 @@
 """
 Main FastAPI application entry point
 """
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
+from app.migrations import run_migrations
+from app.services.catalog import backfill_catalog
+from app.services.connection_scores import run_connection_score_refresher
+from app.services.posting_index import ensure_posting_index
+from app.services.cooccurrence import ensure_cooccurrence_model
+from app.services.genre_popularity import ensure_genre_popularity
+from app.services.embeddings import ensure_embeddings
+from app.services.musicbrainz import start_musicbrainz_client, close_musicbrainz_client
+from app.services.enrichment import run_enrichment_job
 from app.api.routes import auth, users, songs, connections, feed, musicbrainz
-from app.models import user, song, connection  # Import models to register them
+from app.models import user, song, connection, taste_profile, minhash, user_similarity, posting, cooccurrence, genre_popularity, data_version, recommendation_snapshot, embedding, pair_overlap, song_metadata, musicbrainz_mirror  # Import models to register them
 
 app = FastAPI(
     title="In Tune API",
@@ -20,11 +30,79 @@ async def init_database():
     """Initialize database tables if they don't exist"""
     try:
         Base.metadata.create_all(bind=engine)
+        applied = run_migrations(engine)
         print("✓ Database tables initialized")
+        if applied:
+            print(f"✓ Applied {len(applied)} schema migrations")
+        db = SessionLocal()
+        try:
+            linked = backfill_catalog(db)
+            if linked:
+                print(f"✓ Linked {linked} songs to the song catalog")
+        finally:
+            db.close()
     except Exception as e:
         print(f"⚠ Database initialization warning: {e}")
         # Don't fail startup if tables already exist
 
+
+# First-time builds of derived tables (e.g. right after upgrading), in the
+# order they depend on each other: (name, build, message with the count)
+_INITIAL_BUILDS = [
+    ("taste posting index", ensure_posting_index, "✓ Taste posting index built for {} users"),
+    ("song co-occurrence model", ensure_cooccurrence_model, "✓ Song co-occurrence model built for {} users"),
+    ("genre popularity rollups", ensure_genre_popularity, "✓ Genre popularity rollups built"),
+    ("taste embeddings", ensure_embeddings, "✓ Taste embeddings built for {} users"),
+]
+
+
+def build_missing_models():
+    """
+    Build the derived tables that are still empty; runs in a worker thread
+
+    Each build gets its own session, and a failing one is reported without
+    skipping the rest. Until a table is built, the features reading it
+    return fewer results; the build_*.py scripts do the same ahead of a deploy.
+    """
+    for name, build, message in _INITIAL_BUILDS:
+        db = SessionLocal()
+        try:
+            built = build(db)
+            if built:
+                print(message.format(built))
+        except Exception as e:
+            print(f"⚠ Error building the {name}: {e}")
+        finally:
+            db.close()
+
+
+# Shared clients and periodic maintenance jobs
+@app.on_event("startup")
+async def start_background_jobs():
+    """
+    Open the MusicBrainz connection pool, build missing derived tables in
+    the background and start the periodic jobs that are enabled
+    """
+    await start_musicbrainz_client()
+    app.state.initial_builds = asyncio.create_task(asyncio.to_thread(build_missing_models))
+    if settings.CONNECTION_SCORE_REFRESH_SECONDS > 0:
+        app.state.connection_score_refresher = asyncio.create_task(
+            run_connection_score_refresher(settings.CONNECTION_SCORE_REFRESH_SECONDS)
+        )
+    if settings.MUSICBRAINZ_ENRICHMENT_INTERVAL > 0:
+        app.state.enrichment_job = asyncio.create_task(
+            run_enrichment_job(settings.MUSICBRAINZ_ENRICHMENT_INTERVAL)
+        )
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for name in ("initial_builds", "connection_score_refresher", "enrichment_job"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await close_musicbrainz_client()
+
 # CORS middleware for frontend communication
 app.add_middleware(
     CORSMiddleware,
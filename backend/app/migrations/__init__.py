@@ -0,0 +1,15 @@
+"""
+Versioned schema migrations
+
+create_all() creates missing tables (with their current columns and
+indexes) but never changes tables that already exist. Changes to existing
+tables are numbered migrations in app/migrations/versions; each database
+records the versions it has applied in schema_migrations, and
+run_migrations() applies the missing ones in order.
+
+A migration module defines VERSION, DESCRIPTION and upgrade(connection).
+upgrade() runs in the same transaction that records the version, and must
+be safe on a database whose tables create_all() just created in their
+current shape (check before altering; use IF NOT EXISTS).
+"""
+from app.migrations.runner import Migration, load_migrations, applied_versions, run_migrations
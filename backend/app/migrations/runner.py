@@ -0,0 +1,112 @@
+"""
+Discovery and application of versioned migrations
+"""
+import importlib
+import pkgutil
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Callable, List, Set
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app.migrations import versions
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+_ADVISORY_LOCK_KEY = 7310_2501
+
+# Kept out of Base.metadata: the runner manages this table itself
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def _as_migration(module: ModuleType) -> Migration:
+    return Migration(version=module.VERSION, description=module.DESCRIPTION, upgrade=module.upgrade)
+
+
+def load_migrations() -> List[Migration]:
+    """Every migration in app/migrations/versions, in version order"""
+    migrations = [
+        _as_migration(importlib.import_module(f"{versions.__name__}.{name}"))
+        for _, name, _ in pkgutil.iter_modules(versions.__path__)
+    ]
+    migrations.sort(key=lambda migration: migration.version)
+    numbers = [migration.version for migration in migrations]
+    if len(set(numbers)) != len(numbers):
+        raise RuntimeError(f"Duplicate migration versions: {numbers}")
+    return migrations
+
+
+def _lock(connection: Connection):
+    """
+    Serialize migrators for the rest of the transaction
+
+    PostgreSQL: a transaction-scoped advisory lock. SQLite has no such
+    lock; there the schema_migrations insert, the transaction's first
+    write, takes the database write lock instead.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+
+def _create_table(engine: Engine):
+    try:
+        with engine.begin() as connection:
+            _lock(connection)
+            schema_migrations.create(connection, checkfirst=True)
+    except OperationalError:
+        # SQLite: another process created it between the check and CREATE TABLE
+        if not inspect(engine).has_table(schema_migrations.name):
+            raise
+
+
+def applied_versions(engine: Engine) -> Set[int]:
+    _create_table(engine)
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(select(schema_migrations.c.version))}
+
+
+def run_migrations(engine: Engine) -> List[Migration]:
+    """
+    Apply the migrations this database hasn't recorded yet; returns them
+
+    Run after Base.metadata.create_all(). Each migration runs in one
+    transaction that first takes the migration lock, re-checks that the
+    version is still missing, records it and then applies it, so when
+    several workers start at once exactly one of them applies each
+    migration and the others skip it.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for migration in load_migrations():
+        if migration.version in done:
+            continue
+        try:
+            with engine.begin() as connection:
+                _lock(connection)
+                already = connection.execute(
+                    select(schema_migrations.c.version).where(schema_migrations.c.version == migration.version)
+                ).first()
+                if already is not None:
+                    continue
+                connection.execute(insert(schema_migrations).values(
+                    version=migration.version, description=migration.description
+                ))
+                migration.upgrade(connection)
+        except IntegrityError:
+            # SQLite: another process recorded it between our check and insert
+            continue
+        applied.append(migration)
+    return applied
@@ -0,0 +1,21 @@
+"""
+Link songs to the canonical song catalog (songs.catalog_song_id)
+
+Existing songs are linked afterwards by catalog.backfill_catalog().
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 1
+DESCRIPTION = "songs.catalog_song_id"
+
+
+def upgrade(connection: Connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("songs")}
+    if "catalog_song_id" not in columns:
+        connection.execute(text(
+            "ALTER TABLE songs ADD COLUMN catalog_song_id INTEGER REFERENCES catalog_songs(id)"
+        ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_songs_catalog_song_id ON songs (catalog_song_id)"
+    ))
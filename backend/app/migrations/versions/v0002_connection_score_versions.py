@@ -0,0 +1,16 @@
+"""
+Record which data versions a connection's similarity score was computed
+from (see services.connection_scores)
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 2
+DESCRIPTION = "connections.score_user_version / score_connected_version"
+
+
+def upgrade(connection: Connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("connections")}
+    for name in ("score_user_version", "score_connected_version"):
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE connections ADD COLUMN {name} INTEGER"))
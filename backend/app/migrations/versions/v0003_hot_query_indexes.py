@@ -0,0 +1,29 @@
+"""
+Composite indexes for the per-user song and connection queries
+
+- songs (user_id, is_favorite, user_rating): /songs/top and favorites
+- songs (user_id, created_at): /songs/me and /songs/user/{id}
+- connections (user_id, status): /connections/me and the sent counts
+- connections (connected_user_id, status): /connections/received and the
+  received counts
+
+The same indexes are declared on the models, so create_all() makes them on
+new databases.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+VERSION = 3
+DESCRIPTION = "composite indexes on songs and connections"
+
+INDEXES = [
+    ("ix_songs_user_favorite_rating", "songs", ("user_id", "is_favorite", "user_rating")),
+    ("ix_songs_user_created", "songs", ("user_id", "created_at")),
+    ("ix_connections_user_status", "connections", ("user_id", "status")),
+    ("ix_connections_connected_status", "connections", ("connected_user_id", "status")),
+]
+
+
+def upgrade(connection: Connection):
+    for name, table, columns in INDEXES:
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
@@ -0,0 +1,23 @@
+"""
+Separate taste version for connection score staleness
+
+user_data_versions.version also moves on connection changes, which made
+every connection of a user stale whenever they connected with anyone.
+Connection scores now compare against taste_version, which only song,
+genre and artist changes bump. It starts equal to version, so scores that
+were current stay current.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 4
+DESCRIPTION = "user_data_versions.taste_version"
+
+
+def upgrade(connection: Connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("user_data_versions")}
+    if "taste_version" not in columns:
+        connection.execute(text(
+            "ALTER TABLE user_data_versions ADD COLUMN taste_version INTEGER NOT NULL DEFAULT 0"
+        ))
+        connection.execute(text("UPDATE user_data_versions SET taste_version = version"))
@@ -0,0 +1,17 @@
+"""
+Expire recommendation snapshots when a ranked candidate's taste changes
+
+Snapshots without a candidate version (taken before this migration) are
+treated as expired.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 5
+DESCRIPTION = "recommendation_snapshots.candidate_version"
+
+
+def upgrade(connection: Connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("recommendation_snapshots")}
+    if "candidate_version" not in columns:
+        connection.execute(text("ALTER TABLE recommendation_snapshots ADD COLUMN candidate_version INTEGER"))
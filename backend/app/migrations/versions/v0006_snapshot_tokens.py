@@ -0,0 +1,17 @@
+"""
+Random token per recommendation snapshot, checked against the cursor
+
+Snapshots without one (taken before this migration) no longer accept
+cursors; their owners start again from the first page.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 6
+DESCRIPTION = "recommendation_snapshots.token"
+
+
+def upgrade(connection: Connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("recommendation_snapshots")}
+    if "token" not in columns:
+        connection.execute(text("ALTER TABLE recommendation_snapshots ADD COLUMN token VARCHAR(32)"))
@@ -1,7 +1,7 @@
 """
 Connection model for user connections/matches
 """
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Enum, String
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Enum, String, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -25,6 +25,11 @@ class Connection(Base):
     # Similarity score calculated between users
     similarity_score = Column(Float, nullable=True)
     
+    # Taste versions of user / connected user the score was computed from
+    # (see services.connection_scores); NULL means never verified
+    score_user_version = Column(Integer, nullable=True)
+    score_connected_version = Column(Integer, nullable=True)
+    
     # Connection status
     status = Column(Enum(ConnectionStatus), default=ConnectionStatus.PENDING)
     
@@ -39,3 +44,10 @@ class Connection(Base):
     # Relationships
     user = relationship("User", foreign_keys=[user_id], back_populates="sent_connections")
     connected_user = relationship("User", foreign_keys=[connected_user_id], back_populates="received_connections")
+    
+    # Sent / received listings and stats counts; added to existing
+    # databases by migration 0003
+    __table_args__ = (
+        Index("ix_connections_user_status", "user_id", "status"),
+        Index("ix_connections_connected_status", "connected_user_id", "status"),
+    )
@@ -0,0 +1,35 @@
+"""
+Item-item co-occurrence model over normalized song keys
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class SongCooccurrence(Base):
+    """
+    Weighted co-occurrence of two song keys across users' libraries
+
+    Stored in both directions, so (song_key, other_key) lookups only need the
+    primary key. The diagonal (song_key == other_key) holds each song's norm.
+    """
+    __tablename__ = "song_cooccurrences"
+
+    song_key = Column(String(500), primary_key=True)
+    other_key = Column(String(500), primary_key=True)
+
+    # Sum over users of item_weight(song_key) * item_weight(other_key)
+    weight = Column(Float, nullable=False, default=0.0)
+
+
+class UserItemWeights(Base):
+    """The item weights a user last contributed to song_cooccurrences"""
+    __tablename__ = "user_item_weights"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # Song key -> weight (see services.cooccurrence.item_weights)
+    weights = Column(JSON, default=dict)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
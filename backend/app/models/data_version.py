@@ -0,0 +1,20 @@
+"""
+Per-user data version model
+"""
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class UserDataVersion(Base):
+    """Counters bumped when a user's data changes"""
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Bumped when songs, genres, artists or connections change
+    version = Column(Integer, nullable=False, default=0)
+    # Bumped only when songs, genres or artists change (not connections)
+    taste_version = Column(Integer, nullable=False, default=0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,18 @@
+"""
+Dense taste embedding model (one float32 vector per user)
+"""
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, LargeBinary
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class UserEmbedding(Base):
+    __tablename__ = "user_embeddings"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # L2-normalized float32 vector (settings.EMBEDDING_DIM values), raw bytes
+    vector = Column(LargeBinary, nullable=False)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
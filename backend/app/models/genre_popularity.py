@@ -0,0 +1,30 @@
+"""
+Per-genre song popularity rollups used by song recommendations
+"""
+from sqlalchemy import Column, Integer, String, Float, Index
+from app.core.database import Base
+
+
+class GenreSongStats(Base):
+    """How many users' songs carry a song key within one (lowercased) genre"""
+    __tablename__ = "genre_song_stats"
+
+    genre = Column(String(100), primary_key=True)
+    song_key = Column(String(500), primary_key=True)
+
+    # Aggregates over the Song rows with this genre and key
+    song_count = Column(Integer, nullable=False, default=0)
+    favorite_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0.0)
+    rating_count = Column(Integer, nullable=False, default=0)
+
+    # song_count + favorite_count, indexed so a genre's top songs are a range scan
+    popularity = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_genre_song_stats_genre_popularity", "genre", "popularity"),
+    )
+
+    @property
+    def mean_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
@@ -0,0 +1,31 @@
+"""
+MinHash signature and LSH bucket models used for candidate generation
+"""
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class UserMinHash(Base):
+    __tablename__ = "user_minhashes"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # MinHash signature over the user's song/artist/genre tokens
+    signature = Column(JSON, nullable=False)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class LshBucket(Base):
+    """One row per (band, bucket) a user's signature hashes into"""
+    __tablename__ = "lsh_buckets"
+
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_lsh_buckets_user_id", "user_id"),
+    )
@@ -0,0 +1,56 @@
+"""
+Local MusicBrainz mirror models: artists, recordings and a trigram index
+over their names
+"""
+from sqlalchemy import Column, Integer, String, JSON
+from app.core.database import Base
+
+
+class MirrorArtist(Base):
+    __tablename__ = "mb_artists"
+
+    id = Column(Integer, primary_key=True)
+    mbid = Column(String(36), unique=True, nullable=False)
+    name = Column(String(500), nullable=False)
+    # mirror_normalize(name), for exact and prefix matches
+    normalized_name = Column(String(500), nullable=False, index=True)
+    type = Column(String(50), nullable=True)
+    disambiguation = Column(String(500), nullable=True)
+    country = Column(String(10), nullable=True)
+    # Distinct trigrams of normalized_name (for the similarity denominator)
+    trigram_count = Column(Integer, nullable=False, default=0)
+
+
+class MirrorRecording(Base):
+    __tablename__ = "mb_recordings"
+
+    id = Column(Integer, primary_key=True)
+    mbid = Column(String(36), unique=True, nullable=False)
+    title = Column(String(500), nullable=False)
+    normalized_title = Column(String(500), nullable=False, index=True)
+    # Primary credited artist
+    artist = Column(String(500), nullable=False, default="")
+    normalized_artist = Column(String(500), nullable=False, default="")
+    length = Column(Integer, nullable=True)  # in milliseconds
+    disambiguation = Column(String(500), nullable=True)
+    tags = Column(JSON, nullable=True)
+    releases = Column(JSON, nullable=True)
+    trigram_count = Column(Integer, nullable=False, default=0)
+
+
+class MirrorTrigram(Base):
+    """One row per trigram of an artist name ("artist") or recording title ("recording")"""
+    __tablename__ = "mb_trigrams"
+
+    kind = Column(String(10), primary_key=True)
+    trigram = Column(String(3), primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+
+
+class MirrorTrigramCount(Base):
+    """How many names contain each trigram, so searches can probe the rarest ones"""
+    __tablename__ = "mb_trigram_counts"
+
+    kind = Column(String(10), primary_key=True)
+    trigram = Column(String(3), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,27 @@
+"""
+Per-pair taste overlap counters for incremental similarity updates
+"""
+from sqlalchemy import Column, Integer, ForeignKey
+from app.core.database import Base
+
+
+class UserPairOverlap(Base):
+    """
+    Number of terms of each similarity component two users share
+
+    Only pairs sharing at least one term are stored, in both directions, so
+    a user's pairs are a primary key prefix scan. The diagonal
+    (user_id == other_id) holds the user's own term counts, so the Jaccard
+    union of a component is own + other - shared.
+    """
+    __tablename__ = "user_pair_overlaps"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    other_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # One counter per taste_postings kind
+    genre = Column(Integer, nullable=False, default=0)
+    song_genre = Column(Integer, nullable=False, default=0)
+    artist = Column(Integer, nullable=False, default=0)
+    song = Column(Integer, nullable=False, default=0)
+    favorite = Column(Integer, nullable=False, default=0)
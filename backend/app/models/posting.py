@@ -0,0 +1,19 @@
+"""
+Inverted index model: taste term (song, artist, genre) -> users who have it
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.core.database import Base
+
+
+class TastePosting(Base):
+    __tablename__ = "taste_postings"
+
+    # One of "genre", "artist", "song", "song_genre", "favorite" - the same
+    # components calculate_similarity_score() compares
+    kind = Column(String(20), primary_key=True)
+    term = Column(String(500), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_taste_postings_user_id", "user_id"),
+    )
@@ -0,0 +1,31 @@
+"""
+Stored recommendation rankings, paged through with a cursor
+"""
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON, String
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class RecommendationSnapshot(Base):
+    __tablename__ = "recommendation_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # Random per snapshot and part of its cursors, so a cursor never matches
+    # a later snapshot that reuses the id; NULL on snapshots from before it
+    token = Column(String(32), nullable=True)
+
+    # The owner's UserDataVersion when the ranking was computed
+    data_version = Column(Integer, nullable=False)
+    # Sum of the ranked candidates' taste versions at that time (see
+    # data_versions.sum_taste_versions); NULL on snapshots from before it
+    candidate_version = Column(Integer, nullable=True)
+
+    # Ranking parameters and the ranking itself:
+    # [[user_id, final_score, similarity_score, rating_similarity, song_count], ...]
+    params = Column(JSON, nullable=False)
+    entries = Column(JSON, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,7 +1,7 @@
 """
-Song model
+Song models: per-user songs and the canonical catalog they point at
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -20,6 +20,9 @@ class Song(Base):
     genre = Column(String(100), nullable=True)
     spotify_id = Column(String(100), nullable=True)  # Removed unique constraint for MVP
     
+    # Canonical catalog entry (same normalized title and artist across users)
+    catalog_song_id = Column(Integer, ForeignKey("catalog_songs.id"), nullable=True, index=True)
+    
     # User's relationship with the song
     user_rating = Column(Float, nullable=True)  # User's rating 1-5
     is_favorite = Column(Boolean, default=False)
@@ -29,3 +32,33 @@ class Song(Base):
     
     # Relationships
     user = relationship("User", back_populates="songs")
+    
+    # Per-user listings (/songs/top, /songs/me); added to existing
+    # databases by migration 0003
+    __table_args__ = (
+        Index("ix_songs_user_favorite_rating", "user_id", "is_favorite", "user_rating"),
+        Index("ix_songs_user_created", "user_id", "created_at"),
+    )
+
+
+class Artist(Base):
+    """Interned artist name, shared by every song by that artist"""
+    __tablename__ = "artists"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False)  # As first entered
+    normalized_name = Column(String(200), unique=True, nullable=False)
+
+
+class CatalogSong(Base):
+    """Canonical song: one row per (normalized title, artist)"""
+    __tablename__ = "catalog_songs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String(200), nullable=False)  # As first entered
+    normalized_title = Column(String(200), nullable=False)
+    artist_id = Column(Integer, ForeignKey("artists.id"), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("normalized_title", "artist_id", name="uq_catalog_songs_title_artist"),
+    )
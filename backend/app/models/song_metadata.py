@@ -0,0 +1,38 @@
+"""
+MusicBrainz metadata for catalog songs, and progress of the enrichment job
+"""
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class CatalogSongMetadata(Base):
+    """What MusicBrainz knows about a catalog song (one lookup per distinct title and artist)"""
+    __tablename__ = "catalog_song_metadata"
+
+    catalog_song_id = Column(Integer, ForeignKey("catalog_songs.id"), primary_key=True)
+
+    # "matched", "not_found", or "rejected" (MusicBrainz refused the query)
+    status = Column(String(20), nullable=False)
+    mbid = Column(String(36), nullable=True, index=True)
+    length_ms = Column(Integer, nullable=True)
+    tags = Column(JSON, nullable=True)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class EnrichmentCheckpoint(Base):
+    """Where a resumable enrichment run got to: every catalog song up to last_catalog_song_id is done"""
+    __tablename__ = "enrichment_checkpoints"
+
+    name = Column(String(50), primary_key=True)
+    last_catalog_song_id = Column(Integer, nullable=False, default=0)
+
+    # Running totals across runs
+    matched = Column(Integer, nullable=False, default=0)
+    not_found = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
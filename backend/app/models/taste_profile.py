@@ -0,0 +1,30 @@
+"""
+Taste profile model - precomputed per-user song aggregates used for scoring
+"""
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class UserTasteProfile(Base):
+    __tablename__ = "user_taste_profiles"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # Normalized song keys (see services.taste_profile.song_key) mapped to the
+    # number of Song rows carrying that key, so deletes can be applied incrementally
+    song_keys = Column(JSON, default=dict)
+    favorite_keys = Column(JSON, default=dict)
+
+    # Lowercased song genres mapped to the number of songs with that genre
+    song_genres = Column(JSON, default=dict)
+
+    # Song key -> [song_id, rating] of the most recent rated song with that key
+    ratings = Column(JSON, default=dict)
+
+    # Statistics
+    song_count = Column(Integer, default=0)
+    favorite_count = Column(Integer, default=0)
+
+    # Timestamps
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
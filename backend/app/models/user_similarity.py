@@ -0,0 +1,23 @@
+"""
+Precomputed user similarity model (top-N neighbours per user)
+"""
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class UserSimilarity(Base):
+    __tablename__ = "user_similarity"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+    # Same value calculate_similarity_score() returns for the pair
+    similarity_score = Column(Float, nullable=False)
+
+    # Timestamps
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_user_similarity_user_score", "user_id", "similarity_score"),
+    )
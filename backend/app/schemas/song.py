@@ -28,6 +28,16 @@ class SongUpdate(BaseModel):
     is_favorite: Optional[bool] = None
 
 
+class AutocompleteSuggestion(BaseModel):
+    """A song (title and artist) or an artist (artist only) matching a partial query"""
+    type: str  # "song" or "artist"
+    title: Optional[str] = None
+    artist: str
+    mbid: Optional[str] = None
+    popularity: int = 0  # How many songs in the app reference it
+    source: str  # "library", "musicbrainz_cache" or "musicbrainz"
+
+
 class SongResponse(SongBase):
     id: int
     user_id: int
@@ -0,0 +1,255 @@
+"""
+Autocomplete over known songs and artists
+
+Each worker keeps an in-memory prefix index built from the song catalog
+(every title and artist in songs, ranked by how many songs reference
+them) and from results already in the MusicBrainz response cache. Names
+are indexed under every word they contain, so "beat" finds "The Beatles".
+The keys live in one sorted list searched with binary search: a prefix's
+matches are a contiguous slice, and the most popular of them are picked
+with numpy's argpartition.
+
+The index is rebuilt every AUTOCOMPLETE_RELOAD_SECONDS, so new songs (and
+other workers' cache entries) show up after roughly that long. Rebuilds
+run on a background thread with their own session, one at a time, while
+requests keep searching the previous index; only the very first search
+waits for a build. MusicBrainz itself is only asked when nothing local
+matches.
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.song import Song, Artist, CatalogSong
+from app.models.song_metadata import CatalogSongMetadata
+from app.services import musicbrainz
+from app.services.musicbrainz_mirror import mirror_normalize
+
+# Matches ranked per search, per suggestion requested (an entry can match
+# under several of its words)
+_POOL_PER_RESULT = 4
+
+
+class PrefixIndex:
+    """Immutable sorted-array prefix index over suggestion entries"""
+
+    def __init__(self, entries: List[Dict]):
+        keys = []
+        for entry_id, entry in enumerate(entries):
+            name = entry["normalized"]
+            starts = [0] + [i + 1 for i, char in enumerate(name) if char == " "]
+            keys.extend((name[start:], entry_id) for start in starts)
+        keys.sort()
+        self._entries = entries
+        self._keys = [key for key, _ in keys]
+        self._entry_ids = np.fromiter((entry_id for _, entry_id in keys), dtype=np.int64, count=len(keys))
+        self._popularity = np.fromiter(
+            (entries[entry_id]["popularity"] for _, entry_id in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, prefix: str, limit: int) -> List[Dict]:
+        """The most popular entries with a word starting with `prefix` (normalized)"""
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        if lo == hi:
+            return []
+        pool = min(hi - lo, limit * _POOL_PER_RESULT)
+        if pool < hi - lo:
+            positions = lo + np.argpartition(-self._popularity[lo:hi], pool - 1)[:pool]
+        else:
+            positions = np.arange(lo, hi)
+
+        entry_ids = {int(self._entry_ids[position]) for position in positions}
+        ranked = sorted(
+            (self._entries[entry_id] for entry_id in entry_ids),
+            # Popular first; then names that start with the prefix, shorter first
+            key=lambda entry: (
+                -entry["popularity"],
+                not entry["normalized"].startswith(prefix),
+                len(entry["normalized"]),
+                entry["normalized"]
+            )
+        )
+        return [entry["suggestion"] for entry in ranked[:limit]]
+
+
+def _entry(suggestion: Dict, name: str) -> Dict:
+    return {"normalized": mirror_normalize(name), "popularity": suggestion["popularity"], "suggestion": suggestion}
+
+
+def _load_entries(db: Session) -> Tuple[List[Dict], List[Dict]]:
+    """(song entries, artist entries) from the catalog and the MusicBrainz cache"""
+    songs: Dict[Tuple[str, str], Dict] = {}
+    rows = db.query(
+        CatalogSong.title, Artist.name, CatalogSongMetadata.mbid, func.count(Song.id)
+    ).join(
+        Artist, CatalogSong.artist_id == Artist.id
+    ).join(
+        Song, Song.catalog_song_id == CatalogSong.id
+    ).outerjoin(
+        CatalogSongMetadata, CatalogSongMetadata.catalog_song_id == CatalogSong.id
+    ).group_by(CatalogSong.id, CatalogSong.title, Artist.name, CatalogSongMetadata.mbid).all()
+    for title, artist, mbid, count in rows:
+        key = (mirror_normalize(title), mirror_normalize(artist))
+        if key in songs:
+            # Names that only differ in accents or punctuation
+            songs[key]["popularity"] += count
+        else:
+            songs[key] = {
+                "type": "song", "title": title, "artist": artist,
+                "mbid": mbid, "popularity": count, "source": "library"
+            }
+
+    artists: Dict[str, Dict] = {}
+    rows = db.query(Artist.name, func.count(Song.id)).join(
+        CatalogSong, CatalogSong.artist_id == Artist.id
+    ).join(
+        Song, Song.catalog_song_id == CatalogSong.id
+    ).group_by(Artist.id, Artist.name).all()
+    for name, count in rows:
+        key = mirror_normalize(name)
+        if key in artists:
+            artists[key]["popularity"] += count
+        else:
+            artists[key] = {
+                "type": "artist", "title": None, "artist": name,
+                "mbid": None, "popularity": count, "source": "library"
+            }
+
+    cache = musicbrainz.get_musicbrainz_client().cache
+    if cache is not None:
+        for recordings in cache.cached_values("recording_search"):
+            for recording in recordings:
+                key = (mirror_normalize(recording.get("title")), mirror_normalize(recording.get("artist")))
+                if key[0] and key not in songs:
+                    songs[key] = {
+                        "type": "song", "title": recording["title"], "artist": recording.get("artist") or "",
+                        "mbid": recording.get("mbid"), "popularity": 0, "source": "musicbrainz_cache"
+                    }
+        for found in cache.cached_values("artist_search"):
+            for artist in found:
+                key = mirror_normalize(artist.get("name"))
+                if key and key not in artists:
+                    artists[key] = {
+                        "type": "artist", "title": None, "artist": artist["name"],
+                        "mbid": artist.get("mbid"), "popularity": 0, "source": "musicbrainz_cache"
+                    }
+
+    return (
+        [_entry(song, song["title"]) for song in songs.values()],
+        [_entry(artist, artist["artist"]) for artist in artists.values()]
+    )
+
+
+class AutocompleteIndex:
+    """
+    Song and artist PrefixIndexes, rebuilt in the background when older
+    than `reload_seconds`
+    """
+
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._songs: Optional[PrefixIndex] = None
+        self._artists: Optional[PrefixIndex] = None
+        self._loaded_at = 0.0
+        self._rebuild: Optional[Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autocomplete")
+
+    def _build(self):
+        db = SessionLocal()
+        try:
+            song_entries, artist_entries = _load_entries(db)
+        except Exception as e:
+            print(f"Error rebuilding autocomplete index: {e}")
+            return
+        finally:
+            db.close()
+        songs, artists = PrefixIndex(song_entries), PrefixIndex(artist_entries)
+        with self._lock:
+            self._songs, self._artists = songs, artists
+            self._loaded_at = time.monotonic()
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self._rebuild = None
+
+    def _current(self) -> Tuple[Optional[PrefixIndex], Optional[PrefixIndex], Optional[Future]]:
+        """
+        The current indexes, starting a rebuild if they are missing or old;
+        also returns the running rebuild, if any
+        """
+        with self._lock:
+            stale = self._songs is None or time.monotonic() - self._loaded_at >= self.reload_seconds
+            if stale and self._rebuild is None:
+                self._rebuild = self._executor.submit(self._build)
+                self._rebuild.add_done_callback(self._finished)
+            return self._songs, self._artists, self._rebuild
+
+    async def suggest(self, query: str, limit: int = 8, kind: str = "all") -> List[Dict]:
+        """Local suggestions for a partial song title or artist name, most popular first"""
+        prefix = mirror_normalize(query)
+        if not prefix:
+            return []
+        songs, artists, rebuild = self._current()
+        if songs is None:
+            # Nothing built yet: wait for the first build, off the event loop
+            if rebuild is not None:
+                await asyncio.wrap_future(rebuild)
+            with self._lock:
+                songs, artists = self._songs, self._artists
+            if songs is None:
+                return []
+        suggestions = []
+        if kind in ("all", "song"):
+            suggestions.extend(songs.search(prefix, limit))
+        if kind in ("all", "artist"):
+            suggestions.extend(artists.search(prefix, limit))
+        if kind == "all":
+            # Stable: within equal popularity, songs before artists
+            suggestions.sort(key=lambda suggestion: -suggestion["popularity"])
+        return suggestions[:limit]
+
+    def snapshot_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "songs": len(self._songs) if self._songs is not None else 0,
+                "artists": len(self._artists) if self._artists is not None else 0,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._songs is not None else None,
+            }
+
+
+autocomplete_index = AutocompleteIndex(reload_seconds=settings.AUTOCOMPLETE_RELOAD_SECONDS)
+
+
+async def remote_suggestions(query: str, limit: int = 8, kind: str = "all") -> List[Dict]:
+    """Suggestions straight from MusicBrainz (through its cache and rate limiter)"""
+    recordings, artists = await asyncio.gather(
+        musicbrainz.search_recording(query, None, limit) if kind in ("all", "song") else asyncio.sleep(0, []),
+        musicbrainz.search_artist(query, limit) if kind in ("all", "artist") else asyncio.sleep(0, [])
+    )
+    suggestions = [
+        {
+            "type": "song", "title": recording["title"], "artist": recording["artist"],
+            "mbid": recording["mbid"], "popularity": 0, "source": "musicbrainz"
+        }
+        for recording in recordings
+    ]
+    suggestions.extend(
+        {
+            "type": "artist", "title": None, "artist": artist["name"],
+            "mbid": artist["mbid"], "popularity": 0, "source": "musicbrainz"
+        }
+        for artist in artists
+    )
+    return suggestions[:limit]
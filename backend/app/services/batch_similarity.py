@@ -0,0 +1,275 @@
+"""
+Batch similarity engine for scoring one user against many candidates at once
+
+calculate_similarity_score() scores one pair at a time. This module loads the
+user x genre/artist/song incidence data (from the stored taste profiles) once
+into CSR-style NumPy arrays and computes all five Jaccard components (plus the
+rating similarity) for every candidate in a few vectorized passes.
+Scores are identical to the per-pair functions.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.taste_profile import UserTasteProfile
+from app.services.taste_profile import load_taste_profiles
+
+# Weights used by calculate_similarity_score (kept in the same order so the
+# floating point sums come out bit-for-bit identical)
+COMPONENT_WEIGHTS = (
+    ("genre", 0.15),         # Top genres list
+    ("song_genre", 0.25),    # Genres from actual songs
+    ("artist", 0.30),        # Artists
+    ("song", 0.20),          # All songs
+    ("favorite", 0.10),      # Favorite songs
+)
+COMPONENTS = tuple(name for name, _ in COMPONENT_WEIGHTS)
+
+
+@dataclass
+class _Incidence:
+    """One user x term incidence matrix in CSR form"""
+    vocab: Dict[Hashable, int] = field(default_factory=dict)
+    rows: List[List[int]] = field(default_factory=list)
+    indptr: Optional[np.ndarray] = None
+    indices: Optional[np.ndarray] = None
+    sizes: Optional[np.ndarray] = None
+    _postings: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def add_row(self, terms: Iterable[Hashable]):
+        vocab = self.vocab
+        self.rows.append(sorted({vocab.setdefault(term, len(vocab)) for term in terms}))
+
+    def freeze(self):
+        self.sizes = np.fromiter((len(row) for row in self.rows), dtype=np.int64, count=len(self.rows))
+        self.indptr = np.zeros(len(self.rows) + 1, dtype=np.int64)
+        np.cumsum(self.sizes, out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (term for row in self.rows for term in row), dtype=np.int64, count=int(self.indptr[-1])
+        )
+        self.rows = []
+
+    def postings(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The transposed (CSC) matrix: for each term, the rows containing it"""
+        if self._postings is None:
+            owners = np.repeat(np.arange(len(self.sizes)), self.sizes)
+            order = np.argsort(self.indices, kind="stable")
+            indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.indices, minlength=len(self.vocab)), out=indptr[1:])
+            self._postings = (indptr, owners[order])
+        return self._postings
+
+    def membership(self, row: int) -> np.ndarray:
+        """Boolean mask over the vocabulary for the terms of one row"""
+        mask = np.zeros(len(self.vocab), dtype=bool)
+        mask[self.indices[self.indptr[row]:self.indptr[row + 1]]] = True
+        return mask
+
+
+def _gather(indptr: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of all CSR entries belonging to `rows`, plus the output slot
+    (0..len(rows)-1) each entry belongs to
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, owner
+
+
+def round_scores(values: np.ndarray, digits: int = 3) -> np.ndarray:
+    """
+    Round like the builtin round() - np.round can differ in the last digit,
+    and the per-pair functions use round()
+    """
+    return np.fromiter((round(v, digits) for v in values.tolist()), dtype=np.float64, count=len(values))
+
+
+class TasteMatrix:
+    """
+    Incidence data for a set of users
+
+    Row i describes user_ids[i]. Each component is a CSR matrix over its own
+    vocabulary; ratings are stored as a CSR matrix over song keys.
+    """
+
+    def __init__(self):
+        self.user_ids: List[int] = []
+        self.row_of: Dict[int, int] = {}
+        self.profiles: Dict[int, UserTasteProfile] = {}
+        self.components: Dict[str, _Incidence] = {name: _Incidence() for name in COMPONENTS}
+        self.song_counts: Optional[np.ndarray] = None
+        self.rating_indptr: Optional[np.ndarray] = None
+        self.rating_indices: Optional[np.ndarray] = None
+        self.rating_values: Optional[np.ndarray] = None
+
+    @classmethod
+    def load(cls, users: List[User], db: Session) -> "TasteMatrix":
+        """Load the taste profiles of all `users` in one query and build the matrices"""
+        profiles = load_taste_profiles([user.id for user in users], db)
+
+        matrix = cls()
+        matrix.profiles = profiles
+        song_vocab = matrix.components["song"].vocab
+        rating_rows: List[Dict[int, float]] = []
+        song_counts = []
+        for user in users:
+            profile = profiles[user.id]
+            matrix.row_of[user.id] = len(matrix.user_ids)
+            matrix.user_ids.append(user.id)
+            song_counts.append(profile.song_count or 0)
+
+            matrix.components["genre"].add_row(user.top_genres or [])
+            matrix.components["artist"].add_row(user.favorite_artists or [])
+            matrix.components["song"].add_row(profile.song_keys or {})
+            matrix.components["song_genre"].add_row(profile.song_genres or {})
+            matrix.components["favorite"].add_row(profile.favorite_keys or {})
+            rating_rows.append({
+                song_vocab[key]: rating
+                for key, (_, rating) in (profile.ratings or {}).items()
+            })
+
+        for incidence in matrix.components.values():
+            incidence.freeze()
+        matrix.song_counts = np.asarray(song_counts, dtype=np.int64)
+        matrix._freeze_ratings(rating_rows)
+        return matrix
+
+    def _freeze_ratings(self, rating_rows: List[Dict[int, float]]):
+        sizes = np.fromiter((len(row) for row in rating_rows), dtype=np.int64, count=len(rating_rows))
+        self.rating_indptr = np.zeros(len(rating_rows) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.rating_indptr[1:])
+        total = int(self.rating_indptr[-1])
+        self.rating_indices = np.fromiter((k for row in rating_rows for k in row), dtype=np.int64, count=total)
+        self.rating_values = np.fromiter(
+            (v for row in rating_rows for v in row.values()), dtype=np.float64, count=total
+        )
+
+    def score(self, user_id: int, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Score `user_id` against the given matrix rows (default: every row)
+
+        Returns a dict of arrays aligned with `rows`:
+        - one Jaccard array per component, plus "<component>_common" counts
+        - "similarity_score": same value as calculate_similarity_score()
+        - "rating_similarity": 1 - mean(|rating difference|) / 4 over shared rated songs
+        - "song_count": number of songs each candidate has
+        """
+        query_row = self.row_of[user_id]
+        if rows is None:
+            rows = np.arange(len(self.user_ids))
+        rows = np.asarray(rows, dtype=np.int64)
+
+        result: Dict[str, np.ndarray] = {}
+        similarity = np.zeros(len(rows), dtype=np.float64)
+        for name, weight in COMPONENT_WEIGHTS:
+            incidence = self.components[name]
+            query_mask = incidence.membership(query_row)
+            positions, owner = _gather(incidence.indptr, rows)
+            common = np.bincount(
+                owner, weights=query_mask[incidence.indices[positions]], minlength=len(rows)
+            )
+            union = incidence.sizes[query_row] + incidence.sizes[rows] - common
+            jaccard = common / np.maximum(union, 1)
+            result[name] = jaccard
+            result[f"{name}_common"] = common.astype(np.int64)
+            similarity = similarity + jaccard * weight
+
+        result["similarity_score"] = round_scores(similarity)
+        result["rating_similarity"] = self._rating_similarity(query_row, rows)
+        result["song_count"] = self.song_counts[rows]
+        return result
+
+    def block_similarity(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Unrounded similarity of every row in `rows` against every row
+
+        A blocked sparse product: each (row, term) entry is joined with the
+        term's posting list and the pair counts accumulated into a dense
+        len(rows) x n block, so memory stays proportional to the block size.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        n = len(self.user_ids)
+        similarity = np.zeros((len(rows), n), dtype=np.float64)
+        for name, weight in COMPONENT_WEIGHTS:
+            incidence = self.components[name]
+            posting_indptr, posting_rows = incidence.postings()
+            positions, owner = _gather(incidence.indptr, rows)
+            posting_positions, entry = _gather(posting_indptr, incidence.indices[positions])
+            pairs = owner[entry] * n + posting_rows[posting_positions]
+            common = np.bincount(pairs, minlength=len(rows) * n).reshape(len(rows), n)
+            union = incidence.sizes[rows][:, None] + incidence.sizes[None, :] - common
+            similarity += common / np.maximum(union, 1) * weight
+        return similarity
+
+    def pairwise_similarity(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Unrounded similarity between every pair of `rows` (len(rows) x len(rows))
+
+        Same sparse product as block_similarity(), with the posting entries
+        outside `rows` dropped before counting.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        k = len(rows)
+        column_of = np.full(len(self.user_ids), -1, dtype=np.int64)
+        column_of[rows] = np.arange(k)
+        similarity = np.zeros((k, k), dtype=np.float64)
+        for name, weight in COMPONENT_WEIGHTS:
+            incidence = self.components[name]
+            posting_indptr, posting_rows = incidence.postings()
+            positions, owner = _gather(incidence.indptr, rows)
+            posting_positions, entry = _gather(posting_indptr, incidence.indices[positions])
+            columns = column_of[posting_rows[posting_positions]]
+            inside = columns >= 0
+            pairs = owner[entry[inside]] * k + columns[inside]
+            common = np.bincount(pairs, minlength=k * k).reshape(k, k)
+            sizes = incidence.sizes[rows]
+            union = sizes[:, None] + sizes[None, :] - common
+            similarity += common / np.maximum(union, 1) * weight
+        return similarity
+
+    def upper_bounds(self, user_id: int, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Cheap upper bounds on score() computed from set sizes alone
+
+        |A & B| / |A | B| <= min(|A|, |B|) / max(|A|, |B|), and the rating
+        similarity is at most 1 when both users rated something.
+        """
+        query_row = self.row_of[user_id]
+        rows = np.asarray(rows, dtype=np.int64)
+        similarity = np.zeros(len(rows), dtype=np.float64)
+        for name, weight in COMPONENT_WEIGHTS:
+            sizes = self.components[name].sizes
+            smaller = np.minimum(sizes[query_row], sizes[rows])
+            larger = np.maximum(sizes[query_row], sizes[rows])
+            similarity = similarity + smaller / np.maximum(larger, 1) * weight
+
+        rated = np.diff(self.rating_indptr)
+        rating = ((rated[query_row] > 0) & (rated[rows] > 0)).astype(np.float64)
+        return {
+            "similarity_score": round_scores(similarity),
+            "rating_similarity": rating,
+            "song_count": self.song_counts[rows],
+        }
+
+    def _rating_similarity(self, query_row: int, rows: np.ndarray) -> np.ndarray:
+        """1 - mean(|rating difference|) / 4 over songs both users rated"""
+        query_ratings = np.full(len(self.components["song"].vocab), np.nan)
+        start, end = self.rating_indptr[query_row], self.rating_indptr[query_row + 1]
+        query_ratings[self.rating_indices[start:end]] = self.rating_values[start:end]
+
+        positions, owner = _gather(self.rating_indptr, rows)
+        other = query_ratings[self.rating_indices[positions]]
+        shared = ~np.isnan(other)
+        differences = np.abs(self.rating_values[positions][shared] - other[shared])
+        counts = np.bincount(owner[shared], minlength=len(rows))
+        totals = np.bincount(owner[shared], weights=differences, minlength=len(rows))
+
+        similarity = np.zeros(len(rows), dtype=np.float64)
+        rated = counts > 0
+        similarity[rated] = np.maximum(0.0, 1.0 - (totals[rated] / counts[rated]) / 4.0)
+        return similarity
+
@@ -0,0 +1,102 @@
+"""
+Bulk song loading for recommendation paths
+
+Each function issues a fixed number of queries however many users or songs
+are requested, so the number of queries per recommendation request stays
+constant instead of growing with the number of candidates. Works on SQLite and PostgreSQL.
+"""
+from typing import Dict, List
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+from app.models.song import Song
+from app.services.catalog import catalog_song_ids_for_keys
+
+
+def load_top_songs_by_user(user_ids: List[int], db: Session, per_user: int = 5) -> Dict[int, List[Song]]:
+    """
+    Each user's top songs: their favorites by rating, or, for users without
+    favorites, all their songs by rating and recency
+
+    Uses ROW_NUMBER() OVER (PARTITION BY user_id ...) so every user's top
+    songs come back from one query.
+    """
+    top_songs = {user_id: [] for user_id in user_ids}
+    if not user_ids:
+        return top_songs
+
+    favorite_first = case((Song.is_favorite == True, 1), else_=0)
+    ranked = db.query(
+        Song.id.label("song_id"),
+        favorite_first.label("is_top_favorite"),
+        func.max(favorite_first).over(partition_by=Song.user_id).label("has_favorites"),
+        func.row_number().over(
+            partition_by=Song.user_id,
+            order_by=(
+                favorite_first.desc(),
+                Song.user_rating.desc().nulls_last(),
+                Song.created_at.desc(),
+                Song.id
+            )
+        ).label("position")
+    ).filter(Song.user_id.in_(user_ids)).subquery()
+
+    songs = db.query(Song).join(ranked, Song.id == ranked.c.song_id).filter(
+        ranked.c.position <= per_user,
+        # Users with favorites only show favorites
+        or_(ranked.c.is_top_favorite == 1, ranked.c.has_favorites == 0)
+    ).order_by(Song.user_id, ranked.c.position).all()
+
+    for song in songs:
+        top_songs[song.user_id].append(song)
+    return top_songs
+
+
+def load_common_songs(user_id: int, other_ids: List[int], db: Session) -> Dict[int, List[Song]]:
+    """
+    Songs of `other_ids` that `user_id` also has, grouped by user_id (in id order)
+
+    Matches songs through their catalog entry with a SQL subquery.
+    """
+    common_songs = {other_id: [] for other_id in other_ids}
+    if not other_ids:
+        return common_songs
+    own_catalog_ids = db.query(Song.catalog_song_id).filter(
+        Song.user_id == user_id,
+        Song.catalog_song_id.isnot(None)
+    )
+    songs = db.query(Song).filter(
+        Song.user_id.in_(other_ids),
+        Song.catalog_song_id.in_(own_catalog_ids)
+    ).order_by(Song.user_id, Song.id).all()
+    for song in songs:
+        common_songs[song.user_id].append(song)
+    return common_songs
+
+
+def load_songs_for_keys(keys: List[str], db: Session) -> Dict[str, Song]:
+    """
+    One representative Song row per song key
+
+    The copy owned by the lowest user id wins; among that user's copies a
+    favorite with the highest rating is preferred.
+    """
+    catalog_ids = catalog_song_ids_for_keys(keys, db)
+    if not catalog_ids:
+        return {}
+
+    ranked = db.query(
+        Song.id.label("song_id"),
+        func.row_number().over(
+            partition_by=Song.catalog_song_id,
+            order_by=(
+                Song.user_id,
+                case((Song.is_favorite == True, 1), else_=0).desc(),
+                func.coalesce(Song.user_rating, 0).desc(),
+                Song.id
+            )
+        ).label("position")
+    ).filter(Song.catalog_song_id.in_(list(catalog_ids.values()))).subquery()
+    songs = db.query(Song).join(ranked, Song.id == ranked.c.song_id).filter(ranked.c.position == 1).all()
+
+    key_by_catalog_id = {catalog_id: key for key, catalog_id in catalog_ids.items()}
+    return {key_by_catalog_id[song.catalog_song_id]: song for song in songs}
@@ -0,0 +1,150 @@
+"""
+Canonical song catalog: interned artists and catalog songs
+
+Every user Song points at the CatalogSong with the same normalized title
+and artist (the normalization taste_profile.song_key uses), so songs can
+be matched across users with integer ids and SQL joins instead of
+comparing lowercased strings.
+"""
+from typing import Dict, Iterable, List, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.song import Song, Artist, CatalogSong
+from app.services.taste_profile import SONG_KEY_SEPARATOR
+
+# Values per IN clause
+_CHUNK = 200
+
+
+def normalize(value: str) -> str:
+    """Normalization shared with taste_profile.song_key"""
+    return value.lower()
+
+
+def _intern_artists(names: Dict[str, str], db: Session) -> Dict[str, int]:
+    """normalized name -> artist id, creating missing artists"""
+    normalized = list(names)
+    ids = {}
+    for start in range(0, len(normalized), _CHUNK):
+        rows = db.query(Artist.normalized_name, Artist.id).filter(
+            Artist.normalized_name.in_(normalized[start:start + _CHUNK])
+        ).all()
+        ids.update(rows)
+
+    missing = [Artist(name=names[name], normalized_name=name) for name in normalized if name not in ids]
+    if missing:
+        db.add_all(missing)
+        db.flush()
+        ids.update((artist.normalized_name, artist.id) for artist in missing)
+    return ids
+
+
+def _intern_catalog_songs(
+    titles: Dict[Tuple[str, int], str],
+    db: Session
+) -> Dict[Tuple[str, int], int]:
+    """(normalized title, artist id) -> catalog song id, creating missing entries"""
+    ids = {}
+    keys = list(titles)
+    for start in range(0, len(keys), _CHUNK):
+        chunk = keys[start:start + _CHUNK]
+        rows = db.query(CatalogSong.normalized_title, CatalogSong.artist_id, CatalogSong.id).filter(
+            CatalogSong.artist_id.in_({artist_id for _, artist_id in chunk}),
+            CatalogSong.normalized_title.in_({title for title, _ in chunk})
+        ).all()
+        ids.update(((title, artist_id), song_id) for title, artist_id, song_id in rows if (title, artist_id) in titles)
+
+    missing = [
+        CatalogSong(title=title, normalized_title=key[0], artist_id=key[1])
+        for key, title in titles.items()
+        if key not in ids
+    ]
+    if missing:
+        db.add_all(missing)
+        db.flush()
+        ids.update(((song.normalized_title, song.artist_id), song.id) for song in missing)
+    return ids
+
+
+def intern_songs(pairs: Iterable[Tuple[str, str]], db: Session) -> Dict[Tuple[str, str], int]:
+    """
+    Catalog song ids for (title, artist) pairs, keyed by the normalized pair
+
+    Missing artists and catalog songs are created. Does not commit.
+    """
+    titles_by_pair = {}
+    artist_names = {}
+    for title, artist in pairs:
+        titles_by_pair.setdefault((normalize(title), normalize(artist)), title)
+        artist_names.setdefault(normalize(artist), artist)
+    if not titles_by_pair:
+        return {}
+
+    for attempt in range(2):
+        try:
+            with db.begin_nested():
+                artist_ids = _intern_artists(artist_names, db)
+                catalog_ids = _intern_catalog_songs({
+                    (title, artist_ids[artist]): titles_by_pair[(title, artist)]
+                    for title, artist in titles_by_pair
+                }, db)
+            break
+        except IntegrityError:
+            # A concurrent request created some of the same entries; read theirs
+            if attempt:
+                raise
+
+    return {
+        (title, artist): catalog_ids[(title, artist_ids[artist])]
+        for title, artist in titles_by_pair
+    }
+
+
+def assign_catalog_song(song: Song, db: Session):
+    """Point a (new or edited) song at its catalog entry. Does not commit."""
+    pair = (normalize(song.title), normalize(song.artist))
+    song.catalog_song_id = intern_songs([(song.title, song.artist)], db)[pair]
+
+
+def backfill_catalog(db: Session, batch_size: int = 1000) -> int:
+    """
+    Link every song without a catalog entry, committing per batch
+
+    Safe to interrupt and re-run; returns the number of songs linked.
+    """
+    linked = 0
+    while True:
+        songs = db.query(Song).filter(
+            Song.catalog_song_id.is_(None)
+        ).order_by(Song.id).limit(batch_size).all()
+        if not songs:
+            return linked
+        catalog_ids = intern_songs([(song.title, song.artist) for song in songs], db)
+        for song in songs:
+            song.catalog_song_id = catalog_ids[(normalize(song.title), normalize(song.artist))]
+        db.commit()
+        linked += len(songs)
+
+
+def catalog_song_ids_for_keys(keys: List[str], db: Session) -> Dict[str, int]:
+    """song_key() -> catalog song id, for the keys that are in the catalog"""
+    pairs = {}
+    for key in keys:
+        title, _, artist = key.partition(SONG_KEY_SEPARATOR)
+        pairs[(title, artist)] = key
+
+    ids = {}
+    items = list(pairs)
+    for start in range(0, len(items), _CHUNK):
+        chunk = items[start:start + _CHUNK]
+        rows = db.query(CatalogSong.normalized_title, Artist.normalized_name, CatalogSong.id).join(
+            Artist, CatalogSong.artist_id == Artist.id
+        ).filter(
+            Artist.normalized_name.in_({artist for _, artist in chunk}),
+            CatalogSong.normalized_title.in_({title for title, _ in chunk})
+        ).all()
+        for title, artist, song_id in rows:
+            key = pairs.get((title, artist))
+            if key is not None:
+                ids[key] = song_id
+    return ids
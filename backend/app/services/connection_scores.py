@@ -0,0 +1,123 @@
+"""
+Batch refresh of Connection.similarity_score
+
+A connection's score is computed when it is created, but both users keep
+changing their libraries. Each connection records the taste versions (see
+data_versions.py) of its two users its score was computed from; a
+connection is stale when either user's taste version moved on since.
+Connection changes don't move taste versions, so creating or accepting a
+connection doesn't mark the users' other connections stale. Stale
+connections are found with one query per batch, rescored together from
+the users' taste profiles (TasteMatrix) and written back with one
+executemany UPDATE per batch.
+"""
+import asyncio
+from typing import Dict, Optional
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.connection import Connection
+from app.models.data_version import UserDataVersion
+from app.models.user import User
+from app.services.batch_similarity import TasteMatrix
+
+
+def _stale_connections(db: Session, after_id: int, limit: int, force: bool):
+    """The next stale connections after `after_id`, with their users' current taste versions"""
+    user_version = aliased(UserDataVersion)
+    connected_version = aliased(UserDataVersion)
+    current_user_version = func.coalesce(user_version.taste_version, 0)
+    current_connected_version = func.coalesce(connected_version.taste_version, 0)
+    query = db.query(
+        Connection.id,
+        Connection.user_id,
+        Connection.connected_user_id,
+        Connection.similarity_score,
+        current_user_version.label("user_version"),
+        current_connected_version.label("connected_version")
+    ).outerjoin(
+        user_version, user_version.user_id == Connection.user_id
+    ).outerjoin(
+        connected_version, connected_version.user_id == Connection.connected_user_id
+    ).filter(Connection.id > after_id)
+    if not force:
+        query = query.filter(or_(
+            Connection.score_user_version.is_(None),
+            Connection.score_connected_version.is_(None),
+            Connection.score_user_version != current_user_version,
+            Connection.score_connected_version != current_connected_version
+        ))
+    return query.order_by(Connection.id).limit(limit).all()
+
+
+def refresh_connection_scores(
+    db: Session,
+    batch_size: Optional[int] = None,
+    force: bool = False
+) -> Dict[str, int]:
+    """
+    Rescore every stale connection (every connection with force=True)
+
+    Commits after each batch. Returns how many connections were rescored
+    and how many of their scores actually changed.
+    """
+    batch_size = batch_size or settings.CONNECTION_SCORE_BATCH_SIZE
+    stats = {"rescored": 0, "changed": 0}
+    after_id = 0
+    while True:
+        # Versions are read before the profiles, so a change made meanwhile
+        # leaves the connection stale for the next run instead of hiding it
+        stale = _stale_connections(db, after_id, batch_size, force)
+        if not stale:
+            return stats
+        after_id = stale[-1].id
+
+        user_ids = sorted({row.user_id for row in stale} | {row.connected_user_id for row in stale})
+        users = db.query(User).filter(User.id.in_(user_ids)).all()
+        matrix = TasteMatrix.load(users, db)
+
+        # Score each user against all their connected users in one pass
+        by_user = {}
+        for row in stale:
+            if row.user_id in matrix.row_of and row.connected_user_id in matrix.row_of:
+                by_user.setdefault(row.user_id, []).append(row)
+        scores = {}
+        for user_id, rows in by_user.items():
+            similarity = matrix.score(user_id, [matrix.row_of[row.connected_user_id] for row in rows])
+            scores.update(zip((row.id for row in rows), similarity["similarity_score"].tolist()))
+
+        values = [
+            {
+                "id": row.id,
+                "similarity_score": scores[row.id],
+                "score_user_version": row.user_version,
+                "score_connected_version": row.connected_version,
+            }
+            for row in stale if row.id in scores
+        ]
+        if values:
+            db.execute(update(Connection), values)
+        db.commit()
+        stats["rescored"] += len(values)
+        stats["changed"] += sum(1 for row in stale if row.id in scores and row.similarity_score != scores[row.id])
+
+
+def _refresh_in_new_session() -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        return refresh_connection_scores(db)
+    finally:
+        db.close()
+
+
+async def run_connection_score_refresher(interval: float):
+    """Background task: refresh stale scores every `interval` seconds, off the event loop"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            stats = await asyncio.to_thread(_refresh_in_new_session)
+            if stats["rescored"]:
+                print(f"✓ Rescored {stats['rescored']} connections ({stats['changed']} changed)")
+        except Exception as e:
+            print(f"Error refreshing connection scores: {e}")
@@ -0,0 +1,218 @@
+"""
+Item-item co-occurrence model for song recommendations
+
+Every user adds item_weight(a) * item_weight(b) to each pair of song keys
+in their library, where a song weighs more if it is a favorite or rated
+highly. Since a user's contribution is a product of their item weights,
+a library change only touches the pairs involving songs whose weight
+changed, so the model is kept up to date incrementally from
+taste_changed().
+
+Songs are recommended by their cosine similarity to the user's own songs,
+weighted by the user's item weights.
+"""
+import math
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.cooccurrence import SongCooccurrence, UserItemWeights
+from app.models.song import Song
+from app.models.taste_profile import UserTasteProfile
+from app.models.user import User
+from app.services.counters import add_to_counters, delete_counters
+from app.services.taste_profile import load_taste_profiles
+
+# Item weight = 1 + FAVORITE_BONUS if favorited + RATING_BONUS per rating point
+FAVORITE_BONUS = 1.0
+RATING_BONUS = 0.2
+
+# Keys per IN clause
+_CHUNK = 200
+
+# Pair weights that drop below this (float drift after removals) are deleted
+_EPSILON = 1e-9
+
+Pair = Tuple[str, str]
+
+
+def item_weights(profile: UserTasteProfile) -> Dict[str, float]:
+    """How much each of a user's songs counts towards co-occurrence"""
+    favorites = profile.favorite_keys or {}
+    ratings = profile.ratings or {}
+    weights = {}
+    for key in profile.song_keys or {}:
+        weight = 1.0
+        if key in favorites:
+            weight += FAVORITE_BONUS
+        if key in ratings:
+            weight += ratings[key][1] * RATING_BONUS
+        weights[key] = weight
+    return weights
+
+
+def _pair_deltas(old: Dict[str, float], new: Dict[str, float]) -> Dict[Pair, float]:
+    """Change of each unordered pair (a <= b, diagonal included) between two weight maps"""
+    keys = old.keys() | new.keys()
+    changed = [key for key in keys if old.get(key, 0.0) != new.get(key, 0.0)]
+    deltas = {}
+    for key in changed:
+        for other in keys:
+            pair = (key, other) if key <= other else (other, key)
+            if pair in deltas:
+                continue
+            deltas[pair] = (
+                new.get(key, 0.0) * new.get(other, 0.0) -
+                old.get(key, 0.0) * old.get(other, 0.0)
+            )
+    return {pair: delta for pair, delta in deltas.items() if delta}
+
+
+def _apply_deltas(deltas: Dict[Pair, float], db: Session):
+    """
+    Add pair deltas to the stored model (both directions)
+
+    Weights are incremented in place, so concurrent library changes
+    touching the same pairs add up. Does not commit.
+    """
+    directed = {}
+    for (key, other), delta in deltas.items():
+        directed[(key, other)] = delta
+        directed[(other, key)] = delta
+
+    add_to_counters(db, SongCooccurrence, ("song_key", "other_key"), ("weight",), [
+        {"song_key": key, "other_key": other, "weight": delta}
+        for (key, other), delta in directed.items()
+    ])
+    decreased = [pair for pair, delta in directed.items() if delta < 0]
+    delete_counters(
+        db, SongCooccurrence, ("song_key", "other_key"), decreased,
+        SongCooccurrence.weight < _EPSILON, chunk=_CHUNK
+    )
+
+
+def sync_user_cooccurrence(user_id: int, db: Session, profile: Optional[UserTasteProfile] = None):
+    """
+    Apply the change in a user's item weights since they were last applied
+
+    Call after the user's songs changed. Does not commit.
+    """
+    if profile is None:
+        profile = load_taste_profiles([user_id], db)[user_id]
+    # Row lock: two concurrent syncs for the same user would otherwise both
+    # apply the change relative to the same previous weights
+    state = db.query(UserItemWeights).filter(UserItemWeights.user_id == user_id).with_for_update().first()
+    if state is None:
+        state = UserItemWeights(user_id=user_id, weights={})
+        db.add(state)
+
+    weights = item_weights(profile)
+    deltas = _pair_deltas(state.weights or {}, weights)
+    if deltas:
+        _apply_deltas(deltas, db)
+        state.weights = weights
+
+
+def rebuild_cooccurrence_model(db: Session, batch_size: int = 500) -> int:
+    """
+    Rebuild the whole model from the taste profiles; returns the number of users
+
+    Pair totals are accumulated in memory and written in bulk.
+    """
+    db.query(SongCooccurrence).delete(synchronize_session=False)
+    db.query(UserItemWeights).delete(synchronize_session=False)
+
+    totals: Dict[Pair, float] = {}
+    user_ids = [row[0] for row in db.query(User.id).order_by(User.id).all()]
+    for start in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[start:start + batch_size]
+        profiles = load_taste_profiles(batch_ids, db)
+        states = []
+        for user_id in batch_ids:
+            weights = item_weights(profiles[user_id])
+            for pair, delta in _pair_deltas({}, weights).items():
+                totals[pair] = totals.get(pair, 0.0) + delta
+            states.append({"user_id": user_id, "weights": weights})
+        db.execute(insert(UserItemWeights), states)
+
+    rows = []
+    for (key, other), weight in totals.items():
+        rows.append({"song_key": key, "other_key": other, "weight": weight})
+        if key != other:
+            rows.append({"song_key": other, "other_key": key, "weight": weight})
+    for start in range(0, len(rows), 5000):
+        db.execute(insert(SongCooccurrence), rows[start:start + 5000])
+    db.commit()
+    return len(user_ids)
+
+
+def ensure_cooccurrence_model(db: Session) -> int:
+    """Build the model if it is empty but there are songs (e.g. right after upgrading)"""
+    if db.query(UserItemWeights.user_id).first() is not None:
+        return 0
+    if db.query(Song.id).first() is None:
+        return 0
+    return rebuild_cooccurrence_model(db)
+
+
+def _cooccurrence_rows(keys: List[str], db: Session) -> List[SongCooccurrence]:
+    rows = []
+    for start in range(0, len(keys), _CHUNK):
+        rows.extend(db.query(SongCooccurrence).filter(
+            SongCooccurrence.song_key.in_(keys[start:start + _CHUNK])
+        ).all())
+    return rows
+
+
+def _norms(keys: List[str], db: Session) -> Dict[str, float]:
+    norms = {}
+    for start in range(0, len(keys), _CHUNK):
+        chunk = keys[start:start + _CHUNK]
+        rows = db.query(SongCooccurrence.song_key, SongCooccurrence.weight).filter(
+            SongCooccurrence.song_key.in_(chunk),
+            SongCooccurrence.other_key == SongCooccurrence.song_key
+        ).all()
+        norms.update(rows)
+    return norms
+
+
+def get_cooccurring_song_keys(
+    profile: UserTasteProfile,
+    db: Session,
+    exclude_keys: Set[str],
+    limit: int
+) -> List[Tuple[str, float]]:
+    """
+    The `limit` best (song key, score) pairs the user doesn't have yet
+
+    score(c) = sum over the user's songs k of
+               item_weight(k) * C(k, c) / sqrt(C(k, k) * C(c, c))
+    """
+    weights = item_weights(profile)
+    if not weights:
+        return []
+
+    own_norms = {}
+    partial: Dict[str, List[Tuple[str, float]]] = {}
+    for row in _cooccurrence_rows(list(weights), db):
+        if row.other_key == row.song_key:
+            own_norms[row.song_key] = row.weight
+        elif row.other_key not in weights and row.other_key not in exclude_keys:
+            partial.setdefault(row.other_key, []).append((row.song_key, row.weight))
+    if not partial:
+        return []
+
+    candidate_norms = _norms(list(partial), db)
+    scores = []
+    for candidate, entries in partial.items():
+        candidate_norm = candidate_norms.get(candidate)
+        if not candidate_norm:
+            continue
+        score = sum(
+            weights[key] * weight / math.sqrt(own_norms[key] * candidate_norm)
+            for key, weight in entries
+            if own_norms.get(key)
+        )
+        scores.append((candidate, score))
+    scores.sort(key=lambda item: (-item[1], item[0]))
+    return scores[:limit]
+
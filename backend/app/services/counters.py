@@ -0,0 +1,51 @@
+"""
+Atomic increments for the incrementally maintained counter tables
+
+Counters are changed with INSERT ... ON CONFLICT DO UPDATE SET
+col = col + excluded.col instead of writing back a value computed from an
+earlier read, so concurrent writers touching the same rows add up instead
+of overwriting each other. Works on SQLite (3.24+) and PostgreSQL.
+"""
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Rows per statement
+_BATCH = 5000
+
+
+def add_to_counters(
+    db: Session,
+    model,
+    key_columns: Sequence[str],
+    counter_columns: Sequence[str],
+    rows: List[Dict]
+):
+    """
+    Add each row's counter values to the stored row with the same key,
+    inserting the rows that don't exist yet. Does not commit.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_columns],
+        set_={name: table.c[name] + statement.excluded[name] for name in counter_columns}
+    )
+    # Every writer locks rows in key order, so two of them can't deadlock
+    rows = sorted(rows, key=lambda row: tuple(row[name] for name in key_columns))
+    for start in range(0, len(rows), _BATCH):
+        db.execute(statement, rows[start:start + _BATCH])
+
+
+def delete_counters(db: Session, model, key_columns: Sequence[str], keys: List[Tuple], *conditions, chunk: int = 200):
+    """
+    Delete the rows with the given keys that (still) match `conditions`,
+    e.g. counters that dropped to zero. Does not commit.
+    """
+    key = tuple_(*(getattr(model, name) for name in key_columns))
+    for start in range(0, len(keys), chunk):
+        db.query(model).filter(key.in_(keys[start:start + chunk]), *conditions).delete(synchronize_session=False)
@@ -0,0 +1,52 @@
+"""
+Per-user data versions
+
+A user's version is bumped whenever their songs, genres, artists or
+connections change, so anything derived from that data can record the
+version it was computed from and tell when it is out of date. The taste
+version only moves with songs, genres and artists, for data (like
+similarity scores) that doesn't depend on connections.
+"""
+from typing import List
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models.data_version import UserDataVersion
+
+
+def get_data_version(user_id: int, db: Session) -> int:
+    stored = db.get(UserDataVersion, user_id)
+    return stored.version if stored is not None else 0
+
+
+def get_taste_version(user_id: int, db: Session) -> int:
+    stored = db.get(UserDataVersion, user_id)
+    return stored.taste_version if stored is not None else 0
+
+
+def bump_data_version(user_id: int, db: Session, taste: bool = False):
+    """
+    Mark a user's data as changed; `taste` if their songs, genres or
+    artists changed too. Does not commit.
+    """
+    stored = db.get(UserDataVersion, user_id)
+    if stored is None:
+        db.add(UserDataVersion(user_id=user_id, version=1, taste_version=1 if taste else 0))
+    else:
+        stored.version += 1
+        if taste:
+            stored.taste_version += 1
+
+
+def sum_taste_versions(user_ids: List[int], db: Session) -> int:
+    """
+    Sum of the users' taste versions
+
+    Versions only grow, so the sum changes whenever any of the users'
+    songs, genres or artists change.
+    """
+    total = 0
+    for start in range(0, len(user_ids), 500):
+        total += db.query(func.coalesce(func.sum(UserDataVersion.taste_version), 0)).filter(
+            UserDataVersion.user_id.in_(user_ids[start:start + 500])
+        ).scalar()
+    return total
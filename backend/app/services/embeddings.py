@@ -0,0 +1,261 @@
+"""
+Dense taste embeddings with brute-force k-NN search
+
+Each user gets a fixed-width float32 vector: their top genres, song genres,
+artists and favorite songs are hashed into settings.EMBEDDING_DIM buckets
+(signed feature hashing) with TF-IDF weights, taking document frequencies
+from the taste posting index. Vectors are L2-normalized, so the cosine
+similarity against every user is a single matrix-vector product over the
+contiguous matrix EmbeddingIndex keeps in memory.
+
+An alternative to the Jaccard scorer in similarity.py, selected per request
+with source="embedding".
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.embedding import UserEmbedding
+from app.models.posting import TastePosting
+from app.models.taste_profile import UserTasteProfile
+from app.models.user import User
+from app.services.taste_profile import load_taste_profiles
+
+Term = Tuple[str, str]
+
+# Posting index kinds that make up the embedding
+_TERM_KINDS = ("genre", "song_genre", "artist", "favorite")
+
+# Terms per IN clause
+_CHUNK = 200
+
+
+def embedding_terms(user: User, profile: UserTasteProfile) -> Dict[Term, float]:
+    """(kind, term) -> term frequency, using the posting index's (kind, term) pairs"""
+    terms = {("genre", genre): 1.0 for genre in (user.top_genres or []) if genre}
+    terms.update(
+        (("song_genre", genre), 1.0 + math.log(count))
+        for genre, count in (profile.song_genres or {}).items()
+    )
+    terms.update((("artist", artist), 1.0) for artist in (user.favorite_artists or []) if artist)
+    terms.update((("favorite", key), 1.0) for key in (profile.favorite_keys or {}))
+    return terms
+
+
+def _bucket(term: Term, dim: int) -> Tuple[int, float]:
+    """Hashed dimension and sign of a term"""
+    digest = hashlib.blake2b(f"{term[0]}:{term[1]}".encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, (1.0 if value >> 63 else -1.0)
+
+
+def taste_vector(
+    terms: Dict[Term, float],
+    document_frequencies: Dict[Term, int],
+    user_count: int,
+    dim: Optional[int] = None
+) -> np.ndarray:
+    """L2-normalized TF-IDF vector (all zeros for a user without any terms)"""
+    dim = dim or settings.EMBEDDING_DIM
+    vector = np.zeros(dim, dtype=np.float32)
+    for term, frequency in terms.items():
+        idf = math.log((1 + user_count) / (1 + document_frequencies.get(term, 0))) + 1.0
+        index, sign = _bucket(term, dim)
+        vector[index] += sign * frequency * idf
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def _document_frequencies(terms: List[Term], db: Session) -> Dict[Term, int]:
+    """Number of users listed under each term in the posting index"""
+    frequencies = {}
+    for start in range(0, len(terms), _CHUNK):
+        rows = db.query(TastePosting.kind, TastePosting.term, func.count()).filter(
+            tuple_(TastePosting.kind, TastePosting.term).in_(terms[start:start + _CHUNK])
+        ).group_by(TastePosting.kind, TastePosting.term).all()
+        frequencies.update(((kind, term), count) for kind, term, count in rows)
+    return frequencies
+
+
+def compute_user_embedding(user: User, db: Session, profile: Optional[UserTasteProfile] = None) -> np.ndarray:
+    if profile is None:
+        profile = load_taste_profiles([user.id], db)[user.id]
+    terms = embedding_terms(user, profile)
+    return taste_vector(
+        terms,
+        _document_frequencies(list(terms), db),
+        db.query(func.count(User.id)).scalar()
+    )
+
+
+def update_user_embedding(user: User, db: Session, profile: Optional[UserTasteProfile] = None) -> np.ndarray:
+    """
+    Recompute and store a user's vector; returns it
+
+    Call after the user's songs, genres or artists change (and after their
+    postings were synced). Does not commit; pass the vector to
+    embedding_index.upsert() once committed.
+    """
+    db.flush()
+    vector = compute_user_embedding(user, db, profile)
+    stored = db.get(UserEmbedding, user.id)
+    if stored is None:
+        db.add(UserEmbedding(user_id=user.id, vector=vector.tobytes()))
+    else:
+        stored.vector = vector.tobytes()
+    return vector
+
+
+def rebuild_embeddings(db: Session, batch_size: int = 500) -> int:
+    """Recompute every user's vector; returns the number of users"""
+    document_frequencies = {
+        (kind, term): count
+        for kind, term, count in db.query(
+            TastePosting.kind, TastePosting.term, func.count()
+        ).filter(TastePosting.kind.in_(_TERM_KINDS)).group_by(TastePosting.kind, TastePosting.term)
+    }
+    user_ids = [row[0] for row in db.query(User.id).order_by(User.id).all()]
+
+    db.query(UserEmbedding).delete(synchronize_session=False)
+    for start in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[start:start + batch_size]
+        users = db.query(User).filter(User.id.in_(batch_ids)).all()
+        profiles = load_taste_profiles(batch_ids, db)
+        db.execute(insert(UserEmbedding), [
+            {
+                "user_id": user.id,
+                "vector": taste_vector(
+                    embedding_terms(user, profiles[user.id]), document_frequencies, len(user_ids)
+                ).tobytes(),
+            }
+            for user in users
+        ])
+    db.commit()
+    embedding_index.invalidate()
+    return len(user_ids)
+
+
+def ensure_embeddings(db: Session) -> int:
+    """Build the vectors if there are none yet but there are users"""
+    if db.query(UserEmbedding.user_id).first() is not None:
+        return 0
+    if db.query(User.id).first() is None:
+        return 0
+    return rebuild_embeddings(db)
+
+
+class EmbeddingIndex:
+    """
+    All users' vectors as one contiguous float32 matrix (rows grow in place)
+
+    Loaded lazily from user_embeddings and reloaded every
+    settings.EMBEDDING_RELOAD_SECONDS so other workers' updates show up.
+    """
+
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._user_ids = np.zeros(0, dtype=np.int64)
+        self._row_of: Dict[int, int] = {}
+        self._size = 0
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._matrix = None
+
+    def _load(self, db: Session):
+        dim = settings.EMBEDDING_DIM
+        rows = [
+            (user_id, np.frombuffer(vector, dtype=np.float32))
+            for user_id, vector in db.query(UserEmbedding.user_id, UserEmbedding.vector).order_by(UserEmbedding.user_id)
+        ]
+        rows = [(user_id, vector) for user_id, vector in rows if len(vector) == dim]
+        matrix = np.zeros((max(len(rows), 16), dim), dtype=np.float32)
+        user_ids = np.zeros(len(matrix), dtype=np.int64)
+        for row, (user_id, vector) in enumerate(rows):
+            matrix[row] = vector
+            user_ids[row] = user_id
+        with self._lock:
+            self._matrix = matrix
+            self._user_ids = user_ids
+            self._row_of = {user_id: row for row, (user_id, _) in enumerate(rows)}
+            self._size = len(rows)
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self, db: Session):
+        with self._lock:
+            fresh = (
+                self._matrix is not None
+                and self._matrix.shape[1] == settings.EMBEDDING_DIM
+                and time.monotonic() - self._loaded_at < self.reload_seconds
+            )
+        if not fresh:
+            self._load(db)
+
+    def upsert(self, user_id: int, vector: np.ndarray):
+        """Write one user's (committed) vector into the loaded matrix"""
+        with self._lock:
+            if self._matrix is None or len(vector) != self._matrix.shape[1]:
+                return  # Picked up by the next load
+            row = self._row_of.get(user_id)
+            if row is None:
+                if self._size == len(self._matrix):
+                    self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+                    self._user_ids = np.concatenate([self._user_ids, np.zeros_like(self._user_ids)])
+                row = self._size
+                self._size += 1
+                self._row_of[user_id] = row
+                self._user_ids[row] = user_id
+            self._matrix[row] = vector
+
+    def vector_of(self, user_id: int, db: Session) -> Optional[np.ndarray]:
+        self._ensure_loaded(db)
+        with self._lock:
+            row = self._row_of.get(user_id)
+            return self._matrix[row].copy() if row is not None else None
+
+    def search(self, vector: np.ndarray, db: Session, exclude_ids: Set[int], k: int) -> Dict[int, float]:
+        """The k users with the highest cosine similarity to `vector` (user_id -> score), best first"""
+        self._ensure_loaded(db)
+        with self._lock:
+            user_ids = self._user_ids[:self._size].copy()
+            scores = self._matrix[:self._size] @ vector
+
+        if exclude_ids:
+            scores[np.isin(user_ids, np.fromiter(exclude_ids, dtype=np.int64))] = -np.inf
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return {}
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((user_ids[top], -scores[top]))]
+        # Signed hashing can make unrelated users slightly negative
+        return {int(user_ids[i]): round(max(0.0, float(scores[i])), 3) for i in top}
+
+
+embedding_index = EmbeddingIndex(reload_seconds=settings.EMBEDDING_RELOAD_SECONDS)
+
+
+def get_embedding_neighbors(
+    user: User,
+    db: Session,
+    exclude_ids: Set[int],
+    limit: Optional[int] = None
+) -> Dict[int, float]:
+    """
+    Nearest users by taste vector (user_id -> cosine similarity), best first
+
+    Empty for users without any genres, artists or favorites.
+    """
+    vector = embedding_index.vector_of(user.id, db)
+    if vector is None:
+        vector = compute_user_embedding(user, db)
+    if not vector.any():
+        return {}
+    return embedding_index.search(vector, db, exclude_ids, limit or settings.EMBEDDING_TOP_K)
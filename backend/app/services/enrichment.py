@@ -0,0 +1,167 @@
+"""
+Background MusicBrainz enrichment of the song catalog
+
+Walks catalog_songs (one row per distinct normalized title and artist) in
+id order, in chunks, and resolves each entry once through the shared
+MusicBrainz client, so lookups go through the response cache and the
+background lane of the rate limiter. The MBID, length and tags found are
+stored in catalog_song_metadata; songs link to them via catalog_song_id.
+
+Each chunk's results are committed together with a checkpoint (the last
+catalog song id fully handled), so an interrupted run resumes where it
+stopped. Transient failures (network errors, 5xx, 429) end the run
+without moving the checkpoint past the failed entry; the next run retries
+it. Entries MusicBrainz refuses outright (other 4xx) are recorded as
+"rejected" and not retried.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import httpx
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.song import Artist, CatalogSong
+from app.models.song_metadata import CatalogSongMetadata, EnrichmentCheckpoint
+from app.services.musicbrainz import MusicBrainzClient, get_musicbrainz_client
+from app.services.musicbrainz_rate_limit import BACKGROUND
+
+CHECKPOINT_NAME = "musicbrainz"
+
+
+def _load_checkpoint(db: Session, restart: bool) -> EnrichmentCheckpoint:
+    checkpoint = db.get(EnrichmentCheckpoint, CHECKPOINT_NAME)
+    if checkpoint is None:
+        checkpoint = EnrichmentCheckpoint(
+            name=CHECKPOINT_NAME, last_catalog_song_id=0, matched=0, not_found=0, rejected=0
+        )
+        db.add(checkpoint)
+    elif restart:
+        checkpoint.last_catalog_song_id = 0
+    db.commit()
+    return checkpoint
+
+
+def _pending_songs(db: Session, after_id: int, limit: int) -> List[Tuple[int, str, str]]:
+    """(catalog song id, title, artist name) of the next entries without metadata"""
+    return db.query(CatalogSong.id, CatalogSong.title, Artist.name).join(
+        Artist, CatalogSong.artist_id == Artist.id
+    ).outerjoin(
+        CatalogSongMetadata, CatalogSongMetadata.catalog_song_id == CatalogSong.id
+    ).filter(
+        CatalogSong.id > after_id,
+        CatalogSongMetadata.catalog_song_id.is_(None)
+    ).order_by(CatalogSong.id).limit(limit).all()
+
+
+def _save_chunk(
+    db: Session,
+    checkpoint: EnrichmentCheckpoint,
+    results: List[Tuple[int, str, Optional[Dict]]],
+    last_id: int
+):
+    """Store one chunk's results and advance the checkpoint in a single transaction"""
+    for catalog_song_id, status, details in results:
+        details = details or {}
+        db.merge(CatalogSongMetadata(
+            catalog_song_id=catalog_song_id,
+            status=status,
+            mbid=details.get("mbid"),
+            length_ms=details.get("length"),
+            tags=details.get("tags")
+        ))
+        setattr(checkpoint, status, getattr(checkpoint, status) + 1)
+    checkpoint.last_catalog_song_id = last_id
+    db.commit()
+
+
+async def _resolve(
+    client: MusicBrainzClient,
+    title: str,
+    artist: str,
+    slots: asyncio.Semaphore
+) -> Tuple[str, Optional[Dict]]:
+    """(status, details) for one catalog song; raises on transient errors"""
+    async with slots:
+        try:
+            details = await client.resolve_recording(title, artist, lane=BACKGROUND)
+        except httpx.HTTPStatusError as e:
+            code = e.response.status_code
+            if code >= 500 or code == 429:
+                raise
+            return "rejected", None
+    return ("matched", details) if details else ("not_found", None)
+
+
+async def enrich_catalog(
+    db: Session,
+    client: Optional[MusicBrainzClient] = None,
+    chunk_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    max_songs: Optional[int] = None,
+    restart: bool = False
+) -> Dict[str, int]:
+    """
+    Resolve catalog songs without metadata, resuming from the checkpoint
+
+    `restart` rescans from the first catalog song (entries that already
+    have metadata are still skipped). Database work runs in a worker
+    thread so the event loop stays free. Returns this run's counts.
+    """
+    client = client or get_musicbrainz_client()
+    chunk_size = chunk_size or settings.MUSICBRAINZ_ENRICHMENT_CHUNK_SIZE
+    slots = asyncio.Semaphore(concurrency or settings.MUSICBRAINZ_ENRICHMENT_CONCURRENCY)
+    checkpoint = await asyncio.to_thread(_load_checkpoint, db, restart)
+    after_id = checkpoint.last_catalog_song_id
+    stats = {"processed": 0, "matched": 0, "not_found": 0, "rejected": 0, "failed": 0}
+
+    while max_songs is None or stats["processed"] < max_songs:
+        limit = chunk_size if max_songs is None else min(chunk_size, max_songs - stats["processed"])
+        songs = await asyncio.to_thread(_pending_songs, db, after_id, limit)
+        if not songs:
+            break
+
+        outcomes = await asyncio.gather(
+            *(_resolve(client, title, artist, slots) for _, title, artist in songs),
+            return_exceptions=True
+        )
+        results = []
+        last_id = songs[-1][0]
+        first_error = None
+        for (catalog_song_id, _, _), outcome in zip(songs, outcomes):
+            if isinstance(outcome, BaseException):
+                if first_error is None:
+                    first_error = outcome
+                    # Everything before the first failure is done
+                    last_id = min(last_id, catalog_song_id - 1)
+                stats["failed"] += 1
+                continue
+            status, details = outcome
+            results.append((catalog_song_id, status, details))
+            stats[status] += 1
+        stats["processed"] += len(results)
+
+        await asyncio.to_thread(_save_chunk, db, checkpoint, results, last_id)
+        after_id = last_id
+        if first_error is not None:
+            print(f"Error enriching songs from MusicBrainz (will resume here): {first_error}")
+            break
+
+    return stats
+
+
+async def run_enrichment_job(interval: float):
+    """Background task: enrich new catalog songs every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        db = SessionLocal()
+        try:
+            stats = await enrich_catalog(db)
+            if stats["processed"]:
+                print(
+                    f"✓ Enriched {stats['processed']} catalog songs from MusicBrainz "
+                    f"({stats['matched']} matched)"
+                )
+        except Exception as e:
+            print(f"Error enriching songs from MusicBrainz: {e}")
+        finally:
+            await asyncio.to_thread(db.close)
@@ -0,0 +1,139 @@
+"""
+Genre popularity rollups: per (genre, song key) counts, favorites and ratings
+
+Maintained incrementally by the song routes (record_song_popularity) and
+rebuildable from scratch (rebuild_genre_popularity), so "popular songs in
+the user's favorite genres" is an indexed lookup per genre instead of a
+GROUP BY over the whole songs table.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.models.genre_popularity import GenreSongStats
+from app.models.song import Song
+from app.services.taste_profile import song_key
+
+
+def _contributions(song: Optional[Dict], sign: int, deltas: Dict[Tuple[str, str], List]):
+    if song is None or not song["genre"]:
+        return
+    delta = deltas.setdefault((song["genre"].lower(), song_key(song["title"], song["artist"])), [0, 0, 0.0, 0])
+    delta[0] += sign
+    if song["is_favorite"]:
+        delta[1] += sign
+    if song["user_rating"] is not None:
+        delta[2] += sign * song["user_rating"]
+        delta[3] += sign
+
+
+def record_song_popularity(before: Optional[Dict], after: Optional[Dict], db: Session):
+    """
+    Replace one song's contribution: `before` is removed and `after` added
+
+    Both are snapshot_song() dicts, or None for an added (before) or
+    deleted (after) song. The two are netted per (genre, song key) first,
+    so editing the only copy of a song updates its row instead of deleting
+    and re-adding it. Does not commit.
+    """
+    deltas = {}
+    _contributions(before, -1, deltas)
+    _contributions(after, 1, deltas)
+    for (genre, key), (song_count, favorite_count, rating_sum, rating_count) in deltas.items():
+        stats = db.get(GenreSongStats, (genre, key))
+        if stats is None:
+            if song_count <= 0:
+                continue
+            stats = GenreSongStats(
+                genre=genre, song_key=key, song_count=0, favorite_count=0,
+                rating_sum=0.0, rating_count=0, popularity=0
+            )
+            db.add(stats)
+
+        stats.song_count += song_count
+        stats.favorite_count += favorite_count
+        stats.rating_sum += rating_sum
+        stats.rating_count += rating_count
+        stats.popularity = stats.song_count + stats.favorite_count
+        if stats.song_count <= 0:
+            db.delete(stats)
+
+
+def rebuild_genre_popularity(db: Session) -> int:
+    """Recompute every rollup from the songs table; returns the number of rows"""
+    db.query(GenreSongStats).delete(synchronize_session=False)
+
+    rollups = {}
+    songs = db.query(
+        Song.title, Song.artist, Song.genre, Song.is_favorite, Song.user_rating
+    ).filter(Song.genre.isnot(None), Song.genre != "")
+    for title, artist, genre, is_favorite, user_rating in songs.yield_per(5000):
+        row = rollups.setdefault((genre.lower(), song_key(title, artist)), {
+            "song_count": 0, "favorite_count": 0, "rating_sum": 0.0, "rating_count": 0
+        })
+        row["song_count"] += 1
+        if is_favorite:
+            row["favorite_count"] += 1
+        if user_rating is not None:
+            row["rating_sum"] += user_rating
+            row["rating_count"] += 1
+
+    values = [
+        {"genre": genre, "song_key": key, "popularity": row["song_count"] + row["favorite_count"], **row}
+        for (genre, key), row in rollups.items()
+    ]
+    for start in range(0, len(values), 5000):
+        db.execute(insert(GenreSongStats), values[start:start + 5000])
+    db.commit()
+    return len(values)
+
+
+def ensure_genre_popularity(db: Session) -> int:
+    """Build the rollups if they are empty but some songs have a genre"""
+    if db.query(GenreSongStats.genre).first() is not None:
+        return 0
+    if db.query(Song.id).filter(Song.genre.isnot(None), Song.genre != "").first() is None:
+        return 0
+    return rebuild_genre_popularity(db)
+
+
+def get_popular_song_keys(
+    genres: List[str],
+    db: Session,
+    exclude_keys: Set[str],
+    limit: int
+) -> List[GenreSongStats]:
+    """
+    The most popular songs of each genre, genres taken in the given order
+
+    One indexed query per genre; songs are interleaved across genres so a
+    single genre doesn't fill the whole list.
+    """
+    page_size = limit * 2
+    per_genre = []
+    for genre in genres:
+        query = db.query(GenreSongStats).filter(
+            GenreSongStats.genre == genre.lower()
+        ).order_by(
+            GenreSongStats.popularity.desc(),
+            (GenreSongStats.rating_sum / func.nullif(GenreSongStats.rating_count, 0)).desc().nulls_last(),
+            GenreSongStats.song_key
+        )
+        # Skip songs the user already has, fetching another page if needed
+        kept = []
+        offset = 0
+        while len(kept) < limit:
+            rows = query.offset(offset).limit(page_size).all()
+            kept.extend(row for row in rows if row.song_key not in exclude_keys)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+        per_genre.append(kept[:limit])
+
+    picked = []
+    seen = set()
+    for position in range(limit):
+        for rows in per_genre:
+            if position < len(rows) and rows[position].song_key not in seen:
+                seen.add(rows[position].song_key)
+                picked.append(rows[position])
+    return picked[:limit]
@@ -0,0 +1,159 @@
+"""
+MinHash / LSH candidate index for user recommendations
+
+Each user gets a MinHash signature over their song, artist and genre tokens.
+The signature is split into bands; users whose band values hash to the same
+bucket in at least one band are likely to have a high Jaccard similarity.
+get_user_recommendations() uses the index to pick a bounded candidate set
+instead of scoring every user.
+"""
+import hashlib
+from typing import List, Optional, Set
+import numpy as np
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.minhash import UserMinHash, LshBucket
+from app.models.taste_profile import UserTasteProfile
+from app.models.user import User
+from app.services.taste_profile import load_taste_profiles
+
+# Universal hashing (a * x + b) mod p with a 31-bit Mersenne prime, so the
+# products fit in uint64 without overflowing
+_PRIME = (1 << 31) - 1
+_SEED = 20240601
+
+
+def _permutations(num_perm: int):
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+    b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+    return a, b
+
+
+def _token_hash(token: str) -> int:
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % _PRIME
+
+
+def user_tokens(user: User, profile: UserTasteProfile) -> Set[str]:
+    """Song, artist and genre tokens describing a user's taste"""
+    tokens = {f"s:{key}" for key in (profile.song_keys or {})}
+    tokens.update(f"sg:{genre}" for genre in (profile.song_genres or {}))
+    tokens.update(f"g:{genre}" for genre in (user.top_genres or []) if genre)
+    tokens.update(f"a:{artist}" for artist in (user.favorite_artists or []) if artist)
+    return tokens
+
+
+def minhash_signature(tokens: Set[str], num_perm: Optional[int] = None) -> List[int]:
+    """MinHash signature of a token set (empty list for an empty set)"""
+    if not tokens:
+        return []
+    a, b = _permutations(num_perm or settings.LSH_NUM_PERM)
+    hashes = np.fromiter((_token_hash(token) for token in tokens), dtype=np.uint64, count=len(tokens))
+    values = (np.outer(hashes, a) + b) % np.uint64(_PRIME)
+    return values.min(axis=0).astype(np.int64).tolist()
+
+
+def band_buckets(signature: List[int], bands: Optional[int] = None) -> List[tuple]:
+    """(band, bucket) pairs for a signature"""
+    if not signature:
+        return []
+    bands = bands or settings.LSH_BANDS
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        chunk = ",".join(str(value) for value in signature[band * rows:(band + 1) * rows])
+        digest = hashlib.blake2b(chunk.encode("ascii"), digest_size=8).digest()
+        # Keep it within a signed 64-bit column
+        buckets.append((band, int.from_bytes(digest, "little") >> 1))
+    return buckets
+
+
+def update_user_minhash(user: User, db: Session, profile: Optional[UserTasteProfile] = None):
+    """
+    Recompute a user's signature and LSH buckets
+
+    Call after the user's songs, genres or artists change. Does not commit.
+    """
+    if profile is None:
+        profile = load_taste_profiles([user.id], db)[user.id]
+    signature = minhash_signature(user_tokens(user, profile))
+
+    db.query(LshBucket).filter(LshBucket.user_id == user.id).delete(synchronize_session=False)
+    stored = db.get(UserMinHash, user.id)
+    if not signature:
+        if stored is not None:
+            db.delete(stored)
+        return
+
+    if stored is None:
+        db.add(UserMinHash(user_id=user.id, signature=signature))
+    else:
+        stored.signature = signature
+    db.add_all(
+        LshBucket(band=band, bucket=bucket, user_id=user.id)
+        for band, bucket in band_buckets(signature)
+    )
+
+
+def rebuild_lsh_index(db: Session, batch_size: int = 500) -> int:
+    """Recompute signatures for every user; returns the number of users indexed"""
+    user_ids = [row[0] for row in db.query(User.id).order_by(User.id).all()]
+    indexed = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[start:start + batch_size]
+        users = db.query(User).filter(User.id.in_(batch_ids)).all()
+        profiles = load_taste_profiles(batch_ids, db)
+        for user in users:
+            update_user_minhash(user, db, profiles[user.id])
+            indexed += 1
+        db.commit()
+    return indexed
+
+
+def get_lsh_candidates(
+    user: User,
+    db: Session,
+    exclude_ids: Set[int],
+    max_candidates: Optional[int] = None
+) -> List[int]:
+    """
+    Users sharing at least one LSH bucket with `user`
+
+    Ordered by the number of colliding bands (a rough similarity estimate)
+    and capped at `max_candidates`.
+    """
+    max_candidates = max_candidates or settings.LSH_MAX_CANDIDATES
+    stored = db.get(UserMinHash, user.id)
+    if stored is None:
+        # Not indexed yet (e.g. existing user before the index was built)
+        update_user_minhash(user, db)
+        db.commit()
+        stored = db.get(UserMinHash, user.id)
+        if stored is None:
+            return []
+
+    buckets = band_buckets(stored.signature)
+    collisions = func.count(LshBucket.band)
+    query = db.query(LshBucket.user_id, collisions).filter(
+        tuple_(LshBucket.band, LshBucket.bucket).in_(buckets),
+        LshBucket.user_id != user.id
+    )
+    if exclude_ids:
+        query = query.filter(~LshBucket.user_id.in_(exclude_ids))
+    rows = query.group_by(LshBucket.user_id).order_by(
+        collisions.desc(), LshBucket.user_id
+    ).limit(max_candidates).all()
+    return [row[0] for row in rows]
+
+
+def get_active_user_ids(db: Session, exclude_ids: Set[int], limit: int) -> List[int]:
+    """Cheap top-up source: the users with the most songs"""
+    query = db.query(UserTasteProfile.user_id)
+    if exclude_ids:
+        query = query.filter(~UserTasteProfile.user_id.in_(exclude_ids))
+    rows = query.order_by(
+        UserTasteProfile.song_count.desc(), UserTasteProfile.user_id
+    ).limit(limit).all()
+    return [row[0] for row in rows]
@@ -1,192 +1,404 @@
 """
 MusicBrainz API integration service
 Used to look up song/artist metadata
+
+All requests go through one shared httpx.AsyncClient (a keep-alive
+connection pool opened at app startup) and a rate limiter shared by every
+worker (see musicbrainz_rate_limit), so a request waiting for its slot only
+suspends its own coroutine instead of blocking the event loop. Callers pick
+a lane: interactive lookups are sent ahead of background enrichment.
+
+Parsed results are kept in a persistent MusicBrainzCache, so repeated
+lookups (including ones that found nothing) skip the network entirely.
+Identical lookups that miss the cache at the same time (e.g. many users
+picking the same popular artist during onboarding) share one upstream
+call instead of each queueing for the rate limiter.
+
+With MUSICBRAINZ_MODE "local" the lookups are answered from the local
+mirror (musicbrainz_mirror) instead; "local_first" tries the mirror and
+only goes upstream when it has no match.
 """
+import asyncio
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple, Union
 import httpx
-import time
-from typing import Optional, Dict, List
 from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services import musicbrainz_mirror
+from app.services.musicbrainz_cache import MusicBrainzCache, cache_key, create_musicbrainz_cache
+from app.services.musicbrainz_rate_limit import (
+    BACKGROUND,
+    INTERACTIVE,
+    AsyncRateLimiter,
+    SharedRateLimiter,
+    create_musicbrainz_rate_limiter
+)
 
-# MusicBrainz API base URL
-MUSICBRAINZ_API_URL = "https://musicbrainz.org/ws/2"
-# Rate limit: 1 request per second (be respectful!)
-_last_request_time = 0
-
-
-def _rate_limit():
-    """Enforce rate limiting (1 request per second)"""
-    global _last_request_time
-    current_time = time.time()
-    time_since_last = current_time - _last_request_time
-    if time_since_last < 1.0:
-        time.sleep(1.0 - time_since_last)
-    _last_request_time = time.time()
-
-
-def search_artist(artist_name: str, limit: int = 5) -> List[Dict]:
-    """
-    Search for an artist by name
-    
-    Args:
-        artist_name: Name of the artist to search for
-        limit: Maximum number of results to return
-        
-    Returns:
-        List of artist dictionaries with name, mbid, and other metadata
-    """
-    _rate_limit()
-    
-    try:
-        url = f"{MUSICBRAINZ_API_URL}/artist"
-        params = {
-            "query": f'artist:"{artist_name}"',
-            "limit": limit,
-            "fmt": "json"
+
+def parse_artist(artist: Dict) -> Dict:
+    """Search result shape of an artist (MusicBrainz JSON, from the API or a data dump)"""
+    return {
+        "name": artist.get("name"),
+        "mbid": artist.get("id"),
+        "type": artist.get("type"),
+        "disambiguation": artist.get("disambiguation"),
+        "country": artist.get("country")
+    }
+
+
+def _primary_artist(recording: Dict) -> str:
+    artist_credit = recording.get("artist-credit", [])
+    if artist_credit:
+        return artist_credit[0].get("name", "")
+    return ""
+
+
+def parse_recording(recording: Dict) -> Dict:
+    """Search result shape of a recording"""
+    return {
+        "title": recording.get("title"),
+        "artist": _primary_artist(recording),
+        "mbid": recording.get("id"),
+        "length": recording.get("length"),  # in milliseconds
+        "disambiguation": recording.get("disambiguation")
+    }
+
+
+def parse_recording_details(data: Dict, mbid: Optional[str] = None) -> Dict:
+    """Details shape of a recording, with its tags and releases (albums)"""
+    return {
+        "title": data.get("title"),
+        "artist": _primary_artist(data),
+        "mbid": mbid or data.get("id"),
+        "length": data.get("length"),
+        "tags": [tag.get("name") for tag in data.get("tags", [])],
+        "releases": [
+            {
+                "title": release.get("title"),
+                "date": release.get("date"),
+                "country": release.get("country")
+            }
+            for release in data.get("releases", [])
+        ]
+    }
+
+
+class MusicBrainzClient:
+    """Async MusicBrainz client over a shared connection pool, with an optional response cache"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        min_interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        cache: Optional[MusicBrainzCache] = None,
+        rate_limiter: Optional[Union[SharedRateLimiter, AsyncRateLimiter]] = None,
+        mode: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        max_connections = max_connections or settings.MUSICBRAINZ_MAX_CONNECTIONS
+        self._http = httpx.AsyncClient(
+            base_url=(base_url or settings.MUSICBRAINZ_API_URL).rstrip("/"),
+            headers={"User-Agent": settings.MUSICBRAINZ_USER_AGENT},
+            timeout=timeout or settings.MUSICBRAINZ_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport  # Tests pass an httpx.MockTransport
+        )
+        self.rate_limiter = rate_limiter or AsyncRateLimiter(
+            settings.MUSICBRAINZ_MIN_INTERVAL if min_interval is None else min_interval
+        )
+        self.cache = cache
+        # "remote", "local" (mirror only) or "local_first" (mirror, then upstream)
+        self.mode = mode or settings.MUSICBRAINZ_MODE
+        # cache key -> the upstream lookup currently running for it
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "upstream_calls": 0,
+            "coalesced": 0,
+            "mirror_queries": 0,
+            "mirror_misses": 0,
         }
-        headers = {
-            "User-Agent": "InTune/1.0.0 (https://github.com/yifanliu0108/WIC-Project-team)"
+
+    async def aclose(self):
+        await self._http.aclose()
+        if self.cache is not None:
+            self.cache.close()
+        if isinstance(self.rate_limiter, SharedRateLimiter):
+            self.rate_limiter.close()
+
+    def snapshot_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "mode": self.mode,
+            "in_flight": len(self._in_flight),
+            "rate_limiter": self.rate_limiter.snapshot_stats(),
         }
+
+    async def _get(self, path: str, params: Dict, lane: str = INTERACTIVE) -> Dict:
+        await self.rate_limiter.acquire(lane)
+        self.stats["upstream_calls"] += 1
+        response = await self._http.get(path, params={**params, "fmt": "json"})
+        response.raise_for_status()
+        return response.json()
+
+    async def _from_mirror(self, query: Callable, *args) -> Tuple[bool, Any]:
+        """
+        (answered, result) of a mirror query, run in a worker thread
+
+        answered is False in remote mode, or in local_first mode when the
+        mirror has no match (the caller then goes upstream).
+        """
+        if self.mode == "remote":
+            return False, None
+        self.stats["mirror_queries"] += 1
+        result = await asyncio.to_thread(_run_mirror_query, query, *args)
+        if not result:
+            self.stats["mirror_misses"] += 1
+            if self.mode == "local_first":
+                return False, None
+        return True, result
+
+    async def _lookup(self, endpoint: str, params: Dict, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached, single-flight lookup
+
+        On a cache miss, concurrent callers asking for the same thing share
+        one call to `fetch` and all get its result (or its exception). The
+        shared call is shielded, so a caller that goes away doesn't cancel
+        it for the others. The result is shared and must not be modified.
+        The call is sent in the lane of the caller that started it.
+        """
+        if self.cache is not None:
+            hit, cached = await self.cache.aget(endpoint, params)
+            if hit:
+                return cached
+
+        key = cache_key(endpoint, params)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.ensure_future(self._fetch_and_store(endpoint, params, fetch))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(self, endpoint: str, params: Dict, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        if self.cache is not None:
+            await self.cache.aput(endpoint, params, value)
+        return value
+
+    async def search_artist(self, artist_name: str, limit: int = 5, lane: str = INTERACTIVE) -> List[Dict]:
+        """
+        Search for an artist by name
         
-        with httpx.Client() as client:
-            response = client.get(url, params=params, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        Args:
+            artist_name: Name of the artist to search for
+            limit: Maximum number of results to return
+            lane: Rate limiter lane (INTERACTIVE or BACKGROUND)
             
-            artists = []
-            for artist in data.get("artists", []):
-                artists.append({
-                    "name": artist.get("name"),
-                    "mbid": artist.get("id"),
-                    "type": artist.get("type"),
-                    "disambiguation": artist.get("disambiguation"),
-                    "country": artist.get("country")
-                })
-            return artists
-    except Exception as e:
-        print(f"Error searching artist: {e}")
-        return []
-
-
-def search_recording(song_title: str, artist_name: Optional[str] = None, limit: int = 5) -> List[Dict]:
-    """
-    Search for a recording (song) by title and optionally artist
-    
-    Args:
-        song_title: Title of the song
-        artist_name: Optional artist name to narrow search
-        limit: Maximum number of results to return
+        Returns:
+            List of artist dictionaries with name, mbid, and other metadata
+        """
+        try:
+            answered, artists = await self._from_mirror(musicbrainz_mirror.search_artists, artist_name, limit)
+            if answered:
+                return artists
+            return await self._lookup(
+                "artist_search",
+                {"artist": artist_name, "limit": limit},
+                lambda: self._fetch_artists(artist_name, limit, lane)
+            )
+        except Exception as e:
+            print(f"Error searching artist: {e}")
+            return []
+
+    async def _fetch_artists(self, artist_name: str, limit: int, lane: str) -> List[Dict]:
+        data = await self._get("/artist", {"query": f'artist:"{artist_name}"', "limit": limit}, lane)
+        return [parse_artist(artist) for artist in data.get("artists", [])]
+
+    async def search_recording(
+        self,
+        song_title: str,
+        artist_name: Optional[str] = None,
+        limit: int = 5,
+        lane: str = INTERACTIVE
+    ) -> List[Dict]:
+        """
+        Search for a recording (song) by title and optionally artist
         
-    Returns:
-        List of recording dictionaries with title, artist, mbid, etc.
-    """
-    _rate_limit()
-    
-    try:
-        url = f"{MUSICBRAINZ_API_URL}/recording"
+        Args:
+            song_title: Title of the song
+            artist_name: Optional artist name to narrow search
+            limit: Maximum number of results to return
+            lane: Rate limiter lane (INTERACTIVE or BACKGROUND)
+            
+        Returns:
+            List of recording dictionaries with title, artist, mbid, etc.
+        """
+        try:
+            answered, recordings = await self._from_mirror(
+                musicbrainz_mirror.search_recordings, song_title, artist_name, limit
+            )
+            if answered:
+                return recordings
+            return await self._lookup(
+                "recording_search",
+                {"title": song_title, "artist": artist_name, "limit": limit},
+                lambda: self._fetch_recordings(song_title, artist_name, limit, lane)
+            )
+        except Exception as e:
+            print(f"Error searching recording: {e}")
+            return []
+
+    async def _fetch_recordings(
+        self,
+        song_title: str,
+        artist_name: Optional[str],
+        limit: int,
+        lane: str
+    ) -> List[Dict]:
         query = f'recording:"{song_title}"'
         if artist_name:
             query += f' AND artist:"{artist_name}"'
+        data = await self._get("/recording", {"query": query, "limit": limit}, lane)
+        return [parse_recording(recording) for recording in data.get("recordings", [])]
+
+    async def get_recording_details(self, mbid: str, lane: str = INTERACTIVE) -> Optional[Dict]:
+        """
+        Get detailed information about a recording by MBID
         
-        params = {
-            "query": query,
-            "limit": limit,
-            "fmt": "json"
-        }
-        headers = {
-            "User-Agent": "InTune/1.0.0 (https://github.com/yifanliu0108/WIC-Project-team)"
-        }
-        
-        with httpx.Client() as client:
-            response = client.get(url, params=params, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
+        Args:
+            mbid: MusicBrainz ID of the recording
+            lane: Rate limiter lane (INTERACTIVE or BACKGROUND)
             
-            recordings = []
-            for recording in data.get("recordings", []):
-                # Get primary artist
-                artist_credit = recording.get("artist-credit", [])
-                artist_name_mb = ""
-                if artist_credit:
-                    artist_name_mb = artist_credit[0].get("name", "")
-                
-                recordings.append({
-                    "title": recording.get("title"),
-                    "artist": artist_name_mb,
-                    "mbid": recording.get("id"),
-                    "length": recording.get("length"),  # in milliseconds
-                    "disambiguation": recording.get("disambiguation")
-                })
-            return recordings
-    except Exception as e:
-        print(f"Error searching recording: {e}")
-        return []
-
-
-def get_recording_details(mbid: str) -> Optional[Dict]:
-    """
-    Get detailed information about a recording by MBID
-    
-    Args:
-        mbid: MusicBrainz ID of the recording
-        
-    Returns:
-        Dictionary with detailed recording information
-    """
-    _rate_limit()
-    
-    try:
-        url = f"{MUSICBRAINZ_API_URL}/recording/{mbid}"
-        params = {
-            "inc": "artists+releases+tags",
-            "fmt": "json"
-        }
-        headers = {
-            "User-Agent": "InTune/1.0.0 (https://github.com/yifanliu0108/WIC-Project-team)"
-        }
+        Returns:
+            Dictionary with detailed recording information
+        """
+        try:
+            answered, details = await self._from_mirror(musicbrainz_mirror.recording_details, mbid)
+            if answered:
+                return details
+            return await self._lookup("recording", {"mbid": mbid}, lambda: self._fetch_recording(mbid, lane))
+        except Exception as e:
+            print(f"Error getting recording details: {e}")
+            return None
+
+    async def _fetch_recording(self, mbid: str, lane: str) -> Optional[Dict]:
+        try:
+            data = await self._get(f"/recording/{mbid}", {"inc": "artists+releases+tags"}, lane)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 404:
+                raise
+            # Unknown MBID: returning None caches it as a miss
+            print(f"Error getting recording details: {e}")
+            return None
+        return parse_recording_details(data, mbid)
+
+    async def lookup_song_info(
+        self,
+        song_title: str,
+        artist_name: Optional[str] = None,
+        lane: str = INTERACTIVE
+    ) -> Optional[Dict]:
+        """
+        Convenience function to look up song information
+        Returns the best match with metadata
         
-        with httpx.Client() as client:
-            response = client.get(url, params=params, headers=headers, timeout=10.0)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract genres/tags
-            tags = [tag.get("name") for tag in data.get("tags", [])]
+        Args:
+            song_title: Title of the song
+            artist_name: Optional artist name
+            lane: Rate limiter lane (INTERACTIVE or BACKGROUND)
             
-            # Get releases (albums)
-            releases = []
-            for release in data.get("releases", []):
-                releases.append({
-                    "title": release.get("title"),
-                    "date": release.get("date"),
-                    "country": release.get("country")
-                })
-            
-            return {
-                "title": data.get("title"),
-                "artist": data.get("artist-credit", [{}])[0].get("name", "") if data.get("artist-credit") else "",
-                "mbid": mbid,
-                "length": data.get("length"),
-                "tags": tags,
-                "releases": releases
-            }
-    except Exception as e:
-        print(f"Error getting recording details: {e}")
+        Returns:
+            Dictionary with song information or None if not found
+        """
+        recordings = await self.search_recording(song_title, artist_name, limit=1, lane=lane)
+        if recordings:
+            return recordings[0]
         return None
 
+    async def resolve_recording(
+        self,
+        song_title: str,
+        artist_name: str,
+        lane: str = BACKGROUND
+    ) -> Optional[Dict]:
+        """
+        Best matching recording with its details (mbid, length, tags, releases)
 
-def lookup_song_info(song_title: str, artist_name: Optional[str] = None) -> Optional[Dict]:
-    """
-    Convenience function to look up song information
-    Returns the best match with metadata
-    
-    Args:
-        song_title: Title of the song
-        artist_name: Optional artist name
-        
-    Returns:
-        Dictionary with song information or None if not found
-    """
-    recordings = search_recording(song_title, artist_name, limit=1)
-    if recordings:
-        return recordings[0]
-    return None
+        Goes through the same cache entries as lookup_song_info() and
+        get_recording_details(). Returns None when MusicBrainz has no match;
+        unlike the lookups above, request errors are raised, so callers can
+        retry later instead of taking an outage for "not found".
+        """
+        answered, details = await self._from_mirror(musicbrainz_mirror.resolve_recording, song_title, artist_name)
+        if answered:
+            return details
+        recordings = await self._lookup(
+            "recording_search",
+            {"title": song_title, "artist": artist_name, "limit": 1},
+            lambda: self._fetch_recordings(song_title, artist_name, 1, lane)
+        )
+        if not recordings or not recordings[0].get("mbid"):
+            return None
+        mbid = recordings[0]["mbid"]
+        details = await self._lookup("recording", {"mbid": mbid}, lambda: self._fetch_recording(mbid, lane))
+        if details is None:
+            return None
+        return {**details, "length": details.get("length") or recordings[0].get("length")}
+
+
+def _run_mirror_query(query: Callable, *args) -> Any:
+    db = SessionLocal()
+    try:
+        return query(*args, db)
+    finally:
+        db.close()
+
+
+_client: Optional[MusicBrainzClient] = None
+
+
+def _create_client() -> MusicBrainzClient:
+    return MusicBrainzClient(cache=create_musicbrainz_cache(), rate_limiter=create_musicbrainz_rate_limiter())
+
+
+async def start_musicbrainz_client():
+    """Open the shared client (app startup)"""
+    global _client
+    if _client is None:
+        _client = _create_client()
+
+
+async def close_musicbrainz_client():
+    """Close the shared client's connections (app shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_musicbrainz_client() -> MusicBrainzClient:
+    """The shared client (opened on first use outside the app, e.g. in scripts)"""
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+async def search_artist(artist_name: str, limit: int = 5) -> List[Dict]:
+    return await get_musicbrainz_client().search_artist(artist_name, limit)
+
+
+async def search_recording(song_title: str, artist_name: Optional[str] = None, limit: int = 5) -> List[Dict]:
+    return await get_musicbrainz_client().search_recording(song_title, artist_name, limit)
+
+
+async def get_recording_details(mbid: str) -> Optional[Dict]:
+    return await get_musicbrainz_client().get_recording_details(mbid)
+
+
+async def lookup_song_info(song_title: str, artist_name: Optional[str] = None) -> Optional[Dict]:
+    return await get_musicbrainz_client().lookup_song_info(song_title, artist_name)
@@ -0,0 +1,184 @@
+"""
+Persistent TTL cache for MusicBrainz responses
+
+Parsed results are stored in a local SQLite file, so they survive restarts
+and are shared by every worker on the machine. Entries are keyed on the
+endpoint plus its normalized parameters and expire after a per-endpoint
+TTL. Empty results (no match, unknown MBID) are cached too, with a shorter
+TTL, so repeated misses don't go back to the network. When the file holds
+more than max_entries the least recently used entries are evicted.
+
+Lookups run in a worker thread so disk access never blocks the event loop.
+"""
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# Marks a cached "no such thing" (e.g. an unknown MBID)
+_MISSING = "null"
+
+
+def cache_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """Endpoint plus its parameters, case-folded and whitespace-collapsed, in a stable order"""
+    normalized = {
+        name: re.sub(r"\s+", " ", value.strip()).casefold() if isinstance(value, str) else value
+        for name, value in params.items()
+        if value is not None
+    }
+    return f"{endpoint}:{json.dumps(normalized, sort_keys=True, ensure_ascii=False)}"
+
+
+class MusicBrainzCache:
+    """SQLite-backed LRU + TTL cache (thread-safe; usable from several processes)"""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        ttls: Dict[str, float],
+        negative_ttl: float
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS musicbrainz_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_musicbrainz_cache_last_used ON musicbrainz_cache (last_used)"
+        )
+        self._size = self._count()
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def _count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM musicbrainz_cache").fetchone()[0]
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> Tuple[bool, Any]:
+        """(True, value) on a fresh hit, (False, None) otherwise"""
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM musicbrainz_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return False, None
+            value, expires_at = row
+            if expires_at <= now:
+                self._connection.execute("DELETE FROM musicbrainz_cache WHERE key = ?", (key,))
+                self._size -= 1
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return False, None
+            self._connection.execute("UPDATE musicbrainz_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.stats["negative_hits" if value in (_MISSING, "[]") else "hits"] += 1
+        return True, json.loads(value)
+
+    def put(self, endpoint: str, params: Dict[str, Any], value: Any):
+        """Store a parsed response; None or an empty list is cached with the negative TTL"""
+        key = cache_key(endpoint, params)
+        now = time.time()
+        ttl = self.negative_ttl if not value else self.ttls.get(endpoint, self.negative_ttl)
+        with self._lock:
+            inserted = self._connection.execute(
+                "INSERT OR IGNORE INTO musicbrainz_cache (key, endpoint, value, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, json.dumps(value), now + ttl, now)
+            ).rowcount
+            if not inserted:
+                self._connection.execute(
+                    "UPDATE musicbrainz_cache SET value = ?, expires_at = ?, last_used = ? WHERE key = ?",
+                    (json.dumps(value), now + ttl, now, key)
+                )
+            self._size += inserted
+            self.stats["stores"] += 1
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries; caller holds the lock"""
+        # Other processes write to the same file, so recount first
+        self._size = self._count()
+        excess = self._size - self.max_entries
+        if excess <= 0:
+            return
+        self._connection.execute(
+            "DELETE FROM musicbrainz_cache WHERE key IN "
+            "(SELECT key FROM musicbrainz_cache ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._size -= excess
+        self.stats["evictions"] += excess
+
+    def cached_values(self, endpoint: str) -> List[Any]:
+        """Every unexpired, non-empty value cached for `endpoint` (no stats or LRU updates)"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT value FROM musicbrainz_cache WHERE endpoint = ? AND expires_at > ? AND value NOT IN (?, '[]')",
+                (endpoint, time.time(), _MISSING)
+            ).fetchall()
+        return [json.loads(value) for (value,) in rows]
+
+    async def aget(self, endpoint: str, params: Dict[str, Any]) -> Tuple[bool, Any]:
+        return await asyncio.to_thread(self.get, endpoint, params)
+
+    async def aput(self, endpoint: str, params: Dict[str, Any], value: Any):
+        await asyncio.to_thread(self.put, endpoint, params, value)
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM musicbrainz_cache")
+            self._size = 0
+
+    def snapshot_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "hit_rate": round((self.stats["hits"] + self.stats["negative_hits"]) / lookups, 3) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def create_musicbrainz_cache() -> Optional[MusicBrainzCache]:
+    """The cache configured in settings (None when MUSICBRAINZ_CACHE_PATH is empty)"""
+    if not settings.MUSICBRAINZ_CACHE_PATH:
+        return None
+    return MusicBrainzCache(
+        path=settings.MUSICBRAINZ_CACHE_PATH,
+        max_entries=settings.MUSICBRAINZ_CACHE_MAX_ENTRIES,
+        ttls={
+            "artist_search": settings.MUSICBRAINZ_CACHE_SEARCH_TTL,
+            "recording_search": settings.MUSICBRAINZ_CACHE_SEARCH_TTL,
+            "recording": settings.MUSICBRAINZ_CACHE_RECORDING_TTL,
+        },
+        negative_ttl=settings.MUSICBRAINZ_CACHE_NEGATIVE_TTL
+    )
@@ -0,0 +1,374 @@
+"""
+Local MusicBrainz mirror: offline artist/recording search
+
+Artists and recordings from a MusicBrainz JSON data dump (or any subset of
+it) are loaded into mb_artists / mb_recordings, with every name broken into
+trigrams in mb_trigrams. A search combines two indexed lookups:
+
+- prefix: a range scan over the normalized name ("radioh" finds "radiohead")
+- trigram: names sharing the most trigrams with the query, which tolerates
+  typos and word order ("radiohaed", "beatles the")
+
+A name similar enough to the query must contain at least one of its
+rarest trigrams, so only those posting lists are read; very common
+trigrams ("the") are never scanned. Per-trigram counts are kept in
+mb_trigram_counts for this.
+
+Candidates are ranked by trigram (Jaccard) similarity, with exact and
+prefix matches first. Results have the same shapes as the MusicBrainz API
+lookups in musicbrainz.py, so the client can answer from the mirror.
+"""
+import bz2
+import gzip
+import json
+import lzma
+import math
+import os
+import re
+import tarfile
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from app.models.musicbrainz_mirror import MirrorArtist, MirrorRecording, MirrorTrigram, MirrorTrigramCount
+
+# A candidate must share at least this fraction of the query's trigrams
+MIN_SIMILARITY = 0.3
+# Candidates fetched per search, per limit requested
+_CANDIDATES_PER_RESULT = 10
+# Values per IN clause
+_CHUNK = 500
+
+
+def mirror_normalize(text: Optional[str]) -> str:
+    """Lowercase, accents and punctuation removed, whitespace collapsed"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", text.casefold()).strip()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """Trigrams of a normalized string, padded so short names still get some"""
+    if not normalized:
+        return set()
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(query_trigrams: Set[str], normalized: str) -> float:
+    """Jaccard similarity of trigram sets"""
+    other = trigrams(normalized)
+    if not query_trigrams or not other:
+        return 0.0
+    shared = len(query_trigrams & other)
+    return shared / (len(query_trigrams) + len(other) - shared)
+
+
+# --- Loading -----------------------------------------------------------------
+
+def read_dump(path: str) -> Iterator[Dict]:
+    """
+    Entities from a MusicBrainz JSON dump: one JSON object per line
+
+    Accepts the dump archives as downloaded (artist.tar.xz, whose
+    mbdump/artist member holds the lines), or plain, .gz, .xz or .bz2
+    line files such as an extracted subset.
+    """
+    if ".tar" in path:
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and member.name.startswith("mbdump/"):
+                    yield from _json_lines(archive.extractfile(member))
+        return
+    opener = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}.get(os.path.splitext(path)[1], open)
+    with opener(path, "rb") as lines:
+        yield from _json_lines(lines)
+
+
+def _json_lines(lines) -> Iterator[Dict]:
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _insert_entities(
+    model,
+    kind: str,
+    rows: List[Dict],
+    normalized_field: str,
+    db: Session
+) -> int:
+    """Insert one batch of entities (skipping MBIDs already mirrored) and their trigrams"""
+    rows = list({row["mbid"]: row for row in rows if row.get("mbid")}.values())
+    existing = {
+        mbid for (mbid,) in db.query(model.mbid).filter(model.mbid.in_([row["mbid"] for row in rows]))
+    }
+    rows = [row for row in rows if row["mbid"] not in existing]
+    if not rows:
+        return 0
+    for row in rows:
+        row["trigram_count"] = len(trigrams(row[normalized_field]))
+    db.execute(insert(model), rows)
+
+    ids = dict(db.query(model.mbid, model.id).filter(model.mbid.in_([row["mbid"] for row in rows])))
+    postings = [
+        {"kind": kind, "trigram": trigram, "entity_id": ids[row["mbid"]]}
+        for row in rows
+        for trigram in trigrams(row[normalized_field])
+    ]
+    db.execute(insert(MirrorTrigram), postings)
+    _add_trigram_counts(kind, Counter(posting["trigram"] for posting in postings), db)
+    return len(rows)
+
+
+def _add_trigram_counts(kind: str, added: Counter, db: Session):
+    """Bump mb_trigram_counts by `added`, inserting trigrams seen for the first time"""
+    stored = {}
+    new_trigrams = list(added)
+    for start in range(0, len(new_trigrams), _CHUNK):
+        stored.update(db.query(MirrorTrigramCount.trigram, MirrorTrigramCount.count).filter(
+            MirrorTrigramCount.kind == kind,
+            MirrorTrigramCount.trigram.in_(new_trigrams[start:start + _CHUNK])
+        ))
+    updates = [
+        {"kind": kind, "trigram": trigram, "count": stored[trigram] + count}
+        for trigram, count in added.items()
+        if trigram in stored
+    ]
+    inserts = [
+        {"kind": kind, "trigram": trigram, "count": count}
+        for trigram, count in added.items()
+        if trigram not in stored
+    ]
+    if updates:
+        db.execute(update(MirrorTrigramCount), updates)
+    if inserts:
+        db.execute(insert(MirrorTrigramCount), inserts)
+
+
+def _load(
+    model,
+    kind: str,
+    to_row,
+    normalized_field: str,
+    entities: Iterable[Dict],
+    db: Session,
+    batch_size: int
+) -> int:
+    loaded = 0
+    batch = []
+    for entity in entities:
+        batch.append(to_row(entity))
+        if len(batch) >= batch_size:
+            loaded += _insert_entities(model, kind, batch, normalized_field, db)
+            db.commit()
+            batch = []
+    if batch:
+        loaded += _insert_entities(model, kind, batch, normalized_field, db)
+        db.commit()
+    return loaded
+
+
+def _artist_row(artist: Dict) -> Dict:
+    return {
+        "mbid": artist["mbid"],
+        "name": artist["name"] or "",
+        "normalized_name": mirror_normalize(artist["name"]),
+        "type": artist.get("type"),
+        "disambiguation": artist.get("disambiguation"),
+        "country": artist.get("country"),
+    }
+
+
+def _recording_row(recording: Dict) -> Dict:
+    return {
+        "mbid": recording["mbid"],
+        "title": recording["title"] or "",
+        "normalized_title": mirror_normalize(recording["title"]),
+        "artist": recording.get("artist") or "",
+        "normalized_artist": mirror_normalize(recording.get("artist")),
+        "length": recording.get("length"),
+        "disambiguation": recording.get("disambiguation"),
+        "tags": recording.get("tags") or [],
+        "releases": recording.get("releases") or [],
+    }
+
+
+def load_artists(artists: Iterable[Dict], db: Session, batch_size: int = 1000) -> int:
+    """
+    Mirror artists given in search result shape (musicbrainz.parse_artist)
+
+    Commits per batch; MBIDs already mirrored are skipped, so an
+    interrupted load can be re-run. Returns the number of artists added.
+    """
+    return _load(MirrorArtist, "artist", _artist_row, "normalized_name", artists, db, batch_size)
+
+
+def load_recordings(recordings: Iterable[Dict], db: Session, batch_size: int = 1000) -> int:
+    """Mirror recordings given in details shape (musicbrainz.parse_recording_details); see load_artists()"""
+    return _load(MirrorRecording, "recording", _recording_row, "normalized_title", recordings, db, batch_size)
+
+
+def clear_mirror(db: Session):
+    """Delete every mirrored entity. Does not commit."""
+    for model in (MirrorTrigram, MirrorTrigramCount, MirrorArtist, MirrorRecording):
+        db.query(model).delete(synchronize_session=False)
+
+
+def mirror_counts(db: Session) -> Dict[str, int]:
+    return {
+        "artists": db.query(func.count(MirrorArtist.id)).scalar(),
+        "recordings": db.query(func.count(MirrorRecording.id)).scalar(),
+    }
+
+
+# --- Search ------------------------------------------------------------------
+
+def _candidate_ids(model, kind: str, column, query: str, limit: int, db: Session) -> Set[int]:
+    """Ids whose normalized name starts with the query or shares many trigrams with it"""
+    ids = {
+        entity_id for (entity_id,) in db.query(model.id).filter(
+            column >= query,
+            column < query + "\uffff"
+        ).order_by(column).limit(limit)
+    }
+
+    query_trigrams = trigrams(query)
+    counts = dict(db.query(MirrorTrigramCount.trigram, MirrorTrigramCount.count).filter(
+        MirrorTrigramCount.kind == kind,
+        MirrorTrigramCount.trigram.in_(query_trigrams)
+    ))
+    # Sharing MIN_SIMILARITY of the query's trigrams means sharing at least
+    # one of any (n - required + 1) of them: probe the rarest that many
+    required = max(1, math.ceil(len(query_trigrams) * MIN_SIMILARITY))
+    probe = sorted(counts, key=counts.get)[:len(query_trigrams) - required + 1]
+    if not probe:
+        return ids
+
+    shared = func.count(MirrorTrigram.trigram)
+    rows = db.query(MirrorTrigram.entity_id).filter(
+        MirrorTrigram.kind == kind,
+        MirrorTrigram.trigram.in_(probe)
+    ).group_by(MirrorTrigram.entity_id).order_by(shared.desc()).limit(limit)
+    ids.update(entity_id for (entity_id,) in rows)
+    return ids
+
+
+def _match_score(query: str, query_trigrams: Set[str], normalized: str) -> float:
+    """Exact matches first, then prefix matches, then by trigram similarity; 0 for no match"""
+    score = similarity(query_trigrams, normalized)
+    if normalized == query:
+        return 2.0 + score
+    if normalized.startswith(query):
+        return 1.0 + score
+    return score if score >= MIN_SIMILARITY else 0.0
+
+
+def search_artists(artist_name: str, limit: int, db: Session) -> List[Dict]:
+    """Same results shape as musicbrainz.search_artist()"""
+    query = mirror_normalize(artist_name)
+    if not query:
+        return []
+    ids = _candidate_ids(
+        MirrorArtist, "artist", MirrorArtist.normalized_name, query, limit * _CANDIDATES_PER_RESULT, db
+    )
+    if not ids:
+        return []
+
+    query_trigrams = trigrams(query)
+    scored = []
+    for artist in db.query(MirrorArtist).filter(MirrorArtist.id.in_(ids)):
+        score = _match_score(query, query_trigrams, artist.normalized_name)
+        if score > 0:
+            scored.append((-score, artist.name, artist))
+    scored.sort(key=lambda item: item[:2])
+    return [
+        {
+            "name": artist.name,
+            "mbid": artist.mbid,
+            "type": artist.type,
+            "disambiguation": artist.disambiguation,
+            "country": artist.country
+        }
+        for _, _, artist in scored[:limit]
+    ]
+
+
+def _ranked_recordings(
+    song_title: str,
+    artist_name: Optional[str],
+    limit: int,
+    db: Session
+) -> List[MirrorRecording]:
+    query = mirror_normalize(song_title)
+    if not query:
+        return []
+    artist_query = mirror_normalize(artist_name)
+    ids = _candidate_ids(
+        MirrorRecording, "recording", MirrorRecording.normalized_title, query, limit * _CANDIDATES_PER_RESULT, db
+    )
+    if artist_query:
+        # Common titles can crowd the right artist out of the candidates
+        ids.update(entity_id for (entity_id,) in db.query(MirrorRecording.id).filter(
+            MirrorRecording.normalized_title == query,
+            MirrorRecording.normalized_artist == artist_query
+        ))
+    if not ids:
+        return []
+
+    query_trigrams = trigrams(query)
+    artist_trigrams = trigrams(artist_query)
+    scored: List[Tuple[float, str, MirrorRecording]] = []
+    for recording in db.query(MirrorRecording).filter(MirrorRecording.id.in_(ids)):
+        score = _match_score(query, query_trigrams, recording.normalized_title)
+        if score <= 0:
+            continue
+        if artist_query:
+            artist_score = _match_score(artist_query, artist_trigrams, recording.normalized_artist)
+            if artist_score <= 0:
+                continue
+            score += artist_score
+        scored.append((-score, recording.mbid, recording))
+    scored.sort(key=lambda item: item[:2])
+    return [recording for _, _, recording in scored[:limit]]
+
+
+def search_recordings(song_title: str, artist_name: Optional[str], limit: int, db: Session) -> List[Dict]:
+    """Same results shape as musicbrainz.search_recording()"""
+    return [
+        {
+            "title": recording.title,
+            "artist": recording.artist,
+            "mbid": recording.mbid,
+            "length": recording.length,
+            "disambiguation": recording.disambiguation
+        }
+        for recording in _ranked_recordings(song_title, artist_name, limit, db)
+    ]
+
+
+def _details(recording: MirrorRecording) -> Dict:
+    return {
+        "title": recording.title,
+        "artist": recording.artist,
+        "mbid": recording.mbid,
+        "length": recording.length,
+        "tags": recording.tags or [],
+        "releases": recording.releases or []
+    }
+
+
+def recording_details(mbid: str, db: Session) -> Optional[Dict]:
+    """Same shape as musicbrainz.get_recording_details(); None if not mirrored"""
+    recording = db.query(MirrorRecording).filter(MirrorRecording.mbid == mbid).first()
+    return _details(recording) if recording else None
+
+
+def resolve_recording(song_title: str, artist_name: str, db: Session) -> Optional[Dict]:
+    """Best matching mirrored recording with its details, like MusicBrainzClient.resolve_recording()"""
+    recordings = _ranked_recordings(song_title, artist_name, 1, db)
+    return _details(recordings[0]) if recordings else None
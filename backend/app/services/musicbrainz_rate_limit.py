@@ -0,0 +1,157 @@
+"""
+Rate limiting for MusicBrainz requests
+
+MusicBrainz allows about one request per second per application, not per
+process. SharedRateLimiter keeps a token bucket in a small SQLite file, so
+every uvicorn worker and script on the machine draws from the same budget.
+
+Requests come in two lanes. Interactive lookups (the /api/musicbrainz
+routes) go ahead of background enrichment: while an interactive caller is
+waiting for a token it holds a short priority window in the bucket row,
+and background callers don't take tokens until it has passed. The window
+is a timestamp rather than a lock, so a worker that dies while waiting
+can't block the background lane for longer than one interval.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Dict, Union
+from app.core.config import settings
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+
+class AsyncRateLimiter:
+    """
+    Spaces calls at least `min_interval` seconds apart within this process
+
+    Each caller reserves the next free slot under a lock and then sleeps
+    until it outside the lock, so waiting callers don't hold each other up
+    beyond their own slot. Lanes are accepted but not prioritized.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, lane: str = INTERACTIVE):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def snapshot_stats(self) -> Dict:
+        return {"shared": False}
+
+
+class SharedRateLimiter:
+    """Cross-process token bucket (stored in SQLite) with interactive and background lanes"""
+
+    def __init__(self, path: str, min_interval: float, burst: int = 1, name: str = "musicbrainz"):
+        self.path = path
+        self.min_interval = min_interval
+        self.rate = 1.0 / min_interval if min_interval > 0 else 0.0
+        self.burst = max(1, burst)
+        self.name = name
+        self._lock = threading.Lock()
+        # One poller per lane per process; the rest queue here in FIFO order
+        self._lane_locks = {lane: asyncio.Lock() for lane in LANES}
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                priority_until REAL NOT NULL DEFAULT 0
+            )
+        """)
+        self._connection.execute(
+            "INSERT OR IGNORE INTO rate_limit_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+            (name, float(self.burst), time.time())
+        )
+        self.stats = {lane: {"acquired": 0, "waits": 0, "wait_seconds": 0.0} for lane in LANES}
+
+    def _try_take(self, lane: str) -> float:
+        """
+        Take a token if this lane may have one now
+
+        Returns 0 when a token was taken, otherwise the seconds to wait
+        before trying again. Uses wall-clock time since the bucket is
+        shared between processes.
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated_at, priority_until = self._connection.execute(
+                    "SELECT tokens, updated_at, priority_until FROM rate_limit_buckets WHERE name = ?",
+                    (self.name,)
+                ).fetchone()
+                now = time.time()
+                tokens = min(self.burst, tokens + max(0.0, now - updated_at) * self.rate)
+                if lane == BACKGROUND and priority_until > now:
+                    wait = priority_until - now
+                elif tokens >= 1:
+                    tokens -= 1
+                    wait = 0.0
+                else:
+                    wait = (1 - tokens) / self.rate
+                    if lane == INTERACTIVE:
+                        priority_until = max(priority_until, now + wait + self.min_interval)
+                self._connection.execute(
+                    "UPDATE rate_limit_buckets SET tokens = ?, updated_at = ?, priority_until = ? WHERE name = ?",
+                    (tokens, now, priority_until, self.name)
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return wait
+
+    async def acquire(self, lane: str = INTERACTIVE):
+        """Wait until a request may be sent in `lane`"""
+        if self.rate == 0:
+            return
+        stats = self.stats[lane]
+        async with self._lane_locks[lane]:
+            while True:
+                wait = await asyncio.to_thread(self._try_take, lane)
+                if wait <= 0:
+                    stats["acquired"] += 1
+                    return
+                stats["waits"] += 1
+                stats["wait_seconds"] += wait
+                await asyncio.sleep(wait)
+
+    def snapshot_stats(self) -> Dict:
+        return {
+            "shared": True,
+            **{
+                lane: {**lane_stats, "wait_seconds": round(lane_stats["wait_seconds"], 3)}
+                for lane, lane_stats in self.stats.items()
+            },
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def create_musicbrainz_rate_limiter() -> Union[SharedRateLimiter, AsyncRateLimiter]:
+    """
+    The limiter configured in settings: shared across processes, or
+    per-process when MUSICBRAINZ_RATE_LIMIT_PATH is empty
+    """
+    if not settings.MUSICBRAINZ_RATE_LIMIT_PATH:
+        return AsyncRateLimiter(settings.MUSICBRAINZ_MIN_INTERVAL)
+    return SharedRateLimiter(
+        path=settings.MUSICBRAINZ_RATE_LIMIT_PATH,
+        min_interval=settings.MUSICBRAINZ_MIN_INTERVAL,
+        burst=settings.MUSICBRAINZ_RATE_LIMIT_BURST
+    )
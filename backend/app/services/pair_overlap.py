@@ -0,0 +1,243 @@
+"""
+Incremental pair similarity
+
+user_pair_overlaps counts, for every pair of users sharing at least one
+taste term, how many terms of each similarity component they share, plus
+every user's own term counts on the diagonal. That is enough to compute
+calculate_similarity_score() for a pair, since each Jaccard union is
+|A| + |B| - |A & B|.
+
+Unions are derived rather than stored: adding a song nobody else has
+changes a user's union with every other user, but only the intersections
+with the users listed under that song. A posting change therefore only
+touches the pairs sharing the changed term (apply_overlap_deltas), and
+refresh_user_similarities() uses the counters to keep the stored top-N
+neighbour lists (user_similarity) exact without a full recompute.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import and_, case, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session, aliased
+from app.core.config import settings
+from app.models.pair_overlap import UserPairOverlap
+from app.models.posting import TastePosting
+from app.models.user_similarity import UserSimilarity
+from app.services.batch_similarity import COMPONENTS, COMPONENT_WEIGHTS
+from app.services.counters import add_to_counters, delete_counters
+
+Term = Tuple[str, str]
+
+# Terms / user ids per IN clause
+_CHUNK = 200
+
+
+def apply_overlap_deltas(user_id: int, added: Iterable[Term], removed: Iterable[Term], db: Session):
+    """
+    Adjust the counters for postings added to / removed from one user
+
+    Only other users' postings are read, so this can run before or after
+    the user's own postings are written. Counters are incremented in
+    place, so concurrent calls for users sharing a term don't lose
+    updates. Does not commit.
+
+    Cost: gaining or losing a term touches one pair per user listed under
+    it, so a user's first song in a common genre ("pop") updates as many
+    pairs as there are pop listeners. Songs of a genre the user already
+    has don't change their postings and cost nothing here. The table
+    holds a row per pair of users sharing any term, so a term listing n
+    users accounts for up to n^2 rows.
+    """
+    deltas: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COMPONENTS, 0))
+    for terms, sign in ((list(added), 1), (list(removed), -1)):
+        for kind, _ in terms:
+            deltas[user_id][kind] += sign
+        for start in range(0, len(terms), _CHUNK):
+            rows = db.query(TastePosting.kind, TastePosting.user_id).filter(
+                tuple_(TastePosting.kind, TastePosting.term).in_(terms[start:start + _CHUNK]),
+                TastePosting.user_id != user_id
+            ).all()
+            for kind, other_id in rows:
+                deltas[other_id][kind] += sign
+    if not deltas:
+        return
+
+    # Both directions of every touched pair, plus the user's diagonal
+    pairs = {(user_id, user_id): deltas[user_id]} if user_id in deltas else {}
+    for other_id, delta in deltas.items():
+        if other_id != user_id:
+            pairs[(user_id, other_id)] = delta
+            pairs[(other_id, user_id)] = delta
+
+    changed = [
+        {"user_id": pair[0], "other_id": pair[1], **delta}
+        for pair, delta in pairs.items() if any(delta.values())
+    ]
+    add_to_counters(db, UserPairOverlap, ("user_id", "other_id"), COMPONENTS, changed)
+    # Pairs that lost terms may share none any more
+    decreased = [(row["user_id"], row["other_id"]) for row in changed if min(row[name] for name in COMPONENTS) < 0]
+    delete_counters(
+        db, UserPairOverlap, ("user_id", "other_id"), decreased,
+        *(getattr(UserPairOverlap, name) == 0 for name in COMPONENTS)
+    )
+
+
+def rebuild_pair_overlaps(db: Session) -> int:
+    """Recount every pair from the posting index; returns the number of rows written"""
+    db.query(UserPairOverlap).delete(synchronize_session=False)
+    mine = aliased(TastePosting)
+    theirs = aliased(TastePosting)
+    # Joining the postings with themselves also yields the diagonal
+    pairs = select(
+        mine.user_id,
+        theirs.user_id,
+        *(func.sum(case((mine.kind == name, 1), else_=0)) for name in COMPONENTS)
+    ).select_from(mine).join(
+        theirs, and_(theirs.kind == mine.kind, theirs.term == mine.term)
+    ).group_by(mine.user_id, theirs.user_id)
+    db.execute(insert(UserPairOverlap).from_select(["user_id", "other_id", *COMPONENTS], pairs))
+    db.commit()
+    return db.query(func.count()).select_from(UserPairOverlap).scalar()
+
+
+def pair_similarities(user_id: int, db: Session) -> Dict[int, float]:
+    """
+    Unrounded similarity of `user_id` to every user sharing a term with them
+
+    Same value as calculate_similarity_score() before rounding; users missing
+    from the result score 0.
+    """
+    # Plain column query: the counters are written with bulk statements
+    own_counts = db.query(*(getattr(UserPairOverlap, name) for name, _ in COMPONENT_WEIGHTS)).filter(
+        UserPairOverlap.user_id == user_id,
+        UserPairOverlap.other_id == user_id
+    ).first()
+    if own_counts is None:
+        return {}
+    diagonal = aliased(UserPairOverlap)
+    rows = db.query(
+        UserPairOverlap.other_id,
+        *(getattr(UserPairOverlap, name) for name, _ in COMPONENT_WEIGHTS),
+        *(getattr(diagonal, name) for name, _ in COMPONENT_WEIGHTS)
+    ).join(
+        diagonal,
+        and_(diagonal.user_id == UserPairOverlap.other_id, diagonal.other_id == UserPairOverlap.other_id)
+    ).filter(
+        UserPairOverlap.user_id == user_id,
+        UserPairOverlap.other_id != user_id
+    ).all()
+
+    similarities = {}
+    count = len(COMPONENT_WEIGHTS)
+    for row in rows:
+        similarity = 0.0
+        for i, (_, weight) in enumerate(COMPONENT_WEIGHTS):
+            common = row[1 + i]
+            union = own_counts[i] + row[1 + count + i] - common
+            similarity += common / max(union, 1) * weight
+        similarities[row[0]] = similarity
+    return similarities
+
+
+def _top_neighbors(similarities: Dict[int, float], top_n: int) -> List[Tuple[int, float]]:
+    """Best `top_n` positive scores as (neighbor_id, rounded score)"""
+    ranked = sorted(
+        ((other_id, score) for other_id, score in similarities.items() if score > 0),
+        key=lambda item: (-item[1], item[0])
+    )
+    return [(other_id, round(score, 3)) for other_id, score in ranked[:top_n]]
+
+
+def _replace_neighbors(user_id: int, neighbors: List[Tuple[int, float]], db: Session):
+    db.query(UserSimilarity).filter(UserSimilarity.user_id == user_id).delete(synchronize_session=False)
+    if neighbors:
+        db.execute(insert(UserSimilarity), [
+            {"user_id": user_id, "neighbor_id": neighbor_id, "similarity_score": score}
+            for neighbor_id, score in neighbors
+        ])
+
+
+def refresh_user_similarities(user_id: int, db: Session, top_n: Optional[int] = None) -> int:
+    """
+    Bring the stored neighbour lists in line after `user_id`'s taste changed
+
+    Only similarities involving `user_id` changed. Their own list is
+    recomputed from the counters; every other affected list is patched in
+    place, or recomputed when `user_id` dropped out of a full list (someone
+    not listed may now belong in it). Does nothing until the table was
+    filled by compute_similarities.py, which recounts the counters first,
+    so they are complete whenever this runs. Does not commit; returns the
+    number of lists touched.
+    """
+    if db.query(UserSimilarity.user_id).first() is None:
+        return 0
+    top_n = top_n or settings.SIMILARITY_TOP_N
+    db.flush()
+    similarities = pair_similarities(user_id, db)
+    _replace_neighbors(user_id, _top_neighbors(similarities, top_n), db)
+
+    listing_ids = {
+        row[0] for row in db.query(UserSimilarity.user_id).filter(UserSimilarity.neighbor_id == user_id)
+    }
+    affected = sorted((set(similarities) | listing_ids) - {user_id})
+
+    # Per affected list: its length, weakest score and the score it has for user_id
+    lists = {}
+    for start in range(0, len(affected), _CHUNK):
+        rows = db.query(
+            UserSimilarity.user_id,
+            func.count(),
+            func.min(UserSimilarity.similarity_score),
+            func.max(case((UserSimilarity.neighbor_id == user_id, UserSimilarity.similarity_score)))
+        ).filter(
+            UserSimilarity.user_id.in_(affected[start:start + _CHUNK])
+        ).group_by(UserSimilarity.user_id).all()
+        lists.update((row[0], row[1:]) for row in rows)
+
+    updates, deletes, inserts, evict, recompute = [], [], [], {}, []
+    for other_id in affected:
+        length, weakest, current = lists.get(other_id, (0, None, None))
+        similarity = similarities.get(other_id, 0.0)
+        score = round(similarity, 3)
+        full = length >= top_n
+        values = {"user_id": other_id, "neighbor_id": user_id, "similarity_score": score}
+
+        if not length:
+            # Never listed anyone (e.g. joined after the last full run)
+            recompute.append(other_id)
+        elif current is not None:
+            if similarity > 0 and (score >= current or not full):
+                updates.append(values)
+            elif not full:
+                deletes.append((other_id, user_id))
+            else:
+                recompute.append(other_id)
+        elif similarity > 0 and (not full or score > weakest):
+            if full:
+                evict[other_id] = weakest
+            inserts.append(values)
+
+    # A full list making room drops its weakest entry (highest id on ties)
+    evicted = list(evict)
+    for start in range(0, len(evicted), _CHUNK):
+        chunk = evicted[start:start + _CHUNK]
+        rows = db.query(UserSimilarity.user_id, UserSimilarity.neighbor_id, UserSimilarity.similarity_score).filter(
+            UserSimilarity.user_id.in_(chunk),
+            UserSimilarity.similarity_score <= max(evict[other_id] for other_id in chunk)
+        ).all()
+        weakest_rows = {}
+        for other_id, neighbor_id, score in rows:
+            if score == evict[other_id]:
+                weakest_rows[other_id] = max(weakest_rows.get(other_id, neighbor_id), neighbor_id)
+        deletes.extend(weakest_rows.items())
+
+    for start in range(0, len(deletes), _CHUNK):
+        db.query(UserSimilarity).filter(
+            tuple_(UserSimilarity.user_id, UserSimilarity.neighbor_id).in_(deletes[start:start + _CHUNK])
+        ).delete(synchronize_session=False)
+    if updates:
+        db.execute(update(UserSimilarity), updates)
+    if inserts:
+        db.execute(insert(UserSimilarity), inserts)
+    for other_id in recompute:
+        _replace_neighbors(other_id, _top_neighbors(pair_similarities(other_id, db), top_n), db)
+    return len(affected) + 1
@@ -0,0 +1,148 @@
+"""
+Inverted posting-list index from taste terms to users
+
+Maps every normalized song key, favorite, artist and genre to the users
+who have it. Recommendation candidates are found by walking the current
+user's posting lists, which only touches users with at least one overlap
+(users sharing nothing always score 0 similarity). Every posting change is
+also applied to the per-pair overlap counters (see pair_overlap.py).
+"""
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+from app.models.posting import TastePosting
+from app.models.song import Song
+from app.models.taste_profile import UserTasteProfile
+from app.models.user import User
+from app.services.pair_overlap import apply_overlap_deltas, rebuild_pair_overlaps
+from app.services.taste_profile import load_taste_profiles
+
+Term = Tuple[str, str]
+
+# Posting lists are looked up in chunks to keep IN clauses small
+_LOOKUP_CHUNK = 200
+
+
+def user_terms(user: User, profile: UserTasteProfile) -> Set[Term]:
+    """(kind, term) pairs a user should be listed under"""
+    terms = {("genre", genre) for genre in (user.top_genres or []) if genre}
+    terms.update(("artist", artist) for artist in (user.favorite_artists or []) if artist)
+    terms.update(("song", key) for key in (profile.song_keys or {}))
+    terms.update(("favorite", key) for key in (profile.favorite_keys or {}))
+    terms.update(("song_genre", genre) for genre in (profile.song_genres or {}))
+    return terms
+
+
+def add_posting(user_id: int, kind: str, term: str, db: Session):
+    """Add a single posting if missing (e.g. a genre added to top_genres). Does not commit."""
+    if db.get(TastePosting, (kind, term, user_id)) is None:
+        db.add(TastePosting(kind=kind, term=term, user_id=user_id))
+        apply_overlap_deltas(user_id, [(kind, term)], [], db)
+
+
+def sync_user_postings(
+    user: User,
+    db: Session,
+    profile: Optional[UserTasteProfile] = None,
+    track_overlaps: bool = True
+):
+    """
+    Bring a user's postings in line with their current taste data
+
+    Only the difference is written, and applied to the pair overlap
+    counters unless `track_overlaps` is False (for bulk rebuilds that
+    recount them afterwards). Does not commit.
+    """
+    if profile is None:
+        profile = load_taste_profiles([user.id], db)[user.id]
+    wanted = user_terms(user, profile)
+    stored = {
+        (row.kind, row.term)
+        for row in db.query(TastePosting.kind, TastePosting.term).filter(TastePosting.user_id == user.id)
+    }
+
+    removed = list(stored - wanted)
+    added = list(wanted - stored)
+    if track_overlaps:
+        apply_overlap_deltas(user.id, added, removed, db)
+    for start in range(0, len(removed), _LOOKUP_CHUNK):
+        db.query(TastePosting).filter(
+            TastePosting.user_id == user.id,
+            tuple_(TastePosting.kind, TastePosting.term).in_(removed[start:start + _LOOKUP_CHUNK])
+        ).delete(synchronize_session=False)
+    db.add_all(TastePosting(kind=kind, term=term, user_id=user.id) for kind, term in added)
+
+
+def rebuild_posting_index(db: Session, batch_size: int = 500) -> int:
+    """Rebuild every user's postings and the pair overlap counters; returns the number of users indexed"""
+    user_ids = [row[0] for row in db.query(User.id).order_by(User.id).all()]
+    for start in range(0, len(user_ids), batch_size):
+        batch_ids = user_ids[start:start + batch_size]
+        users = db.query(User).filter(User.id.in_(batch_ids)).all()
+        profiles = load_taste_profiles(batch_ids, db)
+        for user in users:
+            sync_user_postings(user, db, profiles[user.id], track_overlaps=False)
+        db.commit()
+    rebuild_pair_overlaps(db)
+    return len(user_ids)
+
+
+def get_overlapping_user_ids(
+    user: User,
+    profile: UserTasteProfile,
+    db: Session,
+    exclude_ids: Set[int]
+) -> List[int]:
+    """
+    Users sharing at least one term with `user`, most shared terms first
+
+    Walks the user's posting lists and counts, per user, how many of the
+    lists they appear in.
+    """
+    terms = list(user_terms(user, profile))
+    overlap_counts = {}
+    for start in range(0, len(terms), _LOOKUP_CHUNK):
+        rows = db.query(TastePosting.user_id, func.count()).filter(
+            tuple_(TastePosting.kind, TastePosting.term).in_(terms[start:start + _LOOKUP_CHUNK])
+        ).group_by(TastePosting.user_id).all()
+        for user_id, count in rows:
+            overlap_counts[user_id] = overlap_counts.get(user_id, 0) + count
+
+    return sorted(
+        (user_id for user_id in overlap_counts if user_id not in exclude_ids),
+        key=lambda user_id: (-overlap_counts[user_id], user_id)
+    )
+
+
+def get_non_overlapping_user_ids(db: Session, exclude_ids: Set[int], limit: int) -> List[int]:
+    """
+    The first `limit` users (by id, users with songs first) not in `exclude_ids`
+
+    Users sharing nothing with the current user all get the same final
+    score (0 similarity plus at most the minimum-activity floor), and ties
+    keep id order, so these are the only ones that can still make the cut.
+    """
+    picked = []
+    with_songs = db.query(Song.user_id).distinct().order_by(Song.user_id)
+    for (user_id,) in with_songs.yield_per(1000):
+        if user_id not in exclude_ids:
+            picked.append(user_id)
+            if len(picked) == limit:
+                return picked
+
+    skipped = exclude_ids | set(picked)
+    for (user_id,) in db.query(User.id).order_by(User.id).yield_per(1000):
+        if user_id not in skipped:
+            picked.append(user_id)
+            if len(picked) == limit:
+                break
+    return picked
+
+
+def ensure_posting_index(db: Session) -> int:
+    """Build the index if it is empty but there are users (e.g. right after upgrading)"""
+    if db.query(TastePosting.user_id).first() is not None:
+        return 0
+    if db.query(User.id).first() is None:
+        return 0
+    return rebuild_posting_index(db)
@@ -1,12 +1,26 @@
 """
 Advanced recommendation algorithm for matching users based on music taste
 """
+import heapq
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from app.core.config import settings
 from app.models.user import User
 from app.models.song import Song
 from app.models.connection import Connection, ConnectionStatus
-from app.services.similarity import calculate_similarity_score
+from app.models.taste_profile import UserTasteProfile
+from app.services.batch_similarity import COMPONENTS, TasteMatrix, round_scores
+from app.services.bulk_loading import load_common_songs, load_top_songs_by_user, load_songs_for_keys
+from app.services.cooccurrence import get_cooccurring_song_keys
+from app.services.genre_popularity import get_popular_song_keys
+from app.services.lsh import get_lsh_candidates, get_active_user_ids
+from app.services.posting_index import get_overlapping_user_ids, get_non_overlapping_user_ids
+from app.services.similarity_job import get_precomputed_neighbors
+from app.services.embeddings import get_embedding_neighbors
+from app.services.taste_profile import get_taste_profile, song_key
+from app.services.tracing import active_trace, trace_count, trace_stage
 
 
 def get_user_recommendations(
@@ -15,7 +29,8 @@ def get_user_recommendations(
     limit: int = 10,
     min_similarity: float = 0.0,  # Changed default to 0.0 to include all users
     exclude_connected: bool = True,
-    diversity_factor: float = 0.2
+    diversity_factor: float = 0.2,
+    source: str = "live"
 ) -> List[Dict]:
     """
     Get personalized user recommendations with advanced algorithm
@@ -27,6 +42,28 @@ def get_user_recommendations(
     4. Diversity (ensures variety in recommendations)
     5. Excludes existing connections
     
+    Diversity is applied by re-ranking (Maximal Marginal Relevance): the top
+    settings.MMR_POOL_FACTOR x 'limit' candidates by relevance are picked one
+    at a time, each time taking the candidate with the best
+    (1 - diversity_factor) * relevance - diversity_factor * (highest taste
+    similarity to an already picked candidate). final_score is the relevance.
+    
+    Only users found through the taste posting index (sharing at least one
+    genre, artist or song) are scored, plus the first 'limit' of the others,
+    which all tie on the minimum score. On large user bases (more than
+    settings.LSH_MIN_USERS) only the MinHash/LSH candidates are scored, topped
+    up with the most active users if needed.
+    
+    With source="precomputed" the candidates and their similarity scores are
+    read from the user_similarity table (see compute_similarities.py) and only
+    the rating/activity terms and display fields are computed. Users
+    without stored neighbours fall back to the live computation.
+    
+    With source="embedding" the candidates are the nearest users by dense
+    taste vector (brute-force cosine k-NN, see embeddings.py) and the cosine
+    replaces the similarity score; users without a vector fall back to the
+    live computation.
+    
     Always returns up to 'limit' recommendations, even if similarity scores are low.
     This ensures users always have someone to connect with.
     
@@ -36,244 +73,380 @@ def get_user_recommendations(
         limit: Maximum number of recommendations (default: 10, max: 10)
         min_similarity: Minimum similarity score threshold (default: 0.0 to include all)
         exclude_connected: Whether to exclude users with existing connections
-        diversity_factor: How much to prioritize diversity (0-1)
+        diversity_factor: How much to prioritize diversity (0-1, 0 = rank by relevance only)
+        source: "live" (default), "precomputed" or "embedding"
     
     Returns:
         List of recommendation dictionaries with user info and similarity details
-        (always up to 'limit' users, sorted by final_score descending)
+        (always up to 'limit' users, in re-ranked order)
     """
     # Ensure limit doesn't exceed 10
     limit = min(limit, 10)
     
+    ranked = rank_user_candidates(
+        current_user, db, limit, min_similarity, exclude_connected, diversity_factor, source
+    )
+    return build_user_recommendations(current_user, ranked, db)
+
+
+def rank_user_candidates(
+    current_user: User,
+    db: Session,
+    limit: int,
+    min_similarity: float = 0.0,
+    exclude_connected: bool = True,
+    diversity_factor: float = 0.2,
+    source: str = "live"
+) -> List[Tuple[User, float, float, float, int]]:
+    """
+    The best 'limit' candidates as (user, final_score, similarity_score,
+    rating_similarity, song_count), in re-ranked order
+    
+    Same ranking as get_user_recommendations() without the display data and
+    without the cap of 10, so rankings can be stored and paged through.
+    """
     # Get all other users
     query = db.query(User).filter(User.id != current_user.id)
     
     # Exclude users with existing connections if requested
-    if exclude_connected:
-        existing_connection_user_ids = db.query(Connection.connected_user_id).filter(
-            Connection.user_id == current_user.id
-        ).union(
-            db.query(Connection.user_id).filter(
-                Connection.connected_user_id == current_user.id
+    existing_ids = []
+    with trace_stage("exclusions"):
+        if exclude_connected:
+            existing_connection_user_ids = db.query(Connection.connected_user_id).filter(
+                Connection.user_id == current_user.id
+            ).union(
+                db.query(Connection.user_id).filter(
+                    Connection.connected_user_id == current_user.id
+                )
+            ).all()
+            existing_ids = [row[0] for row in existing_connection_user_ids]
+            if existing_ids:
+                query = query.filter(~User.id.in_(existing_ids))
+    trace_count("excluded_connections", len(existing_ids))
+    
+    excluded = set(existing_ids) | {current_user.id}
+    with trace_stage("candidates"):
+        stored_scores = {}
+        if source == "precomputed":
+            stored_scores = get_precomputed_neighbors(current_user.id, db, excluded)
+        elif source == "embedding":
+            stored_scores = get_embedding_neighbors(current_user, db, excluded)
+        
+        if stored_scores:
+            candidate_ids = list(stored_scores)
+            trace_count(f"candidates_{source}", len(candidate_ids))
+        elif db.query(func.count(User.id)).scalar() > settings.LSH_MIN_USERS:
+            # On large user bases only score the LSH candidates instead of everyone
+            candidate_ids = get_lsh_candidates(current_user, db, excluded)
+            trace_count("candidates_lsh", len(candidate_ids))
+        else:
+            # Only users sharing a genre, artist or song can score above the rest;
+            # walk the posting lists to find them, then add the first 'limit' others
+            candidate_ids = get_overlapping_user_ids(
+                current_user, get_taste_profile(current_user.id, db), db, excluded
             )
-        ).all()
-        existing_ids = [row[0] for row in existing_connection_user_ids]
-        if existing_ids:
-            query = query.filter(~User.id.in_(existing_ids))
+            trace_count("candidates_overlapping", len(candidate_ids))
+            non_overlapping_ids = get_non_overlapping_user_ids(db, excluded | set(candidate_ids), limit)
+            candidate_ids += non_overlapping_ids
+            trace_count("candidates_non_overlapping", len(non_overlapping_ids))
+        
+        if len(candidate_ids) < limit:
+            # Top up from the most active users so we can still return 'limit' users
+            top_up_ids = get_active_user_ids(
+                db, excluded | set(candidate_ids), limit - len(candidate_ids)
+            )
+            candidate_ids += top_up_ids
+            trace_count("candidates_topped_up", len(top_up_ids))
+        query = query.filter(User.id.in_(candidate_ids))
     
-    all_users = query.all()
+    with trace_stage("load_users"):
+        all_users = query.all()
+    trace_count("candidates_loaded", len(all_users))
     
     # If no users available, return empty list
     if not all_users:
         return []
     
-    # Get current user's songs for analysis
-    current_user_songs = db.query(Song).filter(Song.user_id == current_user.id).all()
-    current_user_song_count = len(current_user_songs)
-    
-    recommendations = []
-    all_candidates = []  # Store all users with scores, even low ones
+    # Rank candidates by a cheap upper bound on their final score, then score
+    # them exactly in blocks while keeping the best 'pool_size' in heaps. Once
+    # the heap is full, candidates whose bound can't beat its k-th entry are skipped
+    with trace_stage("load_profiles"):
+        taste_matrix = TasteMatrix.load([current_user] + all_users, db)
+    rows = np.arange(1, len(all_users) + 1)
+    # Candidates the diversity re-ranker picks 'limit' from
+    pool_size = limit * settings.MMR_POOL_FACTOR if diversity_factor > 0 else limit
     
-    for user in all_users:
-        # Calculate base similarity score
-        similarity_score = calculate_similarity_score(current_user, user, db)
+    with trace_stage("bounds"):
+        bounds = taste_matrix.upper_bounds(current_user.id, rows)
         
-        # Get user's songs for additional analysis
-        user_songs = db.query(Song).filter(Song.user_id == user.id).all()
-        user_song_count = len(user_songs)
-        
-        # Calculate additional factors
-        
-        # 1. Rating similarity (if both users have rated songs)
-        rating_similarity = _calculate_rating_similarity(
-            current_user_songs, user_songs, db
+        # Stored similarity scores (source="precomputed" or "embedding") replace the live ones
+        stored_similarity = np.array(
+            [stored_scores.get(user.id, np.nan) for user in all_users], dtype=np.float64
         )
-        
-        # 2. Activity level bonus (users with more songs are more engaged)
-        activity_bonus = min(user_song_count / 20.0, 0.1)  # Max 10% bonus
-        
-        # 3. Genre diversity score (prefer users with some different genres too)
-        diversity_score = _calculate_diversity_score(
-            current_user.top_genres or [],
-            user.top_genres or []
+        has_stored = ~np.isnan(stored_similarity)
+        bounds["similarity_score"] = np.where(has_stored, stored_similarity, bounds["similarity_score"])
+        final_bounds = _combine_scores(
+            bounds["similarity_score"], bounds["rating_similarity"], bounds["song_count"]
         )
+        order = np.lexsort((rows, -final_bounds))
+    
+    # Min-heaps of (final_score, -position, position, similarity, rating, song count);
+    # ties on final_score keep the candidates' original order
+    recommendations_heap = []
+    fallback_heap = []  # Low-similarity users, used if there aren't enough others
+    block_size = max(pool_size * 4, 64)
+    scored = 0
+    with trace_stage("scoring"):
+        for start in range(0, len(order), block_size):
+            if len(recommendations_heap) == pool_size and final_bounds[order[start]] < recommendations_heap[0][0]:
+                break
+            block = order[start:start + block_size]
+            scored += len(block)
+            scores = taste_matrix.score(current_user.id, rows[block])
+            scores["similarity_score"] = np.where(
+                has_stored[block], stored_similarity[block], scores["similarity_score"]
+            )
+            final_scores = _combine_scores(
+                scores["similarity_score"], scores["rating_similarity"], scores["song_count"]
+            )
+            
+            for i, position in enumerate(block.tolist()):
+                similarity_score = scores["similarity_score"][i].item()
+                item = (
+                    final_scores[i].item(), -position, position, similarity_score,
+                    scores["rating_similarity"][i].item(), scores["song_count"][i].item()
+                )
+                # Only apply min_similarity filter if we have enough high-scoring users
+                # Otherwise, include all users to ensure we always have recommendations
+                heap = recommendations_heap if similarity_score >= min_similarity else fallback_heap
+                if len(heap) < pool_size:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+    trace_count("candidates_scored", scored)
+    trace_count("candidates_pruned_by_bound", len(order) - scored)
+    
+    with trace_stage("selection"):
+        # Sort by final score (descending)
+        pool = sorted(recommendations_heap, reverse=True)
+        trace_count("above_min_similarity", len(pool))
+        primary_count = len(pool)
         
-        # Combine scores - even if similarity is 0, we still calculate a score
-        # This ensures we always have recommendations
-        final_score = (
-            similarity_score * (1 - diversity_factor) +
-            rating_similarity * 0.15 +
-            activity_bonus * 0.05 +
-            diversity_score * diversity_factor
+        # If we don't have enough recommendations, add from fallback candidates
+        if len(pool) < limit:
+            pool.extend(sorted(fallback_heap, reverse=True)[:pool_size - len(pool)])
+    
+    with trace_stage("diversity"):
+        redundancy = np.zeros(len(pool), dtype=np.float64)
+        if diversity_factor > 0 and len(pool) > 1:
+            pool_rows = rows[np.array([item[2] for item in pool], dtype=np.int64)]
+            order, redundancy = mmr_rerank(
+                np.array([item[0] for item in pool], dtype=np.float64),
+                taste_matrix.pairwise_similarity(pool_rows),
+                limit, diversity_factor, primary_count
+            )
+            selected = [pool[i] for i in order]
+            redundancy = redundancy[order]
+        else:
+            # Re-sort the combined list (stable, so ties keep their order)
+            selected = sorted(pool[:limit], key=lambda item: item[0], reverse=True)
+    trace_count("reranked_pool", len(pool))
+    
+    trace = active_trace()
+    if trace is not None:
+        positions = np.array([item[2] for item in selected], dtype=np.int64)
+        _trace_score_breakdown(
+            trace, current_user, taste_matrix, all_users, positions,
+            stored_similarity, has_stored, redundancy[:len(selected)], diversity_factor
         )
-        
-        # Minimum score boost for users with any activity (ensures they're included)
-        if user_song_count > 0:
-            final_score = max(final_score, 0.01)  # At least 0.01 for active users
-        
-        # Get common items for display
-        common_genres = set(current_user.top_genres or []) & set(user.top_genres or [])
-        common_artists = set(current_user.favorite_artists or []) & set(user.favorite_artists or [])
-        
-        # Get user's top songs (fallback to all songs if no favorites)
-        top_songs = db.query(Song).filter(
-            Song.user_id == user.id,
-            Song.is_favorite == True
-        ).order_by(
-            Song.user_rating.desc().nulls_last()
-        ).limit(5).all()
-        
-        # If no favorites, get top rated songs
-        if not top_songs:
-            top_songs = db.query(Song).filter(
-                Song.user_id == user.id
-            ).order_by(
-                Song.user_rating.desc().nulls_last(),
-                Song.created_at.desc()
-            ).limit(5).all()
-        
-        # Get common songs (songs both users have)
-        current_user_song_titles = {
-            (s.title.lower(), s.artist.lower()) 
-            for s in current_user_songs
+    
+    return [
+        (all_users[position], final_score, similarity_score, rating_similarity, user_song_count)
+        for final_score, _, position, similarity_score, rating_similarity, user_song_count in selected
+    ]
+
+
+def _trace_score_breakdown(
+    trace,
+    current_user: User,
+    taste_matrix: TasteMatrix,
+    all_users: List[User],
+    positions: np.ndarray,
+    stored_similarity: np.ndarray,
+    has_stored: np.ndarray,
+    redundancy: np.ndarray,
+    diversity_factor: float
+):
+    """Record every term of the final score of the selected users (explain mode only)"""
+    if not len(positions):
+        return
+    rows = positions + 1
+    scores = taste_matrix.score(current_user.id, rows)
+    similarity = np.where(has_stored[positions], stored_similarity[positions], scores["similarity_score"])
+    activity = np.minimum(scores["song_count"] / 20.0, 0.1)
+    
+    for i, position in enumerate(positions.tolist()):
+        trace.scores[all_users[position].id] = {
+            "components": {
+                name: round(float(scores[name][i]), 3)
+                for name in COMPONENTS
+            },
+            "similarity_score": round(float(similarity[i]), 3),
+            "similarity_from_precomputed": bool(has_stored[position]),
+            "rating_similarity": round(float(scores["rating_similarity"][i]), 3),
+            "activity_bonus": round(float(activity[i]), 3),
+            "weighted_terms": {
+                "similarity": round(float(similarity[i]), 3),
+                "rating": round(float(scores["rating_similarity"][i]) * 0.15, 3),
+                "activity": round(float(activity[i]) * 0.05, 3),
+            },
+            # Highest taste similarity to a user ranked above, and the MMR
+            # penalty it cost when this user was picked
+            "redundancy": round(float(redundancy[i]), 3),
+            "diversity_penalty": round(float(redundancy[i]) * diversity_factor, 3),
         }
-        user_song_titles = {
-            (s.title.lower(), s.artist.lower()) 
-            for s in user_songs
+
+
+def build_user_recommendations(
+    current_user: User,
+    ranked: List[Tuple[User, float, float, float, int]],
+    db: Session
+) -> List[Dict]:
+    """Recommendation dictionaries for ranked candidates (see rank_user_candidates)"""
+    # Build display data only for the winners, loading their songs in bulk
+    winner_ids = [user.id for user, *_ in ranked]
+    with trace_stage("common_songs"):
+        common_songs_by_user = load_common_songs(current_user.id, winner_ids, db)
+    with trace_stage("top_songs"):
+        top_songs_by_user = load_top_songs_by_user(winner_ids, db)
+    trace_count("returned", len(ranked))
+    return [
+        _build_recommendation(
+            current_user, user, common_songs_by_user[user.id], top_songs_by_user[user.id],
+            final_score, similarity_score, rating_similarity, user_song_count
+        )
+        for user, final_score, similarity_score, rating_similarity, user_song_count in ranked
+    ]
+
+
+def _combine_scores(
+    similarity_scores: np.ndarray,
+    rating_similarities: np.ndarray,
+    song_counts: np.ndarray
+) -> np.ndarray:
+    """Final (relevance) scores, rounded to 3 decimals, for many candidates"""
+    # Activity level bonus (users with more songs are more engaged)
+    activity_bonus = np.minimum(song_counts / 20.0, 0.1)  # Max 10% bonus
+    
+    # Combine scores - even if similarity is 0, we still calculate a score
+    # This ensures we always have recommendations
+    final_scores = (
+        similarity_scores +
+        rating_similarities * 0.15 +
+        activity_bonus * 0.05
+    )
+    
+    # Minimum score boost for users with any activity (ensures they're included)
+    final_scores = np.where(song_counts > 0, np.maximum(final_scores, 0.01), final_scores)
+    return round_scores(final_scores)
+
+
+def _build_recommendation(
+    current_user: User,
+    user: User,
+    common_songs: List[Song],
+    top_songs: List[Song],
+    final_score: float,
+    similarity_score: float,
+    rating_similarity: float,
+    user_song_count: int
+) -> Dict:
+    """
+    Recommendation dictionary with the display data for one user
+    
+    `common_songs` comes from load_common_songs() and `top_songs` from
+    load_top_songs_by_user().
+    """
+    # Get common items for display
+    common_genres = set(current_user.top_genres or []) & set(user.top_genres or [])
+    common_artists = set(current_user.favorite_artists or []) & set(user.favorite_artists or [])
+    
+    # Map common songs (songs both users have) to full song objects
+    common_songs = [
+        {
+            "id": song.id,
+            "title": song.title,
+            "artist": song.artist,
+            "genre": song.genre
         }
-        common_song_keys = current_user_song_titles & user_song_titles
-        
-        # Map common songs to full song objects
-        common_songs = [
+        for song in common_songs
+    ]
+    
+    return {
+        "user_id": user.id,
+        "username": user.username,
+        "similarity_score": round(similarity_score, 3),
+        "final_score": round(final_score, 3),
+        "common_genres": list(common_genres),
+        "common_artists": list(common_artists),
+        "common_songs": common_songs,
+        "user_song_count": user_song_count,
+        "rating_similarity": round(rating_similarity, 3),
+        "top_songs": [
             {
                 "id": song.id,
                 "title": song.title,
                 "artist": song.artist,
-                "genre": song.genre
+                "genre": song.genre,
+                "rating": song.user_rating
             }
-            for song in user_songs
-            if (song.title.lower(), song.artist.lower()) in common_song_keys
+            for song in top_songs
         ]
-        
-        recommendation_data = {
-            "user_id": user.id,
-            "username": user.username,
-            "similarity_score": round(similarity_score, 3),
-            "final_score": round(final_score, 3),
-            "common_genres": list(common_genres),
-            "common_artists": list(common_artists),
-            "common_songs": common_songs,
-            "user_song_count": user_song_count,
-            "rating_similarity": round(rating_similarity, 3),
-            "top_songs": [
-                {
-                    "id": song.id,
-                    "title": song.title,
-                    "artist": song.artist,
-                    "genre": song.genre,
-                    "rating": song.user_rating
-                }
-                for song in top_songs
-            ]
-        }
-        
-        # Only apply min_similarity filter if we have enough high-scoring users
-        # Otherwise, include all users to ensure we always have recommendations
-        if similarity_score >= min_similarity:
-            recommendations.append(recommendation_data)
-        else:
-            # Store low-scoring users as fallback
-            all_candidates.append(recommendation_data)
-    
-    # Sort by final score (descending)
-    recommendations.sort(key=lambda x: x["final_score"], reverse=True)
-    
-    # If we don't have enough recommendations, add from fallback candidates
-    if len(recommendations) < limit:
-        # Sort fallback candidates by final_score
-        all_candidates.sort(key=lambda x: x["final_score"], reverse=True)
-        # Add fallback users to reach the limit
-        needed = limit - len(recommendations)
-        recommendations.extend(all_candidates[:needed])
-        # Re-sort the combined list
-        recommendations.sort(key=lambda x: x["final_score"], reverse=True)
-    
-    # Ensure we return exactly up to 'limit' recommendations
-    return recommendations[:limit]
+    }
 
 
-def _calculate_rating_similarity(
-    user1_songs: List[Song],
-    user2_songs: List[Song],
-    db: Session
-) -> float:
+def mmr_rerank(
+    relevance: np.ndarray,
+    pair_similarity: np.ndarray,
+    k: int,
+    diversity_factor: float,
+    primary_count: Optional[int] = None
+) -> Tuple[List[int], np.ndarray]:
     """
-    Calculate similarity based on how users rate similar songs
-    If both users rated the same song, compare their ratings
-    """
-    if not user1_songs or not user2_songs:
-        return 0.0
-    
-    # Create normalized song identifiers
-    user1_song_map = {
-        (song.title.lower(), song.artist.lower()): song.user_rating
-        for song in user1_songs if song.user_rating is not None
-    }
-    user2_song_map = {
-        (song.title.lower(), song.artist.lower()): song.user_rating
-        for song in user2_songs if song.user_rating is not None
-    }
-    
-    # Find songs both users rated
-    common_rated_songs = set(user1_song_map.keys()) & set(user2_song_map.keys())
-    
-    if not common_rated_songs:
-        return 0.0
-    
-    # Calculate average rating difference (lower difference = higher similarity)
-    rating_differences = []
-    for song_key in common_rated_songs:
-        rating1 = user1_song_map[song_key]
-        rating2 = user2_song_map[song_key]
-        diff = abs(rating1 - rating2)
-        rating_differences.append(diff)
-    
-    avg_difference = sum(rating_differences) / len(rating_differences)
-    
-    # Convert to similarity score (0-1, where 0 difference = 1.0 similarity)
-    # Max difference is 4 (1 vs 5), so normalize
-    similarity = 1.0 - (avg_difference / 4.0)
-    return max(0.0, similarity)
+    Greedy Maximal Marginal Relevance order of the first k picks
 
+    relevance[i] scores pool entry i and pair_similarity[i, j] is the taste
+    similarity of entries i and j. Each step picks the entry maximizing
+    (1 - diversity_factor) * relevance - diversity_factor * redundancy, where
+    redundancy is its highest similarity to an entry already picked; it is
+    kept as a running maximum, so each step is one vectorized pass over the
+    pool. The first `primary_count` entries (default: all) are picked before
+    any of the others. Ties go to the earlier entry.
 
-def _calculate_diversity_score(
-    user1_genres: List[str],
-    user2_genres: List[str]
-) -> float:
+    Returns the picked indices and every entry's redundancy at the time it
+    was picked.
     """
-    Calculate diversity score - balance between similarity and exploration
-    Higher score means some overlap but also some unique genres
-    """
-    if not user1_genres or not user2_genres:
-        return 0.0
-    
-    user1_genres_set = set(user1_genres)
-    user2_genres_set = set(user2_genres)
-    
-    common = user1_genres_set & user2_genres_set
-    unique_to_user2 = user2_genres_set - user1_genres_set
-    
-    # Score based on having both common and unique genres
-    if not common:
-        return 0.0  # No overlap = no diversity score
-    
-    # Balance: some common genres + some new genres to explore
-    common_ratio = len(common) / max(len(user1_genres_set | user2_genres_set), 1)
-    unique_ratio = len(unique_to_user2) / max(len(user2_genres_set), 1)
-    
-    # Diversity score encourages exploration while maintaining similarity
-    diversity = (common_ratio * 0.6) + (unique_ratio * 0.4)
-    return min(1.0, diversity)
+    n = len(relevance)
+    if primary_count is None:
+        primary_count = n
+    redundancy = np.zeros(n, dtype=np.float64)
+    picked_redundancy = np.zeros(n, dtype=np.float64)
+    available = np.ones(n, dtype=bool)
+    primary = np.arange(n) < primary_count
+    order = []
+    for _ in range(min(k, n)):
+        eligible = available & primary
+        if not eligible.any():
+            eligible = available
+        marginal = np.where(
+            eligible, (1 - diversity_factor) * relevance - diversity_factor * redundancy, -np.inf
+        )
+        best = int(np.argmax(marginal))
+        order.append(best)
+        picked_redundancy[best] = redundancy[best]
+        available[best] = False
+        np.maximum(redundancy, pair_similarity[best], out=redundancy)
+    return order, picked_redundancy
 
 
 def get_song_recommendations(
@@ -287,91 +460,123 @@ def get_song_recommendations(
     1. Songs liked by users with similar taste
     2. Songs from connected users
     3. Popular songs in user's favorite genres
+    
+    Songs from users with similar taste come from the item-item
+    co-occurrence model (see services.cooccurrence), a lookup over the
+    user's own songs rather than a full user recommendation pass.
     """
     recommendations = []
     
+    # Normalized keys of the songs the user already has
+    with trace_stage("profile"):
+        current_user_profile = get_taste_profile(current_user.id, db)
+        current_user_song_set = set(current_user_profile.song_keys or {})
+    
     # Get songs from connected users
-    if from_connections:
-        connections = db.query(Connection).filter(
-            ((Connection.user_id == current_user.id) | 
-             (Connection.connected_user_id == current_user.id)),
-            Connection.status == ConnectionStatus.ACCEPTED
-        ).all()
+    with trace_stage("connected_users"):
+        if from_connections:
+            connections = db.query(Connection).filter(
+                ((Connection.user_id == current_user.id) | 
+                 (Connection.connected_user_id == current_user.id)),
+                Connection.status == ConnectionStatus.ACCEPTED
+            ).all()
         
-        connected_user_ids = []
-        for conn in connections:
-            if conn.user_id == current_user.id:
-                connected_user_ids.append(conn.connected_user_id)
-            else:
-                connected_user_ids.append(conn.user_id)
+            connected_user_ids = []
+            for conn in connections:
+                if conn.user_id == current_user.id:
+                    connected_user_ids.append(conn.connected_user_id)
+                else:
+                    connected_user_ids.append(conn.user_id)
         
-        if connected_user_ids:
-            # Get favorite songs from connected users
-            connected_songs = db.query(Song).filter(
-                Song.user_id.in_(connected_user_ids),
-                Song.is_favorite == True
-            ).order_by(Song.user_rating.desc().nulls_last()).limit(limit * 2).all()
+            if connected_user_ids:
+                # Get favorite songs from connected users
+                connected_songs = db.query(Song).filter(
+                    Song.user_id.in_(connected_user_ids),
+                    Song.is_favorite == True
+                ).order_by(Song.user_rating.desc().nulls_last()).limit(limit * 2).all()
             
-            # Filter out songs user already has
-            current_user_song_set = {
-                (song.title.lower(), song.artist.lower())
-                for song in db.query(Song).filter(Song.user_id == current_user.id).all()
-            }
-            
-            for song in connected_songs:
-                song_key = (song.title.lower(), song.artist.lower())
-                if song_key not in current_user_song_set:
-                    recommendations.append({
-                        "id": song.id,
-                        "title": song.title,
-                        "artist": song.artist,
-                        "genre": song.genre,
-                        "album": song.album,
-                        "rating": song.user_rating,
-                        "source": "connected_user",
-                        "user_id": song.user_id
-                    })
-    
-    # Get songs from similar users (not yet connected)
-    if len(recommendations) < limit:
-        # Get top similar users
-        similar_users = get_user_recommendations(
-            current_user, db, limit=5, exclude_connected=True
-        )
+                for song in connected_songs:
+                    # Filter out songs user already has
+                    if song_key(song.title, song.artist) not in current_user_song_set:
+                        recommendations.append({
+                            "id": song.id,
+                            "title": song.title,
+                            "artist": song.artist,
+                            "genre": song.genre,
+                            "album": song.album,
+                            "rating": song.user_rating,
+                            "source": "connected_user",
+                            "user_id": song.user_id
+                        })
+    
+    trace_count("from_connected_users", len(recommendations))
+    
+    # Get songs that co-occur with the user's own songs in other libraries
+    with trace_stage("cooccurrence"):
+        if len(recommendations) < limit:
+            scored_keys = get_cooccurring_song_keys(
+                current_user_profile, db, current_user_song_set, limit
+            )
+            songs_by_key = load_songs_for_keys([key for key, _ in scored_keys], db)
         
-        similar_user_ids = [rec["user_id"] for rec in similar_users]
-        if similar_user_ids:
-            similar_songs = db.query(Song).filter(
-                Song.user_id.in_(similar_user_ids),
-                Song.is_favorite == True
-            ).order_by(Song.user_rating.desc().nulls_last()).limit(limit).all()
-            
-            current_user_song_set = {
-                (song.title.lower(), song.artist.lower())
-                for song in db.query(Song).filter(Song.user_id == current_user.id).all()
-            }
-            
-            for song in similar_songs:
-                song_key = (song.title.lower(), song.artist.lower())
-                if song_key not in current_user_song_set:
-                    recommendations.append({
-                        "id": song.id,
-                        "title": song.title,
-                        "artist": song.artist,
-                        "genre": song.genre,
-                        "album": song.album,
-                        "rating": song.user_rating,
-                        "source": "similar_user",
-                        "user_id": song.user_id
-                    })
+            for key, score in scored_keys:
+                song = songs_by_key.get(key)
+                if song is None:
+                    continue
+                recommendations.append({
+                    "id": song.id,
+                    "title": song.title,
+                    "artist": song.artist,
+                    "genre": song.genre,
+                    "album": song.album,
+                    "rating": song.user_rating,
+                    "source": "similar_user",
+                    "user_id": song.user_id
+                })
+    
+    trace_count("after_cooccurrence", len(recommendations))
+    
+    # Get popular songs in the user's favorite genres (works without connections)
+    with trace_stage("popular_in_genre"):
+        if len(recommendations) < limit:
+            popular = get_popular_song_keys(
+                _favorite_genres(current_user, current_user_profile), db,
+                current_user_song_set, limit
+            )
+            songs_by_key = load_songs_for_keys([stats.song_key for stats in popular], db)
+        
+            for stats in popular:
+                song = songs_by_key.get(stats.song_key)
+                if song is None:
+                    continue
+                recommendations.append({
+                    "id": song.id,
+                    "title": song.title,
+                    "artist": song.artist,
+                    "genre": song.genre,
+                    "album": song.album,
+                    "rating": song.user_rating,
+                    "source": "popular_in_genre",
+                    "user_id": song.user_id
+                })
+    
+    trace_count("after_popular_in_genre", len(recommendations))
     
     # Remove duplicates and return
     seen = set()
     unique_recommendations = []
     for rec in recommendations:
-        key = (rec["title"].lower(), rec["artist"].lower())
+        key = song_key(rec["title"], rec["artist"])
         if key not in seen:
             seen.add(key)
             unique_recommendations.append(rec)
+    trace_count("returned", min(len(unique_recommendations), limit))
     
     return unique_recommendations[:limit]
+
+
+def _favorite_genres(user: User, profile: UserTasteProfile, max_genres: int = 5) -> List[str]:
+    """The user's top genres, most listened to first (by their songs' genres)"""
+    song_genres = profile.song_genres or {}
+    genres = {genre.lower() for genre in (user.top_genres or []) if genre}
+    return sorted(genres, key=lambda genre: (-song_genres.get(genre, 0), genre))[:max_genres]
@@ -0,0 +1,299 @@
+"""
+Materialized cache for get_user_recommendations()
+
+Results are kept per (user, parameters) in a bounded LRU with a TTL.
+Entries whose TTL passed, or whose underlying data changed, become stale:
+they are still served immediately while a background refresh recomputes
+them (stale-while-revalidate). Entries older than the max-stale age are
+dropped and recomputed synchronously.
+
+The cache lives in process memory, so each worker keeps its own copy and
+only sees invalidations from requests it handled itself; the TTL bounds
+how stale another worker's entries can get.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.services.recommendation import get_user_recommendations
+
+CacheKey = Tuple
+
+
+@dataclass
+class _Entry:
+    value: List[Dict]
+    created_at: float
+    member_ids: Set[int] = field(default_factory=set)
+    stale: bool = False
+
+
+class RecommendationCache:
+    """Thread-safe LRU + TTL cache with stale-while-revalidate"""
+
+    def __init__(self, max_size: int, ttl: float, max_stale: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # user id -> keys whose entry is owned by or mentions that user
+        self._keys_by_user: Dict[int, Set[CacheKey]] = {}
+        self._refreshing: Set[CacheKey] = set()
+        # Invalidations that computations still running may have missed:
+        # each invalidation bumps the generation, and while anything is
+        # being computed, the user's latest one is noted here (cleared once
+        # nothing runs); a result is only stored if nothing it depends on
+        # was invalidated after its computation started
+        self._generation = 0
+        self._running = 0
+        self._changed_users: Dict[int, int] = {}
+        self._dropped_owners: Dict[int, int] = {}
+        self._cleared_at = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rec-cache")
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "discarded_refreshes": 0,
+            "discarded_misses": 0,
+            "invalidations": 0,
+            "evictions": 0,
+        }
+
+    def get(
+        self,
+        key: CacheKey,
+        compute: Callable[[], List[Dict]],
+        refresh: Callable[[], List[Dict]]
+    ) -> List[Dict]:
+        """
+        Return the cached value for `key`
+
+        `compute` runs inline on a miss; `refresh` runs in the background
+        (with its own database session) when a stale entry is served.
+        Either result is only stored if no invalidation it may predate
+        landed while it ran.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created_at > self.max_stale:
+                self._remove(key)
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if not entry.stale and now - entry.created_at > self.ttl:
+                    entry.stale = True
+                if not entry.stale:
+                    self.stats["hits"] += 1
+                    return entry.value
+                self.stats["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._executor.submit(self._refresh, key, refresh, self._start())
+                return entry.value
+
+            self.stats["misses"] += 1
+            started = self._start()
+
+        try:
+            value = compute()
+            with self._lock:
+                if self._outdated(key, value, started):
+                    self.stats["discarded_misses"] += 1
+                else:
+                    self._put(key, value)
+        finally:
+            with self._lock:
+                self._stop()
+        return value
+
+    def put(self, key: CacheKey, value: List[Dict]):
+        with self._lock:
+            self._put(key, value)
+
+    def invalidate_user(self, user_id: int):
+        """
+        Mark stale every entry owned by `user_id` or listing them as a candidate
+
+        Stale entries keep being served while they refresh in the background.
+        """
+        with self._lock:
+            keys = list(self._keys_by_user.get(user_id, ()))
+            for key in keys:
+                self._entries[key].stale = True
+            self._invalidated(self._changed_users, user_id, keys)
+
+    def drop_owner(self, user_id: int):
+        """
+        Remove the entries owned by `user_id`
+
+        For changes where serving the old ranking would be wrong rather
+        than just outdated (e.g. it lists a user they just connected with).
+        """
+        with self._lock:
+            keys = [key for key in self._keys_by_user.get(user_id, ()) if key[0] == user_id]
+            for key in keys:
+                self._remove(key)
+            self._invalidated(self._dropped_owners, user_id, keys)
+
+    def _invalidated(self, changes: Dict[int, int], user_id: int, keys: List[CacheKey]):
+        """Bookkeeping after invalidating `keys` for `user_id`; caller holds the lock"""
+        self._generation += 1
+        if self._running:
+            # A running computation may have read the old data
+            changes[user_id] = self._generation
+        self.stats["invalidations"] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._refreshing.clear()
+            self._changed_users.clear()
+            self._dropped_owners.clear()
+            self._generation += 1
+            self._cleared_at = self._generation
+
+    def _start(self) -> int:
+        """Register a running computation; caller holds the lock. Returns its start generation"""
+        self._running += 1
+        return self._generation
+
+    def _stop(self):
+        """Unregister a finished computation; caller holds the lock"""
+        self._running -= 1
+        if not self._running:
+            self._changed_users.clear()
+            self._dropped_owners.clear()
+
+    def _outdated(self, key: CacheKey, value: List[Dict], started: int) -> bool:
+        """
+        Whether `value`, computed from data read after generation `started`,
+        may predate an invalidation of its owner or a user it lists (e.g.
+        list a user who was just connected with); caller holds the lock
+        """
+        if self._cleared_at > started or self._dropped_owners.get(key[0], 0) > started:
+            return True
+        member_ids = {key[0]} | {rec["user_id"] for rec in value}
+        return any(self._changed_users.get(user_id, 0) > started for user_id in member_ids)
+
+    def snapshot_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _refresh(self, key: CacheKey, refresh: Callable[[], List[Dict]], started: int):
+        try:
+            value = refresh()
+        except Exception as e:
+            print(f"Error refreshing recommendations: {e}")
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+        else:
+            with self._lock:
+                if self._outdated(key, value, started):
+                    # Keep the entry as it is (stale or dropped); the next
+                    # lookup refreshes or recomputes it
+                    self.stats["discarded_refreshes"] += 1
+                else:
+                    self._put(key, value)
+                    self.stats["refreshes"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+                self._stop()
+
+    def _put(self, key: CacheKey, value: List[Dict]):
+        """Store one entry; caller holds the lock"""
+        member_ids = {key[0]} | {rec["user_id"] for rec in value}
+        self._remove(key)
+        self._entries[key] = _Entry(value=value, created_at=time.monotonic(), member_ids=member_ids)
+        for user_id in member_ids:
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_size:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+
+    def _remove(self, key: CacheKey):
+        """Drop one entry; caller holds the lock"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for user_id in entry.member_ids:
+            keys = self._keys_by_user.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[user_id]
+
+
+recommendation_cache = RecommendationCache(
+    max_size=settings.RECOMMENDATION_CACHE_SIZE,
+    ttl=settings.RECOMMENDATION_CACHE_TTL,
+    max_stale=settings.RECOMMENDATION_CACHE_MAX_STALE
+)
+
+
+def _recompute(user_id: int, params: Dict) -> List[Dict]:
+    """Background refresh: runs outside the request, so it opens its own session"""
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return []
+        return get_user_recommendations(user, db, **params)
+    finally:
+        db.close()
+
+
+def get_cached_user_recommendations(
+    current_user: User,
+    db: Session,
+    limit: int = 10,
+    min_similarity: float = 0.0,
+    exclude_connected: bool = True,
+    diversity_factor: float = 0.2,
+    source: str = "live"
+) -> List[Dict]:
+    """
+    Cached get_user_recommendations(); same arguments and result
+
+    The returned list is shared with the cache and must not be modified.
+    """
+    params = {
+        "limit": limit,
+        "min_similarity": min_similarity,
+        "exclude_connected": exclude_connected,
+        "diversity_factor": diversity_factor,
+        "source": source,
+    }
+    key = (current_user.id,) + tuple(params.values())
+    user_id = current_user.id
+    return recommendation_cache.get(
+        key,
+        compute=lambda: get_user_recommendations(current_user, db, **params),
+        refresh=lambda: _recompute(user_id, params)
+    )
+
+
+def invalidate_connection(user_id: int, connected_user_id: int):
+    """A connection between two users was created or changed"""
+    recommendation_cache.drop_owner(user_id)
+    recommendation_cache.drop_owner(connected_user_id)
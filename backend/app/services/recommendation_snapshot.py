@@ -0,0 +1,162 @@
+"""
+Paged user recommendations served from stored ranking snapshots
+
+The first page ranks up to settings.RECOMMENDATION_SNAPSHOT_DEPTH candidates
+once and stores the ordered ids and scores; later pages are slices of that
+snapshot, so paging deeper never rescores anyone. A snapshot ends when it
+expires, when the owner's data version changes (songs, genres, artists
+or connections) or when a ranked candidate's taste version changes, after
+which the client starts again without a cursor. A request without a
+cursor reuses the owner's snapshot for the same parameters while it is
+still current, and replaces it otherwise, so each user keeps at most one
+live snapshot per parameter set.
+"""
+import base64
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.recommendation_snapshot import RecommendationSnapshot
+from app.models.user import User
+from app.services.data_versions import get_data_version, sum_taste_versions
+from app.services.recommendation import rank_user_candidates, build_user_recommendations
+
+
+def encode_cursor(snapshot_id: int, token: str, data_version: int, offset: int) -> str:
+    raw = f"{snapshot_id}.{token}.{data_version}.{offset}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str, int, int]]:
+    """(snapshot id, token, data version, offset), or None if the cursor is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        snapshot_id, token, data_version, offset = raw.split(".")
+        snapshot_id, data_version, offset = int(snapshot_id), int(data_version), int(offset)
+    except ValueError:
+        return None
+    if offset < 0 or not token:
+        return None
+    return snapshot_id, token, data_version, offset
+
+
+def _candidates_unchanged(snapshot: RecommendationSnapshot, db: Session) -> bool:
+    if snapshot.candidate_version is None:
+        return False
+    return sum_taste_versions([entry[0] for entry in snapshot.entries], db) == snapshot.candidate_version
+
+
+def get_or_create_snapshot(current_user: User, db: Session, params: Dict) -> RecommendationSnapshot:
+    """
+    The owner's live snapshot for `params` if nothing it depends on changed,
+    otherwise a newly ranked one that replaces it
+    """
+    data_version = get_data_version(current_user.id, db)
+    now = datetime.now(timezone.utc)
+    live = db.query(RecommendationSnapshot).filter(
+        RecommendationSnapshot.user_id == current_user.id,
+        RecommendationSnapshot.data_version == data_version,
+        RecommendationSnapshot.expires_at > now
+    ).order_by(RecommendationSnapshot.id.desc()).all()
+    same_params = [snapshot for snapshot in live if snapshot.params == params]
+    if same_params and _candidates_unchanged(same_params[0], db):
+        return same_params[0]
+
+    ranked = rank_user_candidates(
+        current_user, db, settings.RECOMMENDATION_SNAPSHOT_DEPTH, **params
+    )
+    candidate_ids = [user.id for user, *_ in ranked]
+
+    # Drop this user's snapshots that can no longer be paged through,
+    # and the ones this snapshot replaces
+    db.query(RecommendationSnapshot).filter(
+        RecommendationSnapshot.user_id == current_user.id,
+        or_(
+            RecommendationSnapshot.expires_at <= now,
+            RecommendationSnapshot.data_version != data_version,
+            RecommendationSnapshot.id.in_([snapshot.id for snapshot in same_params])
+        )
+    ).delete(synchronize_session="fetch")  # The new row may reuse a deleted id
+
+    snapshot = RecommendationSnapshot(
+        user_id=current_user.id,
+        token=secrets.token_hex(16),
+        data_version=data_version,
+        candidate_version=sum_taste_versions(candidate_ids, db),
+        params=params,
+        entries=[
+            [user.id, final_score, similarity_score, rating_similarity, song_count]
+            for user, final_score, similarity_score, rating_similarity, song_count in ranked
+        ],
+        expires_at=now + timedelta(seconds=settings.RECOMMENDATION_SNAPSHOT_TTL)
+    )
+    db.add(snapshot)
+    db.commit()
+    return snapshot
+
+
+def _live_snapshot(current_user: User, cursor: str, db: Session) -> Optional[Tuple[RecommendationSnapshot, int]]:
+    decoded = decode_cursor(cursor)
+    if decoded is None:
+        return None
+    snapshot_id, token, data_version, offset = decoded
+    snapshot = db.query(RecommendationSnapshot).filter(
+        RecommendationSnapshot.id == snapshot_id,
+        RecommendationSnapshot.token == token,
+        RecommendationSnapshot.user_id == current_user.id,
+        RecommendationSnapshot.data_version == data_version,
+        RecommendationSnapshot.expires_at > datetime.now(timezone.utc)
+    ).first()
+    if snapshot is None or get_data_version(current_user.id, db) != data_version:
+        return None
+    if not _candidates_unchanged(snapshot, db):
+        return None
+    return snapshot, offset
+
+
+def get_recommendation_page(
+    current_user: User,
+    db: Session,
+    limit: int,
+    cursor: Optional[str] = None,
+    params: Optional[Dict] = None
+) -> Optional[Dict]:
+    """
+    One page of recommendations: {"items", "next_cursor", "total"}
+
+    Without a cursor the first page comes from the current snapshot for
+    `params` (the ranking arguments of get_user_recommendations), ranked
+    now if there is none. With a cursor the page comes
+    from its snapshot and `params` is ignored; returns None if the cursor
+    is invalid or its snapshot has expired.
+    """
+    if cursor is None:
+        snapshot, offset = get_or_create_snapshot(current_user, db, params or {}), 0
+    else:
+        live = _live_snapshot(current_user, cursor, db)
+        if live is None:
+            return None
+        snapshot, offset = live
+
+    entries = snapshot.entries[offset:offset + limit]
+    users = {
+        user.id: user
+        for user in db.query(User).filter(User.id.in_([entry[0] for entry in entries])).all()
+    }
+    ranked = [
+        (users[user_id], final_score, similarity_score, rating_similarity, song_count)
+        for user_id, final_score, similarity_score, rating_similarity, song_count in entries
+        if user_id in users  # Deleted since the snapshot was taken
+    ]
+
+    next_offset = offset + limit
+    return {
+        "items": build_user_recommendations(current_user, ranked, db),
+        "next_cursor": (
+            encode_cursor(snapshot.id, snapshot.token, snapshot.data_version, next_offset)
+            if next_offset < len(snapshot.entries) else None
+        ),
+        "total": len(snapshot.entries),
+    }
@@ -3,7 +3,7 @@ Similarity calculation service for matching users based on music taste
 """
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.models.song import Song
+from app.services.taste_profile import load_taste_profiles
 
 
 def calculate_similarity_score(user1: User, user2: User, db: Session) -> float:
@@ -17,9 +17,10 @@ def calculate_similarity_score(user1: User, user2: User, db: Session) -> float:
     
     Returns a score between 0.0 and 1.0
     """
-    # Get songs for both users
-    user1_songs = db.query(Song).filter(Song.user_id == user1.id).all()
-    user2_songs = db.query(Song).filter(Song.user_id == user2.id).all()
+    # Get precomputed taste profiles for both users
+    profiles = load_taste_profiles([user1.id, user2.id], db)
+    user1_profile = profiles[user1.id]
+    user2_profile = profiles[user2.id]
     
     # Extract genres, artists, and songs
     user1_genres = set(user1.top_genres or [])
@@ -28,23 +29,17 @@ def calculate_similarity_score(user1: User, user2: User, db: Session) -> float:
     user1_artists = set(user1.favorite_artists or [])
     user2_artists = set(user2.favorite_artists or [])
     
-    # Get song titles and artists from user songs
-    user1_song_set = {(song.title.lower(), song.artist.lower()) for song in user1_songs}
-    user2_song_set = {(song.title.lower(), song.artist.lower()) for song in user2_songs}
+    # Normalized (title, artist) keys of the users' songs
+    user1_song_set = set(user1_profile.song_keys or {})
+    user2_song_set = set(user2_profile.song_keys or {})
     
     # Get favorite songs (weighted higher)
-    user1_favorites = {
-        (song.title.lower(), song.artist.lower())
-        for song in user1_songs if song.is_favorite
-    }
-    user2_favorites = {
-        (song.title.lower(), song.artist.lower())
-        for song in user2_songs if song.is_favorite
-    }
+    user1_favorites = set(user1_profile.favorite_keys or {})
+    user2_favorites = set(user2_profile.favorite_keys or {})
     
     # Extract genres from songs (more accurate than just top_genres)
-    user1_song_genres = {song.genre.lower() for song in user1_songs if song.genre}
-    user2_song_genres = {song.genre.lower() for song in user2_songs if song.genre}
+    user1_song_genres = set(user1_profile.song_genres or {})
+    user2_song_genres = set(user2_profile.song_genres or {})
     
     # Calculate overlaps using Jaccard similarity
     # Jaccard = intersection / union
@@ -0,0 +1,98 @@
+"""
+Offline all-pairs similarity job
+
+Computes calculate_similarity_score()-equivalent scores for every pair of
+users in blocks and stores the top-N neighbours of each user in the
+user_similarity table, so recommendations can be served from it.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user import User
+from app.models.user_similarity import UserSimilarity
+from app.services.batch_similarity import TasteMatrix, round_scores
+
+# Upper bound on the cells of one dense block (rows x users) held in memory
+_MAX_BLOCK_CELLS = 4_000_000
+
+
+def _top_neighbors(scores: np.ndarray, user_ids: np.ndarray, keep: int) -> List[Tuple[int, float]]:
+    """
+    Best `keep` positive scores of one row as (neighbor_id, rounded score)
+
+    Partitioning only finds the cut-off score; every candidate tied with it
+    is then sorted by (score desc, user id asc), so ties at the boundary
+    resolve the same way as in pair_overlap._top_neighbors().
+    """
+    cutoff = -np.partition(-scores, keep - 1)[keep - 1]
+    candidates = np.flatnonzero((scores >= cutoff) & (scores > 0))
+    order = np.lexsort((user_ids[candidates], -scores[candidates]))[:keep]
+    chosen = candidates[order]
+    return list(zip(user_ids[chosen].tolist(), round_scores(scores[chosen]).tolist()))
+
+
+def compute_user_similarities(
+    db: Session,
+    top_n: Optional[int] = None,
+    block_size: Optional[int] = None
+) -> int:
+    """
+    Recompute the user_similarity table from scratch
+
+    The old rows are deleted and the new ones written in a single
+    transaction, committed at the end, so readers keep seeing the previous
+    table until the whole new one is in place. Neighbours are ranked like
+    refresh_user_similarities() ranks them: score descending, then
+    neighbour id. Returns the number of neighbour rows written.
+    """
+    top_n = top_n or settings.SIMILARITY_TOP_N
+    users = db.query(User).order_by(User.id).all()
+    if len(users) < 2:
+        return 0
+
+    matrix = TasteMatrix.load(users, db)
+    user_ids = np.asarray(matrix.user_ids, dtype=np.int64)
+    n = len(user_ids)
+    block_size = block_size or max(1, min(512, _MAX_BLOCK_CELLS // n))
+    keep = min(top_n, n - 1)
+
+    db.query(UserSimilarity).delete(synchronize_session=False)
+    written = 0
+    for start in range(0, n, block_size):
+        rows = np.arange(start, min(start + block_size, n))
+        similarity = matrix.block_similarity(rows)
+        similarity[np.arange(len(rows)), rows] = -1.0  # Never your own neighbour
+
+        values = []
+        for i, row in enumerate(rows.tolist()):
+            for neighbor, score in _top_neighbors(similarity[i], user_ids, keep):
+                values.append({
+                    "user_id": int(user_ids[row]),
+                    "neighbor_id": neighbor,
+                    "similarity_score": score,
+                })
+        if values:
+            db.execute(insert(UserSimilarity), values)
+            written += len(values)
+    db.commit()
+    return written
+
+
+def get_precomputed_neighbors(
+    user_id: int,
+    db: Session,
+    exclude_ids: Set[int],
+    limit: Optional[int] = None
+) -> Dict[int, float]:
+    """Stored neighbours of a user (neighbor_id -> similarity_score), best first"""
+    query = db.query(UserSimilarity.neighbor_id, UserSimilarity.similarity_score).filter(
+        UserSimilarity.user_id == user_id
+    )
+    if exclude_ids:
+        query = query.filter(~UserSimilarity.neighbor_id.in_(exclude_ids))
+    rows = query.order_by(UserSimilarity.similarity_score.desc(), UserSimilarity.neighbor_id).limit(
+        limit or settings.SIMILARITY_TOP_N
+    ).all()
+    return {row.neighbor_id: row.similarity_score for row in rows}
@@ -0,0 +1,45 @@
+"""
+Hooks that keep derived recommendation indexes in sync with a user's taste
+(songs, genres and artists) and connections
+"""
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.services.cooccurrence import sync_user_cooccurrence
+from app.services.data_versions import bump_data_version
+from app.services.embeddings import embedding_index, update_user_embedding
+from app.services.lsh import update_user_minhash
+from app.services.pair_overlap import refresh_user_similarities
+from app.services.posting_index import sync_user_postings
+from app.services.taste_profile import get_taste_profile
+from app.services.recommendation_cache import recommendation_cache, invalidate_connection
+
+
+def taste_changed(user: User, db: Session):
+    """
+    Refresh everything derived from `user`'s taste data and commit
+
+    Call after the user's songs, top_genres or favorite_artists changed
+    (and after the taste profile itself was updated).
+    """
+    profile = get_taste_profile(user.id, db)
+    update_user_minhash(user, db, profile)
+    sync_user_postings(user, db, profile)
+    refresh_user_similarities(user.id, db)
+    sync_user_cooccurrence(user.id, db, profile)
+    vector = update_user_embedding(user, db, profile)
+    bump_data_version(user.id, db, taste=True)
+    db.commit()
+    embedding_index.upsert(user.id, vector)
+    recommendation_cache.invalidate_user(user.id)
+
+
+def connection_changed(user_id: int, connected_user_id: int, db: Session):
+    """
+    A connection between two users was created or changed; commits
+
+    Their recommendations must no longer list each other.
+    """
+    bump_data_version(user_id, db)
+    bump_data_version(connected_user_id, db)
+    db.commit()
+    invalidate_connection(user_id, connected_user_id)
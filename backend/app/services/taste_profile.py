@@ -0,0 +1,216 @@
+"""
+Per-user taste profiles: normalized song keys, favorites, song genres and
+ratings kept up to date incrementally as songs are added, edited or deleted
+"""
+from typing import Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.song import Song
+from app.models.taste_profile import UserTasteProfile
+
+# Separator between normalized title and artist in a song key
+# (JSON object keys must be strings, so tuples can't be stored directly)
+SONG_KEY_SEPARATOR = "\x1f"
+
+
+def song_key(title: str, artist: str) -> str:
+    """Normalized identifier for a song, shared by every user who has it"""
+    return f"{title.lower()}{SONG_KEY_SEPARATOR}{artist.lower()}"
+
+
+def snapshot_song(song: Song) -> Dict:
+    """Copy the fields a profile depends on, before the song is changed"""
+    return {
+        "id": song.id,
+        "title": song.title,
+        "artist": song.artist,
+        "genre": song.genre,
+        "is_favorite": bool(song.is_favorite),
+        "user_rating": song.user_rating,
+    }
+
+
+def _new_profile(user_id: int) -> UserTasteProfile:
+    return UserTasteProfile(
+        user_id=user_id,
+        song_keys={},
+        favorite_keys={},
+        song_genres={},
+        ratings={},
+        song_count=0,
+        favorite_count=0
+    )
+
+
+def _increment(counter: Dict[str, int], key: str, amount: int):
+    count = counter.get(key, 0) + amount
+    if count > 0:
+        counter[key] = count
+    else:
+        counter.pop(key, None)
+
+
+def _apply(profile: UserTasteProfile, song: Dict, sign: int) -> Optional[str]:
+    """
+    Add (sign=1) or remove (sign=-1) one song's contribution
+
+    Returns the song key if removing the song left its rating entry
+    unresolved (another copy of the song may still carry a rating).
+    """
+    key = song_key(song["title"], song["artist"])
+    # Work on copies so SQLAlchemy notices the JSON columns changed
+    song_keys = dict(profile.song_keys or {})
+    favorite_keys = dict(profile.favorite_keys or {})
+    song_genres = dict(profile.song_genres or {})
+    ratings = dict(profile.ratings or {})
+
+    _increment(song_keys, key, sign)
+    profile.song_count = (profile.song_count or 0) + sign
+    if song["is_favorite"]:
+        _increment(favorite_keys, key, sign)
+        profile.favorite_count = (profile.favorite_count or 0) + sign
+    if song["genre"]:
+        _increment(song_genres, song["genre"].lower(), sign)
+
+    unresolved = None
+    current = ratings.get(key)
+    if sign > 0:
+        # The highest song id wins, like building {key: rating} in id order
+        if song["user_rating"] is not None and (current is None or song["id"] >= current[0]):
+            ratings[key] = [song["id"], song["user_rating"]]
+    elif current is not None and current[0] == song["id"]:
+        del ratings[key]
+        if key in song_keys:
+            unresolved = key
+
+    profile.song_keys = song_keys
+    profile.favorite_keys = favorite_keys
+    profile.song_genres = song_genres
+    profile.ratings = ratings
+    return unresolved
+
+
+def _resolve_rating(profile: UserTasteProfile, key: str, db: Session):
+    """Find the rating of the newest remaining copy of a song"""
+    rated_songs = db.query(Song.id, Song.title, Song.artist, Song.user_rating).filter(
+        Song.user_id == profile.user_id,
+        Song.user_rating.isnot(None)
+    ).order_by(Song.id).all()
+
+    ratings = dict(profile.ratings or {})
+    for song in rated_songs:
+        if song_key(song.title, song.artist) == key:
+            ratings[key] = [song.id, song.user_rating]
+    profile.ratings = ratings
+
+
+def build_taste_profile(user_id: int, songs: List) -> UserTasteProfile:
+    """Build a profile from scratch from a user's songs (in id order)"""
+    profile = _new_profile(user_id)
+    for song in songs:
+        _apply(profile, snapshot_song(song), 1)
+    return profile
+
+
+def _songs_by_user(user_ids: List[int], db: Session) -> Dict[int, List[Song]]:
+    songs_by_user = {user_id: [] for user_id in user_ids}
+    query = db.query(Song)
+    if len(user_ids) <= 500:
+        query = query.filter(Song.user_id.in_(user_ids))
+    for song in query.order_by(Song.id).all():
+        if song.user_id in songs_by_user:
+            songs_by_user[song.user_id].append(song)
+    return songs_by_user
+
+
+def load_taste_profiles(user_ids: List[int], db: Session) -> Dict[int, UserTasteProfile]:
+    """
+    Load profiles for many users in one query
+
+    Users without a stored profile (e.g. created before profiles existed)
+    get one built from their songs and saved.
+    """
+    if not user_ids:
+        return {}
+    wanted = set(user_ids)
+    query = db.query(UserTasteProfile)
+    if len(wanted) <= 500:
+        query = query.filter(UserTasteProfile.user_id.in_(wanted))
+    profiles = {
+        profile.user_id: profile
+        for profile in query.all()
+        if profile.user_id in wanted
+    }
+
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        songs_by_user = _songs_by_user(missing, db)
+        built = [build_taste_profile(user_id, songs_by_user[user_id]) for user_id in missing]
+        _save_new_profiles(built, db)
+        profiles.update((profile.user_id, profile) for profile in built)
+
+    return profiles
+
+
+def _save_new_profiles(profiles: List[UserTasteProfile], db: Session):
+    """
+    Persist freshly built profiles in their own short transaction
+
+    Committing on `db` would expire every object the caller has loaded;
+    with expire_on_commit=False the saved profiles stay readable afterwards.
+    """
+    writer = Session(bind=db.get_bind(), expire_on_commit=False)
+    try:
+        writer.add_all(profiles)
+        writer.commit()
+    except IntegrityError:
+        # Another request built the same profiles first; ours are still valid
+        writer.rollback()
+    finally:
+        writer.close()
+
+
+def get_taste_profile(user_id: int, db: Session) -> UserTasteProfile:
+    """Load (or build) the profile for a single user"""
+    return load_taste_profiles([user_id], db)[user_id]
+
+
+def _stored_profile(user_id: int, db: Session) -> Optional[UserTasteProfile]:
+    """
+    Profile to apply a song change to, or None if there was no stored profile
+
+    A missing profile is built from the (already flushed) songs, so it
+    already reflects the change; it is saved by the caller's commit.
+    """
+    profile = db.get(UserTasteProfile, user_id)
+    if profile is None:
+        db.add(build_taste_profile(user_id, _songs_by_user([user_id], db)[user_id]))
+    return profile
+
+
+def record_song_added(song: Song, db: Session):
+    """Apply a newly added (and flushed) song to its owner's profile"""
+    profile = _stored_profile(song.user_id, db)
+    if profile is not None:
+        _apply(profile, snapshot_song(song), 1)
+
+
+def record_song_updated(before: Dict, song: Song, db: Session):
+    """Apply an edit: `before` is snapshot_song() taken before the change"""
+    profile = _stored_profile(song.user_id, db)
+    if profile is None:
+        return
+    unresolved = _apply(profile, before, -1)
+    _apply(profile, snapshot_song(song), 1)
+    if unresolved and unresolved not in (profile.ratings or {}):
+        _resolve_rating(profile, unresolved, db)
+
+
+def record_song_removed(before: Dict, user_id: int, db: Session):
+    """Apply a deleted (and flushed) song: `before` is its snapshot_song()"""
+    profile = _stored_profile(user_id, db)
+    if profile is None:
+        return
+    unresolved = _apply(profile, before, -1)
+    if unresolved:
+        _resolve_rating(profile, unresolved, db)
@@ -0,0 +1,82 @@
+"""
+Opt-in tracing for the recommendation endpoints (explain=true)
+
+A trace is bound to the current request with start_trace(); the scoring
+code records stages, counts and score breakdowns through trace_stage(),
+trace_count() and active_trace(). When no trace is active those helpers
+return immediately, so the normal path pays nothing beyond a context
+variable lookup.
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_active: ContextVar[Optional["RecommendationTrace"]] = ContextVar("recommendation_trace", default=None)
+_NOT_TRACED = nullcontext()
+
+
+class RecommendationTrace:
+    """Per-stage wall time and query counts, candidate counts and score breakdowns"""
+
+    def __init__(self):
+        self.queries = 0
+        self.stages: List[Dict] = []
+        self.counts: Dict[str, int] = {}
+        self.scores: Dict[int, Dict] = {}
+        self._started = time.perf_counter()
+
+    def _count_query(self, orm_execute_state):
+        self.queries += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        queries = self.queries
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "stage": name,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+                "queries": self.queries - queries,
+            })
+
+    def report(self) -> Dict:
+        return {
+            "total_ms": round((time.perf_counter() - self._started) * 1000, 3),
+            "total_queries": self.queries,
+            "stages": self.stages,
+            "counts": self.counts,
+        }
+
+
+@contextmanager
+def start_trace(db: Session):
+    """Trace the recommendation code run inside the block, counting queries on `db`"""
+    trace = RecommendationTrace()
+    token = _active.set(trace)
+    event.listen(db, "do_orm_execute", trace._count_query)
+    try:
+        yield trace
+    finally:
+        event.remove(db, "do_orm_execute", trace._count_query)
+        _active.reset(token)
+
+
+def active_trace() -> Optional[RecommendationTrace]:
+    return _active.get()
+
+
+def trace_stage(name: str):
+    """Context manager timing a stage; does nothing when not tracing"""
+    trace = _active.get()
+    return trace.stage(name) if trace is not None else _NOT_TRACED
+
+
+def trace_count(name: str, value: int):
+    trace = _active.get()
+    if trace is not None:
+        trace.counts[name] = value
@@ -4,6 +4,7 @@ Service to update user music preferences (genres, artists) from songs
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.models.song import Song
+from app.services.posting_index import add_posting, sync_user_postings
 
 
 def update_user_preferences_from_songs(user: User, db: Session):
@@ -34,6 +35,7 @@ def update_user_preferences_from_songs(user: User, db: Session):
     # Convert sets to sorted lists for consistency
     user.top_genres = sorted(list(genres_set))
     user.favorite_artists = sorted(list(artists_set))
+    sync_user_postings(user, db)
     
     db.commit()
 
@@ -63,6 +65,7 @@ def add_genre_to_user(user: User, genre: str, db: Session):
     if genre_lower not in existing_genres_lower:
         user.top_genres.append(genre)
         user.top_genres = sorted(user.top_genres)
+        add_posting(user.id, "genre", genre, db)
         db.commit()
 
 
@@ -91,4 +94,5 @@ def add_artist_to_user(user: User, artist: str, db: Session):
     if artist_lower not in existing_artists_lower:
         user.favorite_artists.append(artist)
         user.favorite_artists = sorted(user.favorite_artists)
+        add_posting(user.id, "artist", artist, db)
         db.commit()
@@ -0,0 +1,37 @@
+"""
+Build the item-item song co-occurrence model used for song recommendations
+The server builds it in a background thread after startup when the model is
+empty; run this to rebuild it after changing data outside the API
+
+Usage:
+    python build_cooccurrence_model.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.posting import TastePosting
+from app.models.cooccurrence import SongCooccurrence, UserItemWeights
+from app.services.cooccurrence import rebuild_cooccurrence_model
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Building song co-occurrence model...")
+        indexed = rebuild_cooccurrence_model(db)
+        print(f"✅ Indexed {indexed} users")
+        return True
+    except Exception as e:
+        print(f"❌ Error building song co-occurrence model: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
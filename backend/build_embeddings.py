@@ -0,0 +1,36 @@
+"""
+Build the dense taste embeddings used by source=embedding recommendations
+The server builds them in a background thread after startup when there are
+none; run this to refresh them periodically (document frequencies drift as users are added)
+or after changing data outside the API
+
+Usage:
+    python build_embeddings.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.embedding import UserEmbedding
+from app.services.embeddings import rebuild_embeddings
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Building taste embeddings...")
+        indexed = rebuild_embeddings(db)
+        print(f"✅ Built taste embeddings for {indexed} users")
+        return True
+    except Exception as e:
+        print(f"❌ Error building taste embeddings: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
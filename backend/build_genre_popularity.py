@@ -0,0 +1,36 @@
+"""
+Build the per-genre song popularity rollups used for song recommendations
+The server builds them in a background thread after startup when the rollups
+are empty; run this to refresh them periodically or after changing data
+outside the API
+
+Usage:
+    python build_genre_popularity.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.genre_popularity import GenreSongStats
+from app.services.genre_popularity import rebuild_genre_popularity
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Building genre popularity rollups...")
+        rows = rebuild_genre_popularity(db)
+        print(f"✅ Built {rows} genre/song rollups")
+        return True
+    except Exception as e:
+        print(f"❌ Error building genre popularity rollups: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,35 @@
+"""
+Build the MinHash/LSH recommendation candidate index for every user
+Run this once after upgrading, or after changing LSH_NUM_PERM / LSH_BANDS
+
+Usage:
+    python build_lsh_index.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.minhash import UserMinHash, LshBucket
+from app.services.lsh import rebuild_lsh_index
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Building LSH index...")
+        indexed = rebuild_lsh_index(db)
+        print(f"✅ Indexed {indexed} users")
+        return True
+    except Exception as e:
+        print(f"❌ Error building LSH index: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
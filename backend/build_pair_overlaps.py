@@ -0,0 +1,37 @@
+"""
+Recount the per-pair overlap counters used to keep user_similarity up to date
+compute_similarities.py recounts them before filling user_similarity, and
+the song routes keep them current; run this after changing data outside the API.
+Not built at server startup: one term shared by n users makes n^2 rows
+
+Usage:
+    python build_pair_overlaps.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.posting import TastePosting
+from app.models.pair_overlap import UserPairOverlap
+from app.services.pair_overlap import rebuild_pair_overlaps
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Counting pair overlaps...")
+        rows = rebuild_pair_overlaps(db)
+        print(f"✅ Stored {rows} pair overlap rows")
+        return True
+    except Exception as e:
+        print(f"❌ Error counting pair overlaps: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,37 @@
+"""
+Build the taste posting index (song/artist/genre -> users) for every user
+The server builds it in a background thread after startup when the index is
+empty; run this to build it ahead of a deploy or to rebuild it after changing
+data outside the API
+
+Usage:
+    python build_posting_index.py
+"""
+import sys
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.posting import TastePosting
+from app.services.posting_index import rebuild_posting_index
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Building taste posting index...")
+        indexed = rebuild_posting_index(db)
+        print(f"✅ Indexed {indexed} users")
+        return True
+    except Exception as e:
+        print(f"❌ Error building taste posting index: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
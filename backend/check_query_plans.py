@@ -0,0 +1,221 @@
+"""
+Query-plan regression check for the hot song and connection queries
+
+Builds a fresh schema (create_all + migrations), seeds it, runs the hot
+queries (mostly through the route and service functions themselves),
+EXPLAINs every statement they issue and fails if any of them reads
+songs or connections with a full table scan. On PostgreSQL sequential
+scans are disabled first, so a Seq Scan in the plan means no usable
+index exists rather than that the planner preferred one for a small table.
+
+Run it against a throwaway database: it refuses to seed one that already
+has users. Without --database-url a temporary SQLite file is used.
+
+Usage:
+    python check_query_plans.py [--database-url postgresql://.../plan_check]
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.migrations import run_migrations
+from app.models import user, song, connection, taste_profile, minhash, user_similarity, posting, cooccurrence, genre_popularity, data_version, recommendation_snapshot, embedding, pair_overlap, song_metadata, musicbrainz_mirror  # Import models to register them
+from app.models.connection import Connection, ConnectionStatus
+from app.models.song import Song, Artist, CatalogSong
+from app.models.user import User
+from app.api.routes import songs as song_routes
+from app.api.routes import connections as connection_routes
+from app.services.bulk_loading import load_top_songs_by_user, load_common_songs
+
+HOT_TABLES = ("songs", "connections")
+
+# SQLite: "SCAN songs" / "SCAN TABLE songs" (older versions), with or without an index
+_SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(%s)\b" % "|".join(HOT_TABLES))
+_POSTGRES_SCAN = re.compile(r"\bSeq Scan on (%s)\b" % "|".join(HOT_TABLES))
+
+
+def seed(engine: Engine, users: int, songs_per_user: int, connections_per_user: int):
+    rng = random.Random(20240601)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"plan_user_{user_id}", "email": f"plan_user_{user_id}@example.com",
+             "hashed_password": "x", "top_genres": [], "favorite_artists": []}
+            for user_id in range(1, users + 1)
+        ])
+        conn.execute(insert(Artist), [
+            {"id": artist_id, "name": f"Artist {artist_id}", "normalized_name": f"artist {artist_id}"}
+            for artist_id in range(1, 101)
+        ])
+        conn.execute(insert(CatalogSong), [
+            {"id": song_id, "title": f"Song {song_id}", "normalized_title": f"song {song_id}",
+             "artist_id": song_id % 100 + 1}
+            for song_id in range(1, 2001)
+        ])
+        rows = []
+        for user_id in range(1, users + 1):
+            for catalog_id in rng.sample(range(1, 2001), songs_per_user):
+                rows.append({
+                    "user_id": user_id,
+                    "title": f"Song {catalog_id}",
+                    "artist": f"Artist {catalog_id % 100 + 1}",
+                    "catalog_song_id": catalog_id,
+                    "is_favorite": rng.random() < 0.2,
+                    "user_rating": rng.choice([None, 1.0, 2.0, 3.0, 4.0, 5.0]),
+                })
+        conn.execute(insert(Song), rows)
+        statuses = list(ConnectionStatus)
+        rows = []
+        for user_id in range(1, users + 1):
+            for other_id in rng.sample([i for i in range(1, users + 1) if i != user_id], connections_per_user):
+                rows.append({"user_id": user_id, "connected_user_id": other_id, "status": rng.choice(statuses)})
+        conn.execute(insert(Connection), rows)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def hot_queries(db: Session, current: User) -> List[Tuple[str, Callable[[], object]]]:
+    """(name, callable) pairs; each callable issues the queries of one hot path"""
+    others = [current.id + offset for offset in range(1, 21)]
+
+    def run(coroutine):
+        return lambda: asyncio.run(coroutine())
+
+    return [
+        ("songs /me", run(lambda: song_routes.get_my_songs(limit=50, favorite_only=False, db=db, current_user=current))),
+        ("songs /me favorites", run(lambda: song_routes.get_my_songs(limit=50, favorite_only=True, db=db, current_user=current))),
+        ("songs /user/{id}", run(lambda: song_routes.get_user_songs(user_id=others[0], limit=20, db=db, current_user=current))),
+        ("songs /top", run(lambda: song_routes.get_top_songs(user_id=None, limit=10, db=db, current_user=current))),
+        ("connections /me", run(lambda: connection_routes.get_my_connections(status_filter=None, db=db, current_user=current))),
+        ("connections /me?status", run(lambda: connection_routes.get_my_connections(
+            status_filter=ConnectionStatus.ACCEPTED, db=db, current_user=current))),
+        ("connections /received", run(lambda: connection_routes.get_received_connections(
+            status_filter=None, db=db, current_user=current))),
+        ("connections /received?status", run(lambda: connection_routes.get_received_connections(
+            status_filter=ConnectionStatus.PENDING, db=db, current_user=current))),
+        ("connections /stats", run(lambda: connection_routes.get_connection_stats(current_user=current, db=db))),
+        # Same queries as create_connection() and the recommendation services
+        ("existing connection check", lambda: db.query(Connection).filter(
+            Connection.user_id == current.id,
+            Connection.connected_user_id == others[0]
+        ).first()),
+        ("connected user ids", lambda: db.query(Connection.connected_user_id).filter(
+            Connection.user_id == current.id
+        ).union(
+            db.query(Connection.user_id).filter(Connection.connected_user_id == current.id)
+        ).all()),
+        ("accepted connections", lambda: db.query(Connection).filter(
+            ((Connection.user_id == current.id) | (Connection.connected_user_id == current.id)),
+            Connection.status == ConnectionStatus.ACCEPTED
+        ).all()),
+        ("load_top_songs_by_user", lambda: load_top_songs_by_user(others, db)),
+        ("load_common_songs", lambda: load_common_songs(current.id, others, db)),
+    ]
+
+
+def capture_statements(engine: Engine, action: Callable[[], object]) -> List[Tuple[str, object]]:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        action()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(engine: Engine, statement: str, parameters) -> Tuple[List[str], List[str]]:
+    """Plan lines of one statement and the hot tables it fully scans"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+            lines = [row[-1] for row in rows]
+            pattern = _SQLITE_SCAN
+        else:
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).all()
+            lines = [row[0] for row in rows]
+            pattern = _POSTGRES_SCAN
+    scans = sorted({match.group(1) for line in lines for match in [pattern.search(line)] if match})
+    return lines, scans
+
+
+def check(engine: Engine, verbose: bool) -> Dict[str, List[str]]:
+    """Hot query name -> fully scanned tables, for the queries that scan"""
+    failures = {}
+    db = Session(bind=engine)
+    try:
+        current = db.get(User, 1)
+        for name, action in hot_queries(db, current):
+            statements = capture_statements(engine, action)
+            scanned = set()
+            for statement, parameters in statements:
+                lines, scans = explain(engine, statement, parameters)
+                scanned.update(scans)
+                if verbose or scans:
+                    print(f"\n  {name}:")
+                    for line in lines:
+                        print(f"    {line}")
+            mark = "❌" if scanned else "✅"
+            print(f"{mark} {name} ({len(statements)} statements)")
+            if scanned:
+                failures[name] = sorted(scanned)
+    finally:
+        db.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if a hot query falls back to a full table scan")
+    parser.add_argument("--database-url", default=None, help="Empty database to seed (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=200, help="Users to seed")
+    parser.add_argument("--songs-per-user", type=int, default=30, help="Songs seeded per user")
+    parser.add_argument("--connections-per-user", type=int, default=10, help="Connections seeded per user")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    temp_dir = None
+    database_url = args.database_url
+    if database_url is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(temp_dir.name, 'plan_check.db')}"
+    engine = create_engine(database_url)
+    try:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        with engine.connect() as conn:
+            if conn.execute(text("SELECT COUNT(*) FROM users")).scalar():
+                print("❌ The database already has users; point --database-url at an empty one")
+                return False
+
+        print(f"🔄 Seeding {engine.dialect.name} database...")
+        seed(engine, args.users, args.songs_per_user, args.connections_per_user)
+        failures = check(engine, args.verbose)
+        if failures:
+            for name, tables in failures.items():
+                print(f"❌ {name}: full scan of {', '.join(tables)}")
+            return False
+        print("✅ No hot query falls back to a full scan")
+        return True
+    except Exception as e:
+        print(f"❌ Error checking query plans: {e}")
+        return False
+    finally:
+        engine.dispose()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,53 @@
+"""
+Offline job: compute similarity scores for all user pairs and store the
+top-N neighbours of every user in the user_similarity table
+
+Recommendations requested with source=precomputed are served from it.
+The per-pair overlap counters that keep the table current between runs
+are recounted first. Run periodically (e.g. nightly cron).
+
+Usage:
+    python compute_similarities.py [--top-n 50] [--block-size 256]
+"""
+import argparse
+import sys
+import time
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.user_similarity import UserSimilarity
+from app.models.posting import TastePosting
+from app.models.pair_overlap import UserPairOverlap
+from app.services.pair_overlap import rebuild_pair_overlaps
+from app.services.similarity_job import compute_user_similarities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the user_similarity table")
+    parser.add_argument("--top-n", type=int, default=None, help="Neighbours kept per user")
+    parser.add_argument("--block-size", type=int, default=None, help="Users scored per block")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Counting pair overlaps...")
+        rows = rebuild_pair_overlaps(db)
+        print(f"✅ Stored {rows} pair overlap rows")
+        print("🔄 Computing user similarities...")
+        started = time.time()
+        written = compute_user_similarities(db, top_n=args.top_n, block_size=args.block_size)
+        print(f"✅ Stored {written} neighbour scores in {time.time() - started:.1f}s")
+        return True
+    except Exception as e:
+        print(f"❌ Error computing similarities: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,90 @@
+"""
+Enrich the song catalog with MusicBrainz metadata (MBID, length, tags)
+
+Resolves each distinct (title, artist) once, through the MusicBrainz
+response cache and the shared rate limiter (background lane, so the API's
+interactive lookups go first). Progress is checkpointed per chunk: if the
+run is interrupted or MusicBrainz fails, run it again to resume.
+
+Point it at a local MusicBrainz stand-in or mirror with --api-url (or the
+MUSICBRAINZ_API_URL setting) to test without hitting musicbrainz.org.
+
+Usage:
+    python enrich_songs.py [--chunk-size 50] [--limit N] [--restart] [--api-url URL]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song, Artist, CatalogSong
+from app.models.connection import Connection
+from app.models.song_metadata import CatalogSongMetadata, EnrichmentCheckpoint
+from app.migrations import run_migrations
+from app.services.catalog import backfill_catalog
+from app.services.enrichment import enrich_catalog
+from app.services.musicbrainz import MusicBrainzClient, get_musicbrainz_client
+from app.services.musicbrainz_cache import create_musicbrainz_cache
+from app.services.musicbrainz_rate_limit import create_musicbrainz_rate_limiter
+
+
+async def _run(args):
+    if args.api_url:
+        client = MusicBrainzClient(
+            base_url=args.api_url,
+            cache=create_musicbrainz_cache(),
+            rate_limiter=create_musicbrainz_rate_limiter()
+        )
+    else:
+        client = get_musicbrainz_client()
+    db = SessionLocal()
+    try:
+        return await enrich_catalog(
+            db,
+            client=client,
+            chunk_size=args.chunk_size,
+            max_songs=args.limit,
+            restart=args.restart
+        )
+    finally:
+        db.close()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrich catalog songs from MusicBrainz")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Catalog songs per checkpoint")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many songs")
+    parser.add_argument("--restart", action="store_true", help="Rescan from the first catalog song")
+    parser.add_argument("--api-url", default=None, help="MusicBrainz API base URL (e.g. a local stub)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        backfill_catalog(db)
+    finally:
+        db.close()
+
+    try:
+        print("🔄 Enriching catalog songs from MusicBrainz...")
+        started = time.time()
+        stats = asyncio.run(_run(args))
+        print(
+            f"✅ Enriched {stats['processed']} songs in {time.time() - started:.1f}s: "
+            f"{stats['matched']} matched, {stats['not_found']} not found, {stats['rejected']} rejected"
+        )
+        if stats["failed"]:
+            print(f"⚠ {stats['failed']} lookups failed; run again to resume")
+            return False
+        return True
+    except Exception as e:
+        print(f"❌ Error enriching songs: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
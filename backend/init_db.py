@@ -9,8 +9,21 @@ import sys
 from app.core.database import engine, Base
 from app.core.config import settings
 from app.models.user import User
-from app.models.song import Song
+from app.models.song import Song, Artist, CatalogSong
 from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.minhash import UserMinHash, LshBucket
+from app.models.user_similarity import UserSimilarity
+from app.models.posting import TastePosting
+from app.models.cooccurrence import SongCooccurrence, UserItemWeights
+from app.models.genre_popularity import GenreSongStats
+from app.models.data_version import UserDataVersion
+from app.models.recommendation_snapshot import RecommendationSnapshot
+from app.models.embedding import UserEmbedding
+from app.models.pair_overlap import UserPairOverlap
+from app.models.song_metadata import CatalogSongMetadata, EnrichmentCheckpoint
+from app.models.musicbrainz_mirror import MirrorArtist, MirrorRecording, MirrorTrigram, MirrorTrigramCount
+from app.migrations import run_migrations
 
 def detect_database_backend(database_url: str) -> str:
     """Return normalized backend name from SQLAlchemy DATABASE_URL."""
@@ -25,11 +38,33 @@ def init_database():
     try:
         print("🔄 Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         print("✅ Database tables created successfully!")
         print("\nTables created:")
         print("  - users")
         print("  - songs")
+        print("  - artists")
+        print("  - catalog_songs")
         print("  - connections")
+        print("  - user_taste_profiles")
+        print("  - user_minhashes")
+        print("  - lsh_buckets")
+        print("  - user_similarity")
+        print("  - taste_postings")
+        print("  - song_cooccurrences")
+        print("  - user_item_weights")
+        print("  - genre_song_stats")
+        print("  - user_data_versions")
+        print("  - recommendation_snapshots")
+        print("  - user_embeddings")
+        print("  - user_pair_overlaps")
+        print("  - catalog_song_metadata")
+        print("  - enrichment_checkpoints")
+        print("  - mb_artists")
+        print("  - mb_recordings")
+        print("  - mb_trigrams")
+        print("  - mb_trigram_counts")
+        print("  - schema_migrations")
         return True
     except Exception as e:
         database_url = settings.DATABASE_URL
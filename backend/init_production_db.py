@@ -10,14 +10,28 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from app.core.database import engine, Base
 from app.models.user import User
-from app.models.song import Song
+from app.models.song import Song, Artist, CatalogSong
 from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.minhash import UserMinHash, LshBucket
+from app.models.user_similarity import UserSimilarity
+from app.models.posting import TastePosting
+from app.models.cooccurrence import SongCooccurrence, UserItemWeights
+from app.models.genre_popularity import GenreSongStats
+from app.models.data_version import UserDataVersion
+from app.models.recommendation_snapshot import RecommendationSnapshot
+from app.models.embedding import UserEmbedding
+from app.models.pair_overlap import UserPairOverlap
+from app.models.song_metadata import CatalogSongMetadata, EnrichmentCheckpoint
+from app.models.musicbrainz_mirror import MirrorArtist, MirrorRecording, MirrorTrigram, MirrorTrigramCount
+from app.migrations import run_migrations
 
 def init_database():
     """Create all database tables"""
     try:
         print("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
         print("✓ Database tables created successfully!")
         return True
     except Exception as e:
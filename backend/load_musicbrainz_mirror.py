@@ -0,0 +1,76 @@
+"""
+Load a MusicBrainz JSON data dump (or a subset) into the local mirror
+
+Takes the artist and/or recording dumps from
+https://data.metabrainz.org/pub/musicbrainz/data/json-dumps/ as downloaded
+(artist.tar.xz, recording.tar.xz) or as extracted line files, optionally
+compressed (.gz/.xz/.bz2) - e.g. a subset made with `head -n 100000`.
+Commits per batch; re-running skips entities already loaded.
+
+Set MUSICBRAINZ_MODE=local (or local_first) to answer lookups from it.
+
+Usage:
+    python load_musicbrainz_mirror.py [--artists PATH] [--recordings PATH]
+                                      [--limit N] [--replace] [--batch-size 1000]
+"""
+import argparse
+import sys
+import time
+from itertools import islice
+from app.core.database import SessionLocal, engine, Base
+from app.models.musicbrainz_mirror import MirrorArtist, MirrorRecording, MirrorTrigram, MirrorTrigramCount
+from app.services.musicbrainz import parse_artist, parse_recording_details
+from app.services.musicbrainz_mirror import (
+    clear_mirror,
+    load_artists,
+    load_recordings,
+    mirror_counts,
+    read_dump
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a MusicBrainz JSON dump into the local mirror")
+    parser.add_argument("--artists", default=None, help="Artist dump (artist.tar.xz or JSON lines)")
+    parser.add_argument("--recordings", default=None, help="Recording dump (recording.tar.xz or JSON lines)")
+    parser.add_argument("--limit", type=int, default=None, help="Load at most this many entities per dump")
+    parser.add_argument("--replace", action="store_true", help="Empty the mirror first")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Entities per transaction")
+    args = parser.parse_args()
+    if not args.artists and not args.recordings:
+        parser.error("pass --artists and/or --recordings")
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.replace:
+            print("🔄 Emptying the mirror...")
+            clear_mirror(db)
+            db.commit()
+        started = time.time()
+        if args.artists:
+            print(f"🔄 Loading artists from {args.artists}...")
+            artists = (parse_artist(entity) for entity in islice(read_dump(args.artists), args.limit))
+            print(f"✅ Added {load_artists(artists, db, args.batch_size)} artists")
+        if args.recordings:
+            print(f"🔄 Loading recordings from {args.recordings}...")
+            recordings = (
+                parse_recording_details(entity) for entity in islice(read_dump(args.recordings), args.limit)
+            )
+            print(f"✅ Added {load_recordings(recordings, db, args.batch_size)} recordings")
+        counts = mirror_counts(db)
+        print(
+            f"✅ Mirror has {counts['artists']} artists and {counts['recordings']} recordings "
+            f"({time.time() - started:.1f}s)"
+        )
+        return True
+    except Exception as e:
+        print(f"❌ Error loading the MusicBrainz mirror: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
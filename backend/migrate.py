@@ -0,0 +1,44 @@
+"""
+Apply pending schema migrations (app/migrations/versions)
+
+The server applies them on startup too; run this to migrate ahead of a
+deploy, or with --status to list which versions this database has.
+
+Usage:
+    python migrate.py [--status]
+"""
+import argparse
+import sys
+from app.core.database import engine, Base
+from app.migrations import applied_versions, load_migrations, run_migrations
+from app.models import user, song, connection, taste_profile, minhash, user_similarity, posting, cooccurrence, genre_popularity, data_version, recommendation_snapshot, embedding, pair_overlap, song_metadata, musicbrainz_mirror  # Import models to register them
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            done = applied_versions(engine)
+            for migration in load_migrations():
+                mark = "✅" if migration.version in done else "⏳"
+                print(f"{mark} {migration.version:04d} {migration.description}")
+            return True
+
+        Base.metadata.create_all(bind=engine)
+        print("🔄 Applying schema migrations...")
+        applied = run_migrations(engine)
+        for migration in applied:
+            print(f"  - {migration.version:04d} {migration.description}")
+        print(f"✅ Applied {len(applied)} migrations")
+        return True
+    except Exception as e:
+        print(f"❌ Error applying migrations: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,46 @@
+"""
+Migration: link existing songs to the canonical song catalog
+
+Applies pending schema migrations (which add songs.catalog_song_id), then
+fills in artists, catalog_songs and every song's catalog_song_id in
+batches, committing after each batch. Safe to interrupt and re-run. The server
+also runs it on startup, so this is mainly for large databases.
+
+Usage:
+    python migrate_catalog.py [--batch-size 1000]
+"""
+import argparse
+import sys
+import time
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song, Artist, CatalogSong
+from app.models.connection import Connection
+from app.migrations import run_migrations
+from app.services.catalog import backfill_catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the song catalog")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Songs linked per transaction")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Linking songs to the catalog...")
+        started = time.time()
+        linked = backfill_catalog(db, batch_size=args.batch_size)
+        print(f"✅ Linked {linked} songs in {time.time() - started:.1f}s")
+        return True
+    except Exception as e:
+        print(f"❌ Error migrating songs to the catalog: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
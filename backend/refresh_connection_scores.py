@@ -0,0 +1,53 @@
+"""
+Rescore connections whose users' libraries changed since their similarity
+score was computed
+
+The server also does this in the background every
+CONNECTION_SCORE_REFRESH_SECONDS; run this to do it now (e.g. from cron
+with the background refresh disabled), or with --all after changing the
+scoring formula.
+
+Usage:
+    python refresh_connection_scores.py [--batch-size 500] [--all]
+"""
+import argparse
+import sys
+import time
+from app.core.database import SessionLocal, engine, Base
+from app.models.user import User
+from app.models.song import Song
+from app.models.connection import Connection
+from app.models.taste_profile import UserTasteProfile
+from app.models.data_version import UserDataVersion
+from app.migrations import run_migrations
+from app.services.connection_scores import refresh_connection_scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh stale connection similarity scores")
+    parser.add_argument("--batch-size", type=int, default=None, help="Connections rescored per batch")
+    parser.add_argument("--all", action="store_true", help="Rescore every connection, stale or not")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        print("🔄 Refreshing connection scores...")
+        started = time.time()
+        stats = refresh_connection_scores(db, batch_size=args.batch_size, force=args.all)
+        print(
+            f"✅ Rescored {stats['rescored']} connections "
+            f"({stats['changed']} changed) in {time.time() - started:.1f}s"
+        )
+        return True
+    except Exception as e:
+        print(f"❌ Error refreshing connection scores: {e}")
+        return False
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
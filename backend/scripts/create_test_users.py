@@ -14,6 +14,7 @@ from app.models.user import User
 from app.models.song import Song
 from app.models.connection import Connection, ConnectionStatus
 from app.core.security import get_password_hash
+from app.services.taste_events import taste_changed
 import random
 
 # Test user data with varied music preferences
@@ -159,6 +160,7 @@ CONNECTIONS = [
 def create_test_users(db: Session):
     """Create test users with their songs"""
     created_users = {}
+    new_users = []
     
     print("Creating test users...")
     for user_data in TEST_USERS:
@@ -194,9 +196,14 @@ def create_test_users(db: Session):
             db.add(song)
         
         created_users[user_data["username"]] = user
+        new_users.append(user)
         print(f"  ✓ Created user '{user_data['username']}' with {len(user_data.get('songs', []))} songs")
     
     db.commit()
+    
+    # Index the new users for recommendations
+    for user in new_users:
+        taste_changed(user, db)
     return created_users
 
 
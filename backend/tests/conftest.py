@@ -0,0 +1,58 @@
+"""
+Shared fixtures: a fresh in-memory SQLite schema per test
+
+Settings are pointed at a temporary directory before the app is imported,
+so nothing the services create on import or first use lands in the repo.
+"""
+import os
+import tempfile
+
+_TEMP_DIR = tempfile.mkdtemp(prefix="intune-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEMP_DIR, 'intune.db')}")
+os.environ.setdefault("MUSICBRAINZ_CACHE_PATH", os.path.join(_TEMP_DIR, "musicbrainz_cache.db"))
+os.environ.setdefault("MUSICBRAINZ_RATE_LIMIT_PATH", os.path.join(_TEMP_DIR, "musicbrainz_ratelimit.db"))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from app.core.database import Base
+from app.migrations import run_migrations
+from app.models import user, song, connection, taste_profile, minhash, user_similarity, posting, cooccurrence, genre_popularity, data_version, recommendation_snapshot, embedding, pair_overlap, song_metadata, musicbrainz_mirror  # Import models to register them
+from app.models.user import User
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = Session(bind=engine, autoflush=False)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    def make(username: str) -> User:
+        user = User(
+            username=username,
+            email=f"{username}@example.com",
+            hashed_password="x",
+            top_genres=[],
+            favorite_artists=[]
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
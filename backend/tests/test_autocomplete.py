@@ -0,0 +1,54 @@
+import asyncio
+import threading
+from app.services import autocomplete
+from app.services.autocomplete import AutocompleteIndex
+
+
+class _Session:
+    def close(self):
+        pass
+
+
+def _song(title):
+    suggestion = {"type": "song", "title": title, "artist": "X", "mbid": None, "popularity": 1, "source": "library"}
+    return autocomplete._entry(suggestion, title)
+
+
+def _titles(suggestions):
+    return [suggestion["title"] for suggestion in suggestions]
+
+
+def test_rebuilds_in_background_while_serving_old_index(monkeypatch):
+    builds = []
+    rebuild_started, release = threading.Event(), threading.Event()
+
+    def load_entries(db):
+        builds.append(threading.current_thread().name)
+        if len(builds) == 1:
+            return [_song("Yesterday")], []
+        rebuild_started.set()
+        release.wait(5)
+        return [_song("Yellow Submarine")], []
+
+    monkeypatch.setattr(autocomplete, "_load_entries", load_entries)
+    monkeypatch.setattr(autocomplete, "SessionLocal", _Session)
+    index = AutocompleteIndex(reload_seconds=3600)
+
+    async def scenario():
+        # The first search waits for the initial build
+        assert _titles(await index.suggest("ye")) == ["Yesterday"]
+
+        # Once stale, searches keep using the old index while a single rebuild runs
+        index._loaded_at = 0.0
+        results = await asyncio.gather(*(index.suggest("ye") for _ in range(10)))
+        assert all(_titles(result) == ["Yesterday"] for result in results)
+        assert rebuild_started.wait(5)
+        assert _titles(await index.suggest("ye")) == ["Yesterday"]
+
+        release.set()
+        await asyncio.to_thread(index._executor.submit(lambda: None).result)
+        assert _titles(await index.suggest("ye")) == ["Yellow Submarine"]
+
+    asyncio.run(scenario())
+    assert len(builds) == 2
+    assert all(name.startswith("autocomplete") for name in builds)
@@ -0,0 +1,50 @@
+import asyncio
+from app.api.routes import connections as connection_routes
+from app.api.routes import songs as song_routes
+from app.models.connection import ConnectionStatus
+from app.schemas.connection import ConnectionCreate, ConnectionUpdate
+from app.schemas.song import SongCreate
+from app.services.connection_scores import _stale_connections, refresh_connection_scores
+
+
+def _stale_ids(db):
+    db.expire_all()
+    return [row.id for row in _stale_connections(db, 0, 100, force=False)]
+
+
+def _add_song(db, user, title):
+    asyncio.run(song_routes.add_song(SongCreate(title=title, artist="X", genre="Pop"), db=db, current_user=user))
+
+
+def test_connection_changes_do_not_mark_scores_stale(db, make_user):
+    alice, bob, carol = make_user("alice"), make_user("bob"), make_user("carol")
+    for user in (alice, bob, carol):
+        _add_song(db, user, "Shared")
+
+    first = asyncio.run(connection_routes.create_connection(
+        ConnectionCreate(connected_user_id=bob.id), db=db, current_user=alice
+    ))
+    assert _stale_ids(db) == []
+
+    # Alice's next connection and Bob accepting leave the first one current
+    asyncio.run(connection_routes.create_connection(
+        ConnectionCreate(connected_user_id=carol.id), db=db, current_user=alice
+    ))
+    asyncio.run(connection_routes.update_connection(
+        first.id, ConnectionUpdate(status=ConnectionStatus.ACCEPTED), db=db, current_user=bob
+    ))
+    assert _stale_ids(db) == []
+
+
+def test_taste_change_marks_scores_stale(db, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    _add_song(db, alice, "Shared")
+    _add_song(db, bob, "Shared")
+    connection = asyncio.run(connection_routes.create_connection(
+        ConnectionCreate(connected_user_id=bob.id), db=db, current_user=alice
+    ))
+
+    _add_song(db, bob, "Other")
+    assert _stale_ids(db) == [connection.id]
+    assert refresh_connection_scores(db)["rescored"] == 1
+    assert _stale_ids(db) == []
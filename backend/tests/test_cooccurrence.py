@@ -0,0 +1,33 @@
+import asyncio
+import random
+from app.api.routes import songs as song_routes
+from app.models.cooccurrence import SongCooccurrence
+from app.schemas.song import SongCreate, SongUpdate
+from app.services.cooccurrence import rebuild_cooccurrence_model
+
+
+def _weights(db):
+    db.expire_all()
+    return {(row.song_key, row.other_key): round(row.weight, 6) for row in db.query(SongCooccurrence).all()}
+
+
+def test_incremental_model_matches_rebuild(db, make_user):
+    rng = random.Random(11)
+    users = [make_user(f"user{i}") for i in range(4)]
+    songs = []
+    for _ in range(30):
+        user = rng.choice(users)
+        song = asyncio.run(song_routes.add_song(SongCreate(
+            title=f"Song {rng.randint(1, 10)}", artist="X", genre="Pop",
+            is_favorite=rng.random() < 0.3, user_rating=rng.choice([None, 2.0, 5.0])
+        ), db=db, current_user=user))
+        songs.append((user, song.id))
+    for user, song_id in rng.sample(songs, 8):
+        asyncio.run(song_routes.update_song(song_id, SongUpdate(user_rating=4.0), db=db, current_user=user))
+    for user, song_id in rng.sample(songs, 12):
+        asyncio.run(song_routes.delete_song(song_id, db=db, current_user=user))
+
+    incremental = _weights(db)
+    assert incremental
+    rebuild_cooccurrence_model(db)
+    assert incremental == _weights(db)
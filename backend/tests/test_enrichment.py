@@ -0,0 +1,76 @@
+import asyncio
+import re
+import httpx
+from app.models.song import Artist, CatalogSong
+from app.models.song_metadata import CatalogSongMetadata, EnrichmentCheckpoint
+from app.services.enrichment import CHECKPOINT_NAME, enrich_catalog
+from app.services.musicbrainz import MusicBrainzClient
+from app.services.musicbrainz_rate_limit import AsyncRateLimiter
+
+TITLES = ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+
+
+def _catalog(db):
+    artist = Artist(name="Band", normalized_name="band")
+    db.add(artist)
+    db.flush()
+    songs = [CatalogSong(title=title, normalized_title=title.lower(), artist_id=artist.id) for title in TITLES]
+    db.add_all(songs)
+    db.commit()
+    return {song.title: song.id for song in songs}
+
+
+def _handler(statuses):
+    """MusicBrainz stand-in: `statuses` maps a title to the HTTP status of its search"""
+    def handle(request):
+        if request.url.path.endswith("/recording"):
+            title = re.search(r'recording:"([^"]+)"', request.url.params["query"]).group(1)
+            status = statuses.get(title, 200)
+            if status != 200:
+                return httpx.Response(status, json={"error": "refused"})
+            return httpx.Response(200, json={"recordings": [
+                {"id": f"mbid-{title}", "title": title, "length": 1000, "artist-credit": [{"name": "Band"}]}
+            ]})
+        mbid = request.url.path.rsplit("/", 1)[1]
+        return httpx.Response(200, json={"id": mbid, "title": mbid[5:], "tags": [{"name": "rock"}]})
+    return handle
+
+
+def _enrich(db, statuses):
+    async def run():
+        client = MusicBrainzClient(
+            base_url="https://musicbrainz.test/ws/2",
+            rate_limiter=AsyncRateLimiter(0),
+            mode="remote",
+            transport=httpx.MockTransport(_handler(statuses))
+        )
+        try:
+            return await enrich_catalog(db, client, chunk_size=10, concurrency=5)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def _statuses(db):
+    db.expire_all()
+    return {row.catalog_song_id: row.status for row in db.query(CatalogSongMetadata).all()}
+
+
+def test_transient_failure_rewinds_the_checkpoint(db):
+    ids = _catalog(db)
+    stats = _enrich(db, {"Bravo": 400, "Charlie": 503})
+
+    assert stats == {"processed": 4, "matched": 3, "not_found": 0, "rejected": 1, "failed": 1}
+    assert _statuses(db) == {
+        ids["Alpha"]: "matched",
+        ids["Bravo"]: "rejected",
+        ids["Delta"]: "matched",
+        ids["Echo"]: "matched",
+    }
+    # Resumes at the first failure; the later successes are kept, not redone
+    assert db.get(EnrichmentCheckpoint, CHECKPOINT_NAME).last_catalog_song_id == ids["Charlie"] - 1
+
+    stats = _enrich(db, {})
+    assert stats["processed"] == 1 and stats["matched"] == 1
+    assert _statuses(db)[ids["Charlie"]] == "matched"
+    assert db.get(EnrichmentCheckpoint, CHECKPOINT_NAME).last_catalog_song_id == ids["Charlie"]
@@ -0,0 +1,41 @@
+import asyncio
+from app.api.routes import songs as song_routes
+from app.models.genre_popularity import GenreSongStats
+from app.schemas.song import SongCreate, SongUpdate
+from app.services.taste_profile import song_key
+
+
+def _rollup(db, genre, title, artist):
+    db.expire_all()
+    return db.get(GenreSongStats, (genre, song_key(title, artist)))
+
+
+def test_updating_only_copy_keeps_rollup(db, make_user):
+    user = make_user("alice")
+    song = asyncio.run(song_routes.add_song(
+        SongCreate(title="Solo", artist="X", genre="Zydeco", user_rating=3.0), db=db, current_user=user
+    ))
+    stats = _rollup(db, "zydeco", "Solo", "X")
+    assert (stats.song_count, stats.rating_sum, stats.rating_count) == (1, 3.0, 1)
+
+    asyncio.run(song_routes.update_song(song.id, SongUpdate(user_rating=5.0), db=db, current_user=user))
+    stats = _rollup(db, "zydeco", "Solo", "X")
+    assert stats is not None
+    assert (stats.song_count, stats.rating_sum, stats.rating_count) == (1, 5.0, 1)
+
+    asyncio.run(song_routes.update_song(song.id, SongUpdate(is_favorite=True), db=db, current_user=user))
+    stats = _rollup(db, "zydeco", "Solo", "X")
+    assert (stats.song_count, stats.favorite_count, stats.rating_sum, stats.popularity) == (1, 1, 5.0, 2)
+
+
+def test_moving_song_to_another_genre_moves_rollup(db, make_user):
+    user = make_user("bob")
+    song = asyncio.run(song_routes.add_song(
+        SongCreate(title="Solo", artist="X", genre="Zydeco"), db=db, current_user=user
+    ))
+    asyncio.run(song_routes.update_song(song.id, SongUpdate(genre="Cajun"), db=db, current_user=user))
+    assert _rollup(db, "zydeco", "Solo", "X") is None
+    assert _rollup(db, "cajun", "Solo", "X").song_count == 1
+
+    asyncio.run(song_routes.delete_song(song.id, db=db, current_user=user))
+    assert _rollup(db, "cajun", "Solo", "X") is None
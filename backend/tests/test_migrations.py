@@ -0,0 +1,67 @@
+import threading
+from sqlalchemy import create_engine, inspect, text
+from app.core.database import Base
+from app.migrations import applied_versions, load_migrations, run_migrations
+
+LEGACY_SONGS = (
+    "CREATE TABLE songs (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users(id), "
+    "title VARCHAR(200) NOT NULL, artist VARCHAR(200) NOT NULL, album VARCHAR(200), genre VARCHAR(100), "
+    "spotify_id VARCHAR(100), user_rating FLOAT, is_favorite BOOLEAN, created_at DATETIME)"
+)
+NEW_INDEXES = [
+    "ix_songs_user_favorite_rating", "ix_songs_user_created",
+    "ix_connections_user_status", "ix_connections_connected_status",
+]
+
+
+def _legacy_database(path):
+    """Current schema, with songs and the connection indexes as they were before migrations"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE songs"))
+        connection.execute(text(LEGACY_SONGS))
+        for name in NEW_INDEXES[2:]:
+            connection.execute(text(f"DROP INDEX {name}"))
+    return engine
+
+
+def test_upgrades_legacy_schema_once(tmp_path):
+    engine = _legacy_database(tmp_path / "legacy.db")
+    applied = run_migrations(engine)
+    assert [migration.version for migration in applied] == [m.version for m in load_migrations()]
+    assert run_migrations(engine) == []
+
+    schema = inspect(engine)
+    assert "catalog_song_id" in {column["name"] for column in schema.get_columns("songs")}
+    indexes = {index["name"] for table in ("songs", "connections") for index in schema.get_indexes(table)}
+    assert set(NEW_INDEXES) <= indexes
+    engine.dispose()
+
+
+def test_concurrent_migrators_apply_each_version_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    _legacy_database(path).dispose()
+    results, errors = [], []
+
+    def migrate():
+        engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+        try:
+            results.append([migration.version for migration in run_migrations(engine)])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            engine.dispose()
+
+    threads = [threading.Thread(target=migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    versions = sorted(version for applied in results for version in applied)
+    assert versions == [migration.version for migration in load_migrations()]
+    engine = create_engine(f"sqlite:///{path}")
+    assert applied_versions(engine) == set(versions)
+    engine.dispose()
@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+from app.services.musicbrainz import MusicBrainzClient
+from app.services.musicbrainz_cache import MusicBrainzCache
+from app.services.musicbrainz_rate_limit import AsyncRateLimiter
+
+
+def make_client(tmp_path, handler) -> MusicBrainzClient:
+    cache = MusicBrainzCache(
+        path=str(tmp_path / "musicbrainz_cache.db"),
+        max_entries=100,
+        ttls={"artist_search": 3600, "recording_search": 3600, "recording": 3600},
+        negative_ttl=60
+    )
+    return MusicBrainzClient(
+        base_url="https://musicbrainz.test/ws/2",
+        cache=cache,
+        rate_limiter=AsyncRateLimiter(0),
+        mode="remote",
+        transport=httpx.MockTransport(handler)
+    )
+
+
+def test_concurrent_identical_lookups_share_one_call(tmp_path):
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.05)  # Keep the call in flight while the others arrive
+        return httpx.Response(200, json={"artists": [{"id": "mbid-1", "name": "Radiohead"}]})
+
+    async def run():
+        client = make_client(tmp_path, handler)
+        try:
+            results = await asyncio.gather(*(client.search_artist("Radiohead") for _ in range(20)))
+            return client, results
+        finally:
+            await client.aclose()
+
+    client, results = asyncio.run(run())
+    assert len(requests) == 1
+    assert client.stats["upstream_calls"] == 1
+    assert client.stats["coalesced"] == 19
+    assert all(result == [{
+        "name": "Radiohead", "mbid": "mbid-1", "type": None, "disambiguation": None, "country": None
+    }] for result in results)
+
+
+def test_unknown_recording_is_cached_as_a_miss(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(404, json={"error": "Not Found"})
+
+    async def run():
+        client = make_client(tmp_path, handler)
+        try:
+            first = await client.get_recording_details("missing-mbid")
+            second = await client.get_recording_details("missing-mbid")
+            return client, first, second
+        finally:
+            await client.aclose()
+
+    client, first, second = asyncio.run(run())
+    assert first is None and second is None
+    assert len(requests) == 1
+    assert client.cache.stats["negative_hits"] == 1
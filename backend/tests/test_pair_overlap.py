@@ -0,0 +1,61 @@
+import asyncio
+import random
+from app.api.routes import songs as song_routes
+from app.models.pair_overlap import UserPairOverlap
+from app.models.posting import TastePosting
+from app.schemas.song import SongCreate, SongUpdate
+from app.services.batch_similarity import COMPONENTS
+from app.services.pair_overlap import apply_overlap_deltas, rebuild_pair_overlaps
+
+
+def _counters(db):
+    db.expire_all()
+    return {
+        (row.user_id, row.other_id): tuple(getattr(row, name) for name in COMPONENTS)
+        for row in db.query(UserPairOverlap).all()
+    }
+
+
+def test_incremental_counters_match_rebuild(db, make_user):
+    rng = random.Random(7)
+    users = [make_user(f"user{i}") for i in range(5)]
+    songs = []
+    for _ in range(40):
+        user = rng.choice(users)
+        song = asyncio.run(song_routes.add_song(SongCreate(
+            title=f"Song {rng.randint(1, 8)}", artist="X", genre=rng.choice(["Pop", "Jazz", None]),
+            is_favorite=rng.random() < 0.3
+        ), db=db, current_user=user))
+        songs.append((user, song.id))
+    for user, song_id in rng.sample(songs, 10):
+        asyncio.run(song_routes.update_song(song_id, SongUpdate(genre="Folk"), db=db, current_user=user))
+    for user, song_id in rng.sample(songs, 15):
+        asyncio.run(song_routes.delete_song(song_id, db=db, current_user=user))
+
+    incremental = _counters(db)
+    assert incremental
+    rebuild_pair_overlaps(db)
+    assert incremental == _counters(db)
+
+
+def _add_posting(db, user_id, term):
+    apply_overlap_deltas(user_id, [("genre", term)], [], db)
+    db.add(TastePosting(kind="genre", term=term, user_id=user_id))
+    db.flush()
+
+
+def test_pairs_sharing_nothing_are_deleted(db, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    _add_posting(db, alice.id, "pop")
+    _add_posting(db, bob.id, "pop")
+    _add_posting(db, bob.id, "jazz")
+    db.commit()
+    genre = COMPONENTS.index("genre")
+    assert _counters(db)[(alice.id, bob.id)][genre] == 1
+    assert _counters(db)[(bob.id, bob.id)][genre] == 2
+
+    apply_overlap_deltas(bob.id, [], [("genre", "pop")], db)
+    db.commit()
+    counters = _counters(db)
+    assert (alice.id, bob.id) not in counters and (bob.id, alice.id) not in counters
+    assert counters[(bob.id, bob.id)][genre] == 1
@@ -0,0 +1,54 @@
+"""
+Runs check_query_plans.py on SQLite. The PostgreSQL path only runs when
+TEST_POSTGRES_URL points at an empty throwaway database and is otherwise untested.
+"""
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from app.core.database import Base
+from app.migrations import run_migrations
+from check_query_plans import check, seed
+
+COMPOSITE_INDEXES = [
+    "ix_songs_user_favorite_rating", "ix_songs_user_created",
+    "ix_connections_user_status", "ix_connections_connected_status",
+]
+
+
+def _seeded_engine(url):
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    seed(engine, users=40, songs_per_user=20, connections_per_user=5)
+    return engine
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    engine = _seeded_engine(f"sqlite:///{tmp_path / 'plan_check.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_indexes(sqlite_engine):
+    assert check(sqlite_engine, False) == {}
+
+
+def test_missing_indexes_are_reported(sqlite_engine):
+    with sqlite_engine.begin() as connection:
+        for name in COMPOSITE_INDEXES:
+            connection.execute(text(f"DROP INDEX {name}"))
+        connection.execute(text("ANALYZE"))
+
+    failures = check(sqlite_engine, False)
+    assert failures
+    assert {table for tables in failures.values() for table in tables} <= {"songs", "connections"}
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="TEST_POSTGRES_URL not set")
+def test_hot_queries_use_indexes_on_postgres():
+    engine = _seeded_engine(os.environ["TEST_POSTGRES_URL"])
+    try:
+        assert check(engine, False) == {}
+    finally:
+        engine.dispose()
@@ -0,0 +1,93 @@
+import threading
+from app.services.recommendation_cache import RecommendationCache
+
+
+def _stale_cache_with_blocked_refresh():
+    cache = RecommendationCache(max_size=10, ttl=0, max_stale=3600)
+    key = (1, 10)
+    cache.put(key, [{"user_id": 2}])
+    started, release = threading.Event(), threading.Event()
+
+    def refresh():
+        started.set()
+        release.wait(5)
+        return [{"user_id": 2}]  # Computed from data read before the change
+
+    # ttl=0: the entry is stale, so this serves it and refreshes in the background
+    assert cache.get(key, compute=lambda: [], refresh=refresh) == [{"user_id": 2}]
+    assert started.wait(5)
+    return cache, key, release
+
+
+def _finish(cache, release):
+    release.set()
+    cache._executor.shutdown(wait=True)
+
+
+def test_refresh_racing_drop_owner_is_discarded():
+    cache, key, release = _stale_cache_with_blocked_refresh()
+    cache.drop_owner(1)
+    _finish(cache, release)
+
+    assert cache.snapshot_stats()["discarded_refreshes"] == 1
+    assert cache.get(key, compute=lambda: [{"user_id": 3}], refresh=lambda: []) == [{"user_id": 3}]
+
+
+def test_refresh_racing_invalidation_keeps_entry_stale():
+    cache, key, release = _stale_cache_with_blocked_refresh()
+    cache.invalidate_user(2)
+    _finish(cache, release)
+
+    stats = cache.snapshot_stats()
+    assert stats["discarded_refreshes"] == 1
+    assert stats["size"] == 1
+    assert cache._entries[key].stale
+
+
+def _miss_racing(invalidate):
+    """Runs a miss whose compute blocks until `invalidate(cache)` has run"""
+    cache = RecommendationCache(max_size=10, ttl=3600, max_stale=3600)
+    key = (1, 10)
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return [{"user_id": 2}]  # Computed from data read before the change
+
+    results = []
+    lookup = threading.Thread(target=lambda: results.append(cache.get(key, compute=compute, refresh=lambda: [])))
+    lookup.start()
+    assert started.wait(5)
+    invalidate(cache)
+    release.set()
+    lookup.join(5)
+    assert results == [[{"user_id": 2}]]
+    return cache, key
+
+
+def test_miss_racing_drop_owner_is_not_stored():
+    cache, key = _miss_racing(lambda cache: cache.drop_owner(1))
+    stats = cache.snapshot_stats()
+    assert stats["discarded_misses"] == 1 and stats["size"] == 0
+    assert cache.get(key, compute=lambda: [{"user_id": 3}], refresh=lambda: []) == [{"user_id": 3}]
+
+
+def test_miss_racing_invalidation_of_listed_user_is_not_stored():
+    cache, _ = _miss_racing(lambda cache: cache.invalidate_user(2))
+    assert cache.snapshot_stats()["size"] == 0
+
+
+def test_miss_racing_unrelated_invalidation_is_stored():
+    cache, _ = _miss_racing(lambda cache: cache.invalidate_user(5))
+    assert cache.snapshot_stats()["size"] == 1
+
+
+def test_clear_discards_running_refresh():
+    cache, key, release = _stale_cache_with_blocked_refresh()
+    cache.clear()
+    assert not cache._refreshing
+    _finish(cache, release)
+
+    stats = cache.snapshot_stats()
+    assert stats["discarded_refreshes"] == 1 and stats["size"] == 0
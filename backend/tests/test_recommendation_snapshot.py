@@ -0,0 +1,85 @@
+import asyncio
+import warnings
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import SAWarning
+from app.api.routes import feed as feed_routes
+from app.api.routes import songs as song_routes
+from app.models.recommendation_snapshot import RecommendationSnapshot
+from app.schemas.song import SongCreate
+from app.services.recommendation_snapshot import get_recommendation_page
+
+PARAMS = {"min_similarity": 0.0, "exclude_connected": True, "diversity_factor": 0.2, "source": "live"}
+
+
+def _add_song(db, user, title):
+    asyncio.run(song_routes.add_song(SongCreate(title=title, artist="X", genre="Pop"), db=db, current_user=user))
+
+
+def _snapshot_ids(db):
+    return [row[0] for row in db.query(RecommendationSnapshot.id).all()]
+
+
+def _candidate_versions(db):
+    return [row[0] for row in db.query(RecommendationSnapshot.candidate_version).all()]
+
+
+def _setup(db, make_user):
+    owner = make_user("owner")
+    candidates = [make_user(f"candidate{i}") for i in range(3)]
+    for user in [owner] + candidates:
+        _add_song(db, user, "Shared")
+    return owner, candidates
+
+
+def test_first_page_reuses_current_snapshot(db, make_user):
+    owner, _ = _setup(db, make_user)
+    first = get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    assert first["total"] == 3 and first["next_cursor"]
+    ids = _snapshot_ids(db)
+
+    again = get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    assert _snapshot_ids(db) == ids
+    assert again["items"] == first["items"]
+    assert get_recommendation_page(owner, db, limit=1, cursor=first["next_cursor"]) is not None
+
+
+def test_candidate_taste_change_expires_snapshot(db, make_user):
+    owner, candidates = _setup(db, make_user)
+    first = get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    old_versions = _candidate_versions(db)
+
+    _add_song(db, candidates[1], "Something else")
+    assert get_recommendation_page(owner, db, limit=1, cursor=first["next_cursor"]) is None
+
+    # Replaced rather than added alongside
+    get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    new_versions = _candidate_versions(db)
+    assert len(new_versions) == 1 and new_versions != old_versions
+
+
+def test_other_params_get_their_own_snapshot(db, make_user):
+    owner, _ = _setup(db, make_user)
+    get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    get_recommendation_page(owner, db, limit=1, params={**PARAMS, "diversity_factor": 0.5})
+    get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    assert len(_snapshot_ids(db)) == 2
+
+
+def test_old_cursor_after_snapshot_replacement_is_gone(db, make_user):
+    owner, candidates = _setup(db, make_user)
+    first = get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    old_cursor = first["next_cursor"]
+
+    _add_song(db, candidates[1], "Something else")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SAWarning)
+        replaced = get_recommendation_page(owner, db, limit=1, params=PARAMS)
+    assert replaced["next_cursor"] != old_cursor
+
+    with pytest.raises(HTTPException) as gone:
+        asyncio.run(feed_routes.get_recommendations_page(
+            limit=1, cursor=old_cursor, db=db, current_user=owner, **PARAMS
+        ))
+    assert gone.value.status_code == 410
+    assert get_recommendation_page(owner, db, limit=1, cursor=replaced["next_cursor"]) is not None
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from app.api.routes import songs as song_routes
+from app.models.user_similarity import UserSimilarity
+from app.schemas.song import SongCreate
+from app.services.batch_similarity import TasteMatrix
+from app.services.similarity_job import compute_user_similarities, get_precomputed_neighbors
+
+
+def _users_with_same_songs(db, make_user, count):
+    users = [make_user(f"user{i}") for i in range(count)]
+    for user in users:
+        for title in ("One", "Two"):
+            asyncio.run(song_routes.add_song(
+                SongCreate(title=title, artist="X", genre="Pop"), db=db, current_user=user
+            ))
+    return users
+
+
+def test_ties_at_the_cutoff_prefer_lower_ids(db, make_user):
+    users = _users_with_same_songs(db, make_user, 6)
+    ids = [user.id for user in users]
+    assert compute_user_similarities(db, top_n=2) == 12
+
+    for user_id in ids:
+        expected = [other for other in ids if other != user_id][:2]
+        assert list(get_precomputed_neighbors(user_id, db, set())) == expected
+
+
+def test_failed_rebuild_keeps_the_previous_table(db, make_user, monkeypatch):
+    users = _users_with_same_songs(db, make_user, 4)
+    compute_user_similarities(db, top_n=3)
+    before = {(row.user_id, row.neighbor_id) for row in db.query(UserSimilarity).all()}
+    assert len(before) == 12
+
+    block_similarity = TasteMatrix.block_similarity
+    calls = []
+
+    def failing_block(self, rows):
+        calls.append(rows)
+        if len(calls) > 1:
+            raise RuntimeError("interrupted")
+        return block_similarity(self, rows)
+
+    monkeypatch.setattr(TasteMatrix, "block_similarity", failing_block)
+    with pytest.raises(RuntimeError):
+        compute_user_similarities(db, top_n=3, block_size=1)
+    db.rollback()
+
+    assert {(row.user_id, row.neighbor_id) for row in db.query(UserSimilarity).all()} == before
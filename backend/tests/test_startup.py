@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+from app import main
+from app.models.posting import TastePosting
+
+
+def test_failed_build_does_not_skip_the_rest(engine, db, make_user, monkeypatch, capsys):
+    make_user("alice").top_genres = ["Pop"]
+    db.commit()
+
+    def broken(db):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "SessionLocal", lambda: Session(bind=engine))
+    monkeypatch.setattr(main, "_INITIAL_BUILDS", [("broken model", broken, "{}")] + main._INITIAL_BUILDS)
+    main.build_missing_models()
+
+    assert "Error building the broken model: boom" in capsys.readouterr().out
+    with Session(bind=engine) as db:
+        assert db.query(TastePosting).count() > 0
@@ -29,8 +29,9 @@ function Dashboard() {
   const fetchDashboardData = async () => {
     try {
       setLoading(true)
-      const recs = await feedAPI.getRecommendations()
-      setRecommendations(recs.data)
+      // The network graph shows up to 15 users, more than /recommendations returns
+      const recs = await feedAPI.getRecommendationPage({ limit: 15 })
+      setRecommendations(recs.data.items)
     } catch (err) {
       console.error('Dashboard error:', err)
     } finally {
@@ -1,6 +1,6 @@
 import React, { useEffect, useMemo, useRef, useState } from 'react'
 import { useLocation, useNavigate } from 'react-router-dom'
-import { itunesAPI } from '../utils/api'
+import { songsAPI } from '../utils/api'
 import { saveMusicProfile } from '../utils/musicProfile'
 import './MusicSetup.css'
 
@@ -61,8 +61,12 @@ function MusicSetup({ onComplete }) {
     songSearchTimerRef.current = setTimeout(async () => {
       try {
         setSearchingSongs(true)
-        const response = await itunesAPI.searchSong(query, 6)
-        setSongSuggestions(response.data?.results || [])
+        const response = await songsAPI.autocomplete(query, 'song', 6)
+        setSongSuggestions((response.data || []).map((item) => ({
+          trackId: item.mbid,
+          trackName: item.title,
+          artistName: item.artist,
+        })))
       } catch (searchError) {
         setSongSuggestions([])
       } finally {
@@ -97,8 +101,11 @@ function MusicSetup({ onComplete }) {
     artistSearchTimerRef.current = setTimeout(async () => {
       try {
         setSearchingArtists(true)
-        const response = await itunesAPI.searchArtist(query, 6)
-        setArtistSuggestions(response.data?.results || [])
+        const response = await songsAPI.autocomplete(query, 'artist', 6)
+        setArtistSuggestions((response.data || []).map((item) => ({
+          artistId: item.mbid,
+          artistName: item.artist,
+        })))
       } catch (searchError) {
         setArtistSuggestions([])
       } finally {
@@ -220,7 +227,6 @@ function MusicSetup({ onComplete }) {
                             }}
                           >
                             <strong>{item.artistName || 'Unknown artist'}</strong>
-                            <small>{item.primaryGenreName || 'Artist'}</small>
                           </button>
                         ))
                       ) : (
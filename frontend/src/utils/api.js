@@ -66,6 +66,8 @@ export const songsAPI = {
   getTopSongs: (userId = null) => api.get('/api/songs/top', { params: { user_id: userId } }),
   updateSong: (songId, data) => api.put(`/api/songs/${songId}`, data),
   deleteSong: (songId) => api.delete(`/api/songs/${songId}`),
+  // Suggestions while typing; type is 'all', 'song' or 'artist'
+  autocomplete: (q, type = 'all', limit = 8) => api.get('/api/songs/autocomplete', { params: { q, type, limit } }),
 }
 
 // Connections API
@@ -85,6 +87,8 @@ export const feedAPI = {
     const finalParams = { limit: 10, min_similarity: 0.0, ...params }
     return api.get('/api/feed/recommendations', { params: finalParams })
   },
+  // Paged recommendations: pass the previous response's next_cursor as `cursor`
+  getRecommendationPage: (params = {}) => api.get('/api/feed/recommendations/page', { params }),
   getSongRecommendations: (params = {}) => api.get('/api/feed/song-recommendations', { params }),
 }
 